@@ -0,0 +1,36 @@
+"""
+Add the columns used to schedule the checks of projects
+
+Revision ID: 1bf8aead6179
+Revises: 8040ef9a9dda
+Create Date: 2017-06-12 10:21:43.129374
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '1bf8aead6179'
+down_revision = '8040ef9a9dda'
+
+
+def upgrade():
+    """
+    Add the next_check_at and error_counter columns to the projects table and
+    the created_on column to the projects_versions table.
+    """
+    op.add_column('projects', sa.Column('next_check_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        op.f('ix_projects_next_check_at'), 'projects', ['next_check_at'], unique=False)
+    op.add_column(
+        'projects',
+        sa.Column('error_counter', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('projects_versions', sa.Column('created_on', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    """Remove the columns used to schedule the checks of projects."""
+    op.drop_column('projects_versions', 'created_on')
+    op.drop_column('projects', 'error_counter')
+    op.drop_index(op.f('ix_projects_next_check_at'), table_name='projects')
+    op.drop_column('projects', 'next_check_at')
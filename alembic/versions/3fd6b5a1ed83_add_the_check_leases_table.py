@@ -0,0 +1,47 @@
+"""
+Add the check_leases table
+
+Revision ID: 3fd6b5a1ed83
+Revises: d3d4e1b3ea6e
+Create Date: 2017-06-16 11:47:09.802361
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3fd6b5a1ed83'
+down_revision = 'd3d4e1b3ea6e'
+
+
+def upgrade():
+    """Add the table queuing the projects for the cron workers."""
+    op.create_table(
+        'check_leases',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('enqueued_on', sa.DateTime(), nullable=False),
+        sa.Column('worker', sa.String(length=255), nullable=True),
+        sa.Column('token', sa.String(length=32), nullable=True),
+        sa.Column('leased_until', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['project_id'],
+            ['projects.id'],
+            onupdate='cascade',
+            ondelete='cascade'
+        ),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+    op.create_index(
+        op.f('ix_check_leases_enqueued_on'), 'check_leases', ['enqueued_on'], unique=False)
+    op.create_index(
+        op.f('ix_check_leases_token'), 'check_leases', ['token'], unique=False)
+    op.create_index(
+        op.f('ix_check_leases_leased_until'), 'check_leases', ['leased_until'], unique=False)
+
+
+def downgrade():
+    """Drop the check_leases table."""
+    op.drop_index(op.f('ix_check_leases_leased_until'), table_name='check_leases')
+    op.drop_index(op.f('ix_check_leases_token'), table_name='check_leases')
+    op.drop_index(op.f('ix_check_leases_enqueued_on'), table_name='check_leases')
+    op.drop_table('check_leases')
@@ -0,0 +1,102 @@
+"""
+Identify runs and add their checkpoints
+
+Revision ID: 5e3ac4dbdb6b
+Revises: 3fd6b5a1ed83
+Create Date: 2017-06-19 09:33:12.270845
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5e3ac4dbdb6b'
+down_revision = '3fd6b5a1ed83'
+
+
+def upgrade():
+    """
+    Give the runs an identifier, a mode, a heartbeat and an end date, and add
+    the table of the projects checked during a run.
+
+    Runs used to be recorded as a ``started`` row followed by an ``ended``
+    row, the existing rows are all considered completed. The table is
+    recreated and its rows copied since its primary key changes.
+    """
+    op.create_table(
+        'runs_new',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column(
+            'mode', sa.String(length=20), nullable=False, server_default='due'),
+        sa.Column('created_on', sa.DateTime(), nullable=False),
+        sa.Column('heartbeat_on', sa.DateTime(), nullable=True),
+        sa.Column('ended_on', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    runs = sa.table(
+        'runs',
+        sa.column('status', sa.String),
+        sa.column('created_on', sa.DateTime),
+    )
+    runs_new = sa.table(
+        'runs_new',
+        sa.column('status', sa.String),
+        sa.column('created_on', sa.DateTime),
+        sa.column('ended_on', sa.DateTime),
+    )
+    op.execute(runs_new.insert().from_select(
+        ['status', 'created_on', 'ended_on'],
+        sa.select([runs.c.status, runs.c.created_on, runs.c.created_on]).order_by(
+            runs.c.created_on)))
+    op.drop_table('runs')
+    op.rename_table('runs_new', 'runs')
+
+    op.create_table(
+        'runs_checkpoints',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['run_id'],
+            ['runs.id'],
+            onupdate='cascade',
+            ondelete='cascade'
+        ),
+        sa.ForeignKeyConstraint(
+            ['project_id'],
+            ['projects.id'],
+            onupdate='cascade',
+            ondelete='cascade'
+        ),
+        sa.PrimaryKeyConstraint('run_id', 'project_id')
+    )
+
+
+def downgrade():
+    """
+    Drop the checkpoints table and the identifier, mode, heartbeat and end
+    date of runs.
+    """
+    op.drop_table('runs_checkpoints')
+
+    op.create_table(
+        'runs_old',
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_on', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('status', 'created_on'),
+    )
+    runs = sa.table(
+        'runs',
+        sa.column('status', sa.String),
+        sa.column('created_on', sa.DateTime),
+    )
+    runs_old = sa.table(
+        'runs_old',
+        sa.column('status', sa.String),
+        sa.column('created_on', sa.DateTime),
+    )
+    op.execute(runs_old.insert().from_select(
+        ['status', 'created_on'],
+        sa.select([runs.c.status, runs.c.created_on]).distinct()))
+    op.drop_table('runs')
+    op.rename_table('runs_old', 'runs')
@@ -0,0 +1,44 @@
+"""
+Add the runs_backends_stats table
+
+Revision ID: 7a8c4aa92678
+Revises: 5e3ac4dbdb6b
+Create Date: 2017-06-20 10:04:51.118392
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a8c4aa92678'
+down_revision = '5e3ac4dbdb6b'
+
+
+def upgrade():
+    """Add the table of the statistics of the runs, per backend."""
+    op.create_table(
+        'runs_backends_stats',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('backend', sa.String(length=200), nullable=False),
+        sa.Column('checked', sa.Integer(), nullable=False),
+        sa.Column('successes', sa.Integer(), nullable=False),
+        sa.Column('failures', sa.Integer(), nullable=False),
+        sa.Column('not_modified', sa.Integer(), nullable=False),
+        sa.Column('new_versions', sa.Integer(), nullable=False),
+        sa.Column('bytes_downloaded', sa.BigInteger(), nullable=False),
+        sa.Column('latency_p50', sa.Float(), nullable=True),
+        sa.Column('latency_p95', sa.Float(), nullable=True),
+        sa.Column('latency_p99', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['run_id'],
+            ['runs.id'],
+            onupdate='cascade',
+            ondelete='cascade'
+        ),
+        sa.PrimaryKeyConstraint('run_id', 'backend')
+    )
+
+
+def downgrade():
+    """Drop the runs_backends_stats table."""
+    op.drop_table('runs_backends_stats')
@@ -0,0 +1,30 @@
+"""
+Add the feed_cursors table
+
+Revision ID: a7d2c9e1f4b8
+Revises: e4a1c8f3b2d6
+Create Date: 2017-06-29 09:18:52.630217
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2c9e1f4b8'
+down_revision = 'e4a1c8f3b2d6'
+
+
+def upgrade():
+    """Add the table storing the position of the cron job in the feeds."""
+    op.create_table(
+        'feed_cursors',
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('value', sa.String(length=200), nullable=False),
+        sa.Column('updated_on', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    """Drop the feed_cursors table."""
+    op.drop_table('feed_cursors')
@@ -0,0 +1,28 @@
+"""
+Add the short_circuited counter of the runs statistics
+
+Revision ID: b3f5e2a9c7d1
+Revises: 7a8c4aa92678
+Create Date: 2017-06-27 14:12:40.523871
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3f5e2a9c7d1'
+down_revision = '7a8c4aa92678'
+
+
+def upgrade():
+    """Add the short_circuited column to the runs_backends_stats table."""
+    op.add_column(
+        'runs_backends_stats',
+        sa.Column(
+            'short_circuited', sa.Integer(), nullable=False,
+            server_default='0'))
+
+
+def downgrade():
+    """Drop the short_circuited column of the runs_backends_stats table."""
+    op.drop_column('runs_backends_stats', 'short_circuited')
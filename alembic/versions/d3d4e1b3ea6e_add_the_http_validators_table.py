@@ -0,0 +1,37 @@
+"""
+Add the http_validators table
+
+Revision ID: d3d4e1b3ea6e
+Revises: 1bf8aead6179
+Create Date: 2017-06-14 16:02:37.540212
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd3d4e1b3ea6e'
+down_revision = '1bf8aead6179'
+
+
+def upgrade():
+    """Add the table storing the HTTP cache validators of the projects."""
+    op.create_table(
+        'http_validators',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('etag', sa.String(length=255), nullable=True),
+        sa.Column('last_modified', sa.String(length=64), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['project_id'],
+            ['projects.id'],
+            onupdate='cascade',
+            ondelete='cascade'
+        ),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+
+
+def downgrade():
+    """Drop the http_validators table."""
+    op.drop_table('http_validators')
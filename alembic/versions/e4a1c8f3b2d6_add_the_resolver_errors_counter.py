@@ -0,0 +1,28 @@
+"""
+Add the resolver_errors counter of the runs statistics
+
+Revision ID: e4a1c8f3b2d6
+Revises: b3f5e2a9c7d1
+Create Date: 2017-06-28 10:31:07.214935
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1c8f3b2d6'
+down_revision = 'b3f5e2a9c7d1'
+
+
+def upgrade():
+    """Add the resolver_errors column to the runs_backends_stats table."""
+    op.add_column(
+        'runs_backends_stats',
+        sa.Column(
+            'resolver_errors', sa.Integer(), nullable=False,
+            server_default='0'))
+
+
+def downgrade():
+    """Drop the resolver_errors column of the runs_backends_stats table."""
+    op.drop_column('runs_backends_stats', 'resolver_errors')
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import datetime
 import logging
 
+import anitya.config
+import anitya.lib.circuit_breaker
 import anitya.lib.plugins
 import anitya.lib.exceptions
+import anitya.lib.rate_limit
+import anitya.lib.run_stats
+import anitya.lib.scheduler
+import anitya.lib.url_cache
 
 
 __api_version__ = '1.0'
@@ -35,27 +42,106 @@ def check_release(project, session, test=False):
     :arg package: a Package object has defined in anitya.lib.model.Project
 
     '''
-    backend = anitya.lib.plugins.get_plugin(project.backend)
-    if not backend:
-        raise anitya.lib.exceptions.AnityaException(
-            'No backend was found for "%s"' % project.backend)
-
-    publish = False
-    up_version = None
-    max_version = None
+    backend = get_backend(project)
 
     try:
-        up_version = backend.get_version(project)
+        up_version = fetch_version(backend, project)
+    except anitya.lib.exceptions.UpstreamNotModified as err:
+        _log.info('%s: %s', project.name, err)
+        up_version = project.latest_version
+    except anitya.lib.exceptions.CircuitOpen as err:
+        _log.info('%s: %s', project.name, err)
+        record_skipped(project, session, err)
+        raise
     except anitya.lib.exceptions.AnityaPluginException as err:
         _log.exception("AnityaError catched:")
-        project.logs = str(err)
-        session.add(project)
-        session.commit()
+        record_failure(project, session, err)
         raise
 
     if test:
         return up_version
 
+    record_release(project, session, up_version)
+
+
+def fetch_version(backend, project):
+    ''' Retrieve the latest upstream version of the provided project with
+    the provided backend, recording the check in the statistics of the run
+    if they are collected (see :mod:`anitya.lib.run_stats`). Each URL is
+    requested once during the check, see
+    :func:`anitya.lib.url_cache.check_cache`.
+
+    :raise RateLimited: if upstream rate limited a request of the check, see
+        :mod:`anitya.lib.rate_limit`.
+    :raise CircuitOpen: if a request of the check was not made since its
+        host is failing, see :mod:`anitya.lib.circuit_breaker`.
+
+    '''
+    with anitya.lib.run_stats.measure(project.backend), \
+            anitya.lib.rate_limit.check(), \
+            anitya.lib.circuit_breaker.check(), \
+            anitya.lib.url_cache.check_cache():
+        return backend.get_version(project)
+
+
+def get_backend(project):
+    ''' Return the backend plugin the provided project relies on.
+
+    :arg project: a :class:`anitya.lib.model.Project` object.
+    :raise AnityaException: if no backend matching the one of the project
+        could be found.
+
+    '''
+    backend = anitya.lib.plugins.get_plugin(project.backend)
+    if not backend:
+        raise anitya.lib.exceptions.AnityaException(
+            'No backend was found for "%s"' % project.backend)
+    return backend
+
+
+def record_failure(project, session, error):
+    ''' Store the error which occured while retrieving the upstream version
+    of the provided project.
+
+    This is the database half of :func:`check_release` for failed checks.
+
+    '''
+    project.logs = str(error)
+    project.pending_http_validator = None
+    project.error_counter = (project.error_counter or 0) + 1
+    project.next_check_at = anitya.lib.scheduler.next_check_at(
+        project, anitya.config.config, failed=True)
+    session.add(project)
+    session.commit()
+
+
+def record_skipped(project, session, error):
+    ''' Reschedule the provided project whose check was skipped since its
+    upstream host is failing, see :class:`anitya.lib.exceptions.CircuitOpen`.
+
+    Upstream was not contacted, so neither the logs nor the error counter of
+    the project change and it is checked again at its usual interval.
+
+    '''
+    project.pending_http_validator = None
+    project.next_check_at = anitya.lib.scheduler.next_check_at(
+        project, anitya.config.config)
+    session.add(project)
+    session.commit()
+
+
+def record_release(project, session, up_version):
+    ''' Store the upstream version found for the provided project, publishing
+    a message if this is a new version.
+
+    This is the database half of :func:`check_release` for successful
+    checks.
+
+    '''
+    publish = False
+    max_version = None
+    now = datetime.datetime.utcnow()
+
     p_version = project.latest_version or ''
 
     if up_version:
@@ -66,7 +152,8 @@ def check_release(project, session, test=False):
         project.versions_obj.append(
             anitya.lib.model.ProjectVersion(
                 project_id=project.id,
-                version=up_version
+                version=up_version,
+                created_on=now,
             )
         )
 
@@ -83,6 +170,7 @@ def check_release(project, session, test=False):
             project.latest_version = up_version
 
     if publish:
+        anitya.lib.run_stats.new_version(project.backend)
         anitya.log(
             session,
             project=project,
@@ -98,6 +186,12 @@ def check_release(project, session, test=False):
             ),
         )
 
+    if project.pending_http_validator is not None:
+        project.http_validator = project.pending_http_validator
+        project.pending_http_validator = None
+    project.error_counter = 0
+    project.next_check_at = anitya.lib.scheduler.next_check_at(
+        project, anitya.config.config, now=now)
     session.add(project)
     session.commit()
 
@@ -281,6 +281,8 @@ def delete_project_version(project_id, version):
 
             # Delete the record of the version for this project
             SESSION.delete(version_obj)
+            # Make sure the versions are retrieved again at the next check
+            project.http_validator = None
             # Adjust the latest_version if needed
             if project.latest_version == version:
                 project.latest_version = None
@@ -464,6 +466,38 @@ def browse_flags():
     )
 
 
+@APP.route('/runs')
+@login_required
+def browse_runs():
+
+    if not is_admin():
+        flask.abort(401)
+
+    page = flask.request.args.get('page', 1)
+
+    try:
+        page = int(page)
+    except ValueError:
+        page = 1
+
+    runs_page = anitya.lib.model.Run.query.paginate(
+        page=max(page, 1),
+        items_per_page=25,
+        order_by=(
+            anitya.lib.model.Run.created_on.desc(),
+            anitya.lib.model.Run.id.desc()),
+    )
+    total_page = int(ceil(runs_page.total_items / 25.0))
+
+    return flask.render_template(
+        'runs.html',
+        current='runs',
+        runs=runs_page.items,
+        total_page=total_page,
+        page=runs_page.page,
+    )
+
+
 @APP.route('/flags/<flag_id>/set/<state>', methods=['POST'])
 @login_required
 def set_flag_state(flag_id, state):
@@ -258,4 +258,101 @@ class ProjectsResource(Resource):
             return response
 
 
+class RunsResource(Resource):
+    """
+    The ``api/v2/runs/`` API endpoint.
+    """
+
+    @anitya.authentication.parse_api_token
+    def get(self):
+        """
+        Lists the cron runs, the most recent first, with the statistics of
+        the checks made with each backend.
+
+        **Example request**:
+
+        .. sourcecode:: http
+
+            GET /api/v2/runs/?items_per_page=1 HTTP/1.1
+            Accept: application/json
+            Accept-Encoding: gzip, deflate
+            Connection: keep-alive
+            Host: localhost:5000
+            User-Agent: HTTPie/0.9.4
+
+        **Example response**:
+
+        .. sourcecode:: http
+
+            HTTP/1.0 200 OK
+            Content-Length: 964
+            Content-Type: application/json
+            Date: Tue, 20 Jun 2017 09:12:05 GMT
+            Server: Werkzeug/0.12.1 Python/2.7.13
+
+            {
+                "items": [
+                    {
+                        "backends": [
+                            {
+                                "backend": "PyPI",
+                                "bytes_downloaded": 1843200,
+                                "checked": 120,
+                                "failures": 2,
+                                "latency_p50": 0.41,
+                                "latency_p95": 1.27,
+                                "latency_p99": 3.02,
+                                "new_versions": 7,
+                                "not_modified": 0,
+                                "resolver_errors": 0,
+                                "short_circuited": 0,
+                                "successes": 118
+                            }
+                        ],
+                        "bytes_downloaded": 1843200,
+                        "checked": 120,
+                        "created_on": 1497945600.0,
+                        "ended_on": 1497945725.0,
+                        "failures": 2,
+                        "id": 42,
+                        "new_versions": 7,
+                        "not_modified": 0,
+                        "resolver_errors": 0,
+                        "short_circuited": 0,
+                        "status": "ended",
+                        "successes": 118,
+                        "wall_time": 125.0
+                    }
+                ],
+                "items_per_page": 1,
+                "page": 1,
+                "total_items": 1337
+            }
+
+        The latencies are the 50th, 95th and 99th percentiles of the duration
+        of the checks, in seconds. ``short_circuited`` counts the checks
+        which failed right away since their upstream host was failing, and
+        ``resolver_errors`` the checks which failed since the name of their
+        upstream host could not be resolved. ``ended_on`` and ``wall_time``
+        are ``null`` while a run is in progress.
+
+        :query int page: The run page number to retrieve (defaults to 1).
+        :query int items_per_page: The number of items per page (defaults to
+                                   25, maximum of 250).
+        :statuscode 200: If all arguments are valid.
+        :statuscode 400: If one or more of the query arguments is invalid.
+        """
+
+        parser = _BASE_ARG_PARSER.copy()
+        parser.add_argument('page', type=_page_validator, location='args')
+        parser.add_argument('items_per_page', type=_items_per_page_validator, location='args')
+        args = parser.parse_args(strict=True)
+        args.pop('access_token')
+        runs_page = anitya.lib.model.Run.query.paginate(
+            order_by=(anitya.lib.model.Run.created_on.desc(), anitya.lib.model.Run.id.desc()),
+            **args)
+        return runs_page.as_dict()
+
+
 APP.api.add_resource(ProjectsResource, '/api/v2/projects/')
+APP.api.add_resource(RunsResource, '/api/v2/runs/')
@@ -94,6 +94,45 @@ DEFAULTS = dict(
         'https://release-monitoring.org/oidc/upstream',
         'https://release-monitoring.org/oidc/downstream',
     ],
+    # The bounds, in seconds, of the interval between two checks of a project.
+    # Within these bounds the interval follows the project's release cadence.
+    CHECK_INTERVAL_MIN=3600,
+    CHECK_INTERVAL_MAX=7 * 24 * 3600,
+    # The interval, in seconds, between two checks of a project with too few
+    # releases known to derive a release cadence.
+    CHECK_INTERVAL_DEFAULT=12 * 3600,
+    # The maximum interval, in seconds, between two checks of a project which
+    # is packaged in at least one distribution.
+    CHECK_INTERVAL_PACKAGED=24 * 3600,
+    # The maximum size, in bytes, of a response from upstream. Larger
+    # responses are aborted and the check fails.
+    MAX_RESPONSE_SIZE=10 * 1024 * 1024,
+    # The path of the SQLite database the HTTP responses from upstream are
+    # cached in, shared by the cron job and the web application. No cache is
+    # used if it is not set.
+    HTTP_CACHE_PATH=None,
+    # The maximum size, in bytes, of the responses cached.
+    HTTP_CACHE_MAX_SIZE=256 * 1024 * 1024,
+    # The number of seconds cached responses stay fresh, by backend name, or
+    # ``default`` for the backends not listed. 0 disables the cache.
+    HTTP_CACHE_TTL={'default': 600},
+    # The connect and read timeouts, in seconds, of the HTTP requests to
+    # upstream, by backend name, or ``default`` for the backends not listed.
+    HTTP_TIMEOUT={'default': [10, 60]},
+    # The number of times a request to upstream is retried after a transient
+    # error, waiting a random delay growing by HTTP_RETRY_BACKOFF seconds.
+    HTTP_RETRIES=2,
+    HTTP_RETRY_BACKOFF=0.5,
+    # The token the GitHub backend queries the GraphQL API of GitHub with,
+    # rather than scraping the tags pages. The cron job then retrieves the
+    # tags of many repositories per request.
+    GITHUB_ACCESS_TOKEN=None,
+    # The directory the cron job keeps a clone of the crates.io index in,
+    # reading the versions of the crates it checks from it rather than
+    # querying the crates.io API. The index is not used if it is not set.
+    CRATES_INDEX_PATH=None,
+    # The number of seconds the clone of the crates.io index stays fresh.
+    CRATES_INDEX_TTL=600,
 )
 
 # Start with a basic logging configuration, which will be replaced by any user-
@@ -176,6 +176,8 @@ def edit_project(
                     changes=changes,
                 )
             )
+            # The versions found in the page might not be the same anymore
+            project.http_validator = None
             session.add(project)
             session.commit()
         if check_release is True:
@@ -18,18 +18,25 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 """The Anitya backends API."""
 
+import codecs
 import fnmatch
+import functools
+import itertools
 import logging
 import re
-import socket
 # sre_constants contains re exceptions
 import sre_constants
-import six.moves.urllib.request as urllib2
+from six.moves.urllib.parse import urlparse
 
 import requests
 import anitya
 import anitya.app
-from anitya.lib.exceptions import AnityaPluginException
+import anitya.lib.model
+from anitya.lib import (
+    circuit_breaker, ftp_pool, http_cache, http_transport, rate_limit,
+    run_stats, scheduler, url_cache)
+from anitya.lib.exceptions import (
+    AnityaPluginException, ResponseTooLarge, UpstreamNotModified)
 from anitya.lib.versions import RpmVersion
 import six
 
@@ -37,6 +44,15 @@ import six
 REGEX = '%(name)s(?:[-_]?(?:minsrc|src|source))?[-_]([^-/_\s]+?)(?i)(?:[-_]'\
         '(?:minsrc|src|source|asc))?\.(?:tar|t[bglx]z|tbz2|zip)'
 
+# The size, in bytes, of the chunks the responses are read by.
+CHUNK_SIZE = 64 * 1024
+
+# The number of characters kept from a chunk to the next one when searching a
+# page incrementally: longer matches spanning two chunks may be missed.
+REGEX_OVERLAP = 1024
+
+_HTML_SUBDIR_REGEX = re.compile(r'\bhref\s*=\s*["\']([^"\'/]+)/["\']', re.I)
+
 _log = logging.getLogger(__name__)
 
 
@@ -44,6 +60,24 @@ _log = logging.getLogger(__name__)
 # connections over and over and over again.
 http_session = requests.session()
 
+# The session of the requests which do not verify the certificate of the
+# server, only ever used with ``verify=False`` (see ``BaseBackend.call_url``).
+insecure_http_session = requests.session()
+
+
+def configure_sessions(pool_connections=10, pool_maxsize=10):
+    ''' Size the connection pools of the HTTP sessions and apply the retry
+    policy configured to them, see :func:`anitya.lib.http_transport.mount`.
+
+    '''
+    for session in (http_session, insecure_http_session):
+        http_transport.mount(
+            session, anitya.app.APP.config, pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize)
+
+
+configure_sessions()
+
 
 class BaseBackend(object):
     '''
@@ -63,14 +97,41 @@ class BaseBackend(object):
             the project is a part of do not define a default version scheme.
             If this is not defined, :data:`anitya.lib.versions.GLOBAL_DEFAULT`
             is used.
+        host (str): The host name of the upstream server the backend queries,
+            if it queries a single one. This is used to spread requests across
+            upstream hosts.
+        encoding (str): The encoding of the pages of the backend which do not
+            declare theirs, see :func:`response_text`.
     '''
 
     name = None
+    host = None
+    encoding = None
     examples = None
     default_regex = None
     more_info = None
     default_version_scheme = None
 
+    @classmethod
+    def get_host(cls, project):
+        ''' Return the host name of the upstream server queried to check the
+        provided project.
+
+        This is the ``host`` of the backend if it has one, otherwise the host
+        of the project's ``version_url`` or, failing that, of its homepage.
+
+        :arg Project project: a :class:`model.Project` object whose backend
+            corresponds to the current plugin.
+        :return: the lower-cased host name, or an empty string if it cannot
+            be determined.
+        :return type: str
+
+        '''
+        if cls.host:
+            return cls.host
+        url = project.version_url or project.homepage or ''
+        return (urlparse(url).hostname or '').lower()
+
     @classmethod
     def expand_subdirs(self, url, glob_char="*"):
         ''' Expand dirs containing ``glob_char`` in the given URL with the latest
@@ -95,29 +156,48 @@ class BaseBackend(object):
         # everything after the slash after glob_match
         url_suffix = url[glob_match.end():]
 
-        html_regex = re.compile(r'\bhref\s*=\s*["\']([^"\'/]+)/["\']', re.I)
-        text_regex = re.compile(r'^d.+\s(\S+)\s*$', re.I | re.M)
-
         if url_prefix != "":
-            dir_listing = self.call_url(url_prefix).text
-            if not dir_listing:
-                return url
-            subdirs = []
-            regex = url.startswith("ftp://") and text_regex or html_regex
-            for match in regex.finditer(dir_listing):
-                subdir = match.group(1)
-                if subdir not in (".", "..") \
-                        and fnmatch.fnmatch(subdir, glob_str):
-                    subdirs.append(subdir)
-            if not subdirs:
+            # Projects often share parent directories, expand them once per run
+            cache = url_cache.get_cache()
+            expand = functools.partial(self._latest_subdir, url_prefix, glob_str)
+            if cache is None:
+                latest = expand()
+            else:
+                latest = cache.get(('expand_subdirs', url_prefix, glob_str), expand)
+            if latest is None:
                 return url
-            sorted_subdirs = sorted([RpmVersion(s) for s in subdirs])
-            latest = sorted_subdirs[-1].version
 
             url = "%s%s/%s" % (url_prefix, latest, url_suffix)
             return self.expand_subdirs(url, glob_char)
         return url
 
+    @classmethod
+    def _latest_subdir(self, url, glob_str):
+        ''' Return the latest sub-directory of the directory at ``url``
+        matching ``glob_str``, or ``None`` if there are none.
+        '''
+        if url.startswith(('ftp://', 'ftps://')):
+            with scheduler.slot(_host(url)):
+                entries = ftp_pool.get_pool(
+                    password=anitya.app.APP.config.get('ADMIN_EMAIL')
+                ).list(url, dirs=True)
+            names = [entry.name for entry in entries if entry.is_dir]
+        else:
+            dir_listing = response_text(self.call_url(url), self.encoding)
+            if not dir_listing:
+                return None
+            names = [
+                match.group(1) for match in _HTML_SUBDIR_REGEX.finditer(dir_listing)]
+
+        subdirs = [
+            subdir for subdir in names
+            if subdir not in (".", "..") and fnmatch.fnmatch(subdir, glob_str)]
+        if not subdirs:
+            return None
+        # Each version is parsed once, and the last of the latest ones wins
+        # as it did when they were sorted.
+        return max(reversed(subdirs), key=RpmVersion)
+
     @classmethod
     def get_version(self, project):  # pragma: no cover
         ''' Method called to retrieve the latest version of the projects
@@ -171,6 +251,23 @@ class BaseBackend(object):
         '''
         raise NotImplementedError()
 
+    @classmethod
+    def prefetch(self, projects):
+        ''' Method called by the cron job before checking the provided
+        projects, so the backends able to query upstream about many projects
+        at once can do so rather than query it once per project.
+
+        Not all backends support this, the others do nothing.
+
+        :arg list projects: the :class:`model.Project` objects relying on
+            this backend which are about to be checked.
+        :raise AnityaException: a
+            :class:`anitya.lib.exceptions.AnityaException` exception when
+            upstream cannot be queried, the projects are then checked one at
+            a time.
+        '''
+        pass
+
     @classmethod
     def get_ordered_versions(self, project):
         ''' Method called to retrieve all the versions (that can be found)
@@ -191,41 +288,126 @@ class BaseBackend(object):
         return [v.version for v in sorted_versions]
 
     @classmethod
-    def call_url(self, url, insecure=False):
+    def call_url(self, url, insecure=False, headers=None, stream=False):
         ''' Dedicated method to query a URL.
 
         It is important to use this method as it allows to query them with
         a defined user-agent header thus informing the projects we are
         querying what our intentions are.
 
+        Responses larger than the ``MAX_RESPONSE_SIZE`` setting are aborted.
+        Fresh responses of the persistent HTTP cache, if it is configured
+        (see :mod:`anitya.lib.http_cache`), are reused, and so are the
+        responses already returned during the current check (see
+        :func:`anitya.lib.url_cache.check_cache`).
+
         :arg url: the url to request (get).
         :type url: str
+        :kwarg headers: additional headers to send with HTTP(S) requests.
+        :type headers: dict
+        :kwarg stream: do not read the body of HTTP(S) responses beforehand,
+            it can then be read by chunks with :func:`iter_response_text`.
+            Responses shared by the cache of the run, or stored in the
+            persistent HTTP cache, are always read.
+        :type stream: bool
         :return: the request object corresponding to the request made
         :return type: Request
+        :raise ResponseTooLarge: if the response is too large.
+        :raise CircuitOpen: if the host failed too many times in a row during
+            the run, see :mod:`anitya.lib.circuit_breaker`.
+        :raise RateLimited: if the host rate limits the requests during the
+            run, see :mod:`anitya.lib.rate_limit`.
         '''
+        key = (url, bool(insecure), tuple(sorted((headers or {}).items())))
+        check_cache = url_cache.get_check_cache()
+        if check_cache is not None and not stream:
+            return check_cache.get(key, functools.partial(
+                self._call_url_shared, url, key, insecure=insecure,
+                headers=headers))
+        return self._call_url_shared(
+            url, key, insecure=insecure, headers=headers, stream=stream)
+
+    @classmethod
+    def _call_url_shared(self, url, key, insecure=False, headers=None,
+                         stream=False):
+        ''' Query a URL through the cache of the run, if any. '''
+        cache = url_cache.get_cache()
+        if cache is None:
+            return self._call_url(
+                url, insecure=insecure, headers=headers, stream=stream)
+
+        # Failed requests are not cached, they are made again by the next check
+        return cache.get(key, functools.partial(
+            self._call_url, url, insecure=insecure, headers=headers))
+
+    @classmethod
+    def call_json(self, url):
+        ''' Query a URL and return the JSON document it returned.
+
+        The document is only downloaded and decoded once per check, see
+        :func:`anitya.lib.url_cache.check_cache`, it must thus not be
+        modified.
+
+        :arg url: the url to request (get).
+        :type url: str
+        :return: the decoded document
+        :raise AnityaPluginException: if the URL cannot be queried or does not
+            return JSON.
+        '''
+        def fetch():
+            try:
+                req = self.call_url(url)
+            except Exception:
+                raise AnityaPluginException('Could not contact %s' % url)
+
+            try:
+                return req.json()
+            except Exception:
+                raise AnityaPluginException('No JSON returned by %s' % url)
+
+        cache = url_cache.get_check_cache()
+        if cache is None:
+            return fetch()
+        return cache.get(('json', url), fetch)
+
+    @classmethod
+    def _call_url(self, url, insecure=False, headers=None, stream=False):
+        ''' Query a URL, bypassing the cache of :meth:`call_url`. '''
         user_agent = 'Anitya %s at upstream-monitoring.org' % \
             anitya.app.__version__
         from_email = anitya.app.APP.config.get('ADMIN_EMAIL')
+        max_size = max_response_size()
 
         if '*' in url:
             url = self.expand_subdirs(url)
 
         if url.startswith('ftp://') or url.startswith('ftps://'):
-            socket.setdefaulttimeout(30)
-
-            req = urllib2.Request(url)
-            req.add_header('User-Agent', user_agent)
-            req.add_header('From', from_email)
-            resp = urllib2.urlopen(req)
-            content = resp.read()
+            # Anonymous FTP etiquette: the password is an email address
+            host = _host(url)
+            with circuit_breaker.guard(host), scheduler.slot(host):
+                content = ftp_pool.get_pool(password=from_email).retrieve(
+                    url, max_size)
+            run_stats.count_downloaded(content)
 
             return content
 
         else:
-            headers = {
+            disk_cache = http_cache.get_cache(anitya.app.APP.config)
+            ttl = http_cache.ttl(anitya.app.APP.config, self.name)
+            if disk_cache is not None and ttl > 0:
+                key = disk_cache.key(url, insecure=insecure, headers=headers)
+                resp = disk_cache.get(key, ttl)
+                if resp is not None:
+                    return resp
+                stream = False
+            else:
+                disk_cache = None
+
+            headers = dict(headers or {})
+            headers.update({
                 'User-Agent': user_agent,
                 'From': from_email,
-            }
+            })
 
             # Works around https://github.com/kennethreitz/requests/issues/2863
             # Currently, requests does not start new TCP connections based on
@@ -234,52 +416,340 @@ class BaseBackend(object):
             # (scheme, host, port) combination will also be insecure, even if
             # `verify=True` is passed to requests.
             #
-            # This starts a new session which is immediately discarded when the
-            # request is insecure. We don't get to pool connections for these
-            # requests, but it stops us from making insecure requests by
-            # accident. This can be removed in requests-3.0.
-            if insecure:
-                with requests.Session() as r_session:
-                    resp = r_session.get(
-                        url, headers=headers, timeout=60, verify=False)
-            else:
-                resp = http_session.get(
-                    url, headers=headers, timeout=60, verify=True)
+            # Insecure requests thus go through their own session, whose pools
+            # of connections, one per (scheme, host, port), are never used for
+            # verified requests. This can be removed in requests-3.0.
+            timeout = http_transport.timeout(anitya.app.APP.config, self.name)
+            host = _host(url)
+            rate_limit.before(host)
+            with circuit_breaker.guard(host) as outcome, \
+                    scheduler.slot(host):
+                if insecure:
+                    resp = insecure_http_session.get(
+                        url, headers=headers, timeout=timeout, verify=False,
+                        stream=True)
+                else:
+                    resp = http_session.get(
+                        url, headers=headers, timeout=timeout, verify=True,
+                        stream=True)
+                outcome.failed = (
+                    resp.status_code in circuit_breaker.FAILURE_STATUSES)
+                rate_limit.after(host, resp)
+                if not stream:
+                    _read_response(resp, url, max_size)
+
+            if disk_cache is not None and resp.status_code == 200:
+                disk_cache.put(key, resp)
 
             return resp
 
 
+def _host(url):
+    ''' Return the host of a URL, as the circuit breaker knows it. '''
+    return (urlparse(url).hostname or '').lower()
+
+
+def max_response_size():
+    ''' Return the maximum size of a response from upstream, in bytes. '''
+    return anitya.app.APP.config.get('MAX_RESPONSE_SIZE', 10 * 1024 * 1024)
+
+
+def _iter_response(resp, url, max_size):
+    ''' Iterate over the body of a streamed response by chunks of bytes,
+    aborting it once it is larger than ``max_size`` bytes.
+
+    '''
+    length = resp.headers.get('Content-Length')
+    if length and length.isdigit() and int(length) > max_size:
+        resp.close()
+        raise ResponseTooLarge(url, max_size)
+
+    size = 0
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            resp.close()
+            raise ResponseTooLarge(url, max_size)
+        run_stats.count_downloaded(chunk)
+        yield chunk
+
+
+def _read_response(resp, url, max_size):
+    ''' Read the body of a streamed response, so it can be used like a
+    response which was not streamed.
+
+    '''
+    # What Response.content does, with the size checked along the way
+    resp._content = b''.join(_iter_response(resp, url, max_size))
+
+
+def _lookup_encoding(encoding):
+    ''' Return the canonical name of an encoding, ``None`` if it is unknown.
+    '''
+    if not encoding:
+        return None
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def _declared_encoding(resp, encoding=None):
+    ''' Return the encoding the charset of the Content-Type of a response
+    declares, or else the provided one, if they are known.
+
+    The ISO-8859-1 default requests gives to the text responses which do not
+    declare a charset is not a declared encoding.
+
+    '''
+    content_type = resp.headers.get('Content-Type') or ''
+    if 'charset' in content_type.lower():
+        declared = _lookup_encoding(
+            requests.utils.get_encoding_from_headers(resp.headers))
+        if declared:
+            return declared
+    return _lookup_encoding(encoding)
+
+
+def response_text(resp, encoding=None):
+    ''' Return the text of a response.
+
+    It is decoded with the encoding the response declares, or else the
+    provided one, usually the ``encoding`` of the backend. Responses
+    declaring none are decoded as UTF-8, ASCII included, if they can be. Only
+    the others fall back to the default encoding of requests or to charset
+    detection, which goes over the whole content.
+
+    '''
+    declared = _declared_encoding(resp, encoding)
+    if declared:
+        return resp.content.decode(declared, 'replace')
+    try:
+        return resp.content.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    if _lookup_encoding(resp.encoding):
+        return resp.content.decode(resp.encoding, 'replace')
+    return resp.text
+
+
+def iter_response(resp, url):
+    ''' Iterate over the body of a response by chunks of bytes, reading it
+    from upstream along the way if it was streamed.
+
+    :raise ResponseTooLarge: if the response is too large.
+    :raise AnityaPluginException: if the response cannot be read.
+
+    '''
+    if resp._content_consumed:
+        chunks = resp.iter_content(CHUNK_SIZE)
+    else:
+        chunks = _iter_response(resp, url, max_response_size())
+
+    try:
+        for chunk in chunks:
+            yield chunk
+    except requests.exceptions.RequestException as err:
+        raise AnityaPluginException(
+            'Could not read "%s", with error: %s' % (url, str(err)))
+
+
+def iter_response_text(resp, url, encoding=None):
+    ''' Iterate over the text of a response by chunks, reading it from
+    upstream along the way if it was streamed.
+
+    The text is decoded like :func:`response_text` does, except that there is
+    no charset detection: if the response is not UTF-8 after all, the rest of
+    it is decoded with the default encoding of requests or ISO-8859-1.
+
+    :raise ResponseTooLarge: if the response is too large.
+    :raise AnityaPluginException: if the response cannot be read.
+
+    '''
+    if resp._content_consumed:
+        chunks = resp.iter_content(CHUNK_SIZE)
+    else:
+        chunks = _iter_response(resp, url, max_response_size())
+
+    declared = _declared_encoding(resp, encoding)
+    if declared:
+        decoder = codecs.getincrementaldecoder(declared)(errors='replace')
+        fallback = None
+    else:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='strict')
+        fallback = _lookup_encoding(resp.encoding) or 'iso8859-1'
+
+    try:
+        for chunk in chunks:
+            pending = decoder.getstate()[0]
+            try:
+                text = decoder.decode(chunk)
+            except UnicodeDecodeError:
+                decoder = codecs.getincrementaldecoder(fallback)(
+                    errors='replace')
+                text = decoder.decode(pending + chunk)
+            if text:
+                yield text
+    except requests.exceptions.RequestException as err:
+        raise AnityaPluginException(
+            'Could not read "%s", with error: %s' % (url, str(err)))
+
+    pending = decoder.getstate()[0]
+    try:
+        text = decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        text = pending.decode(fallback, 'replace')
+    if text:
+        yield text
+
+
 def get_versions_by_regex(url, regex, project, insecure=False):
     ''' For the provided url, return all the version retrieved via the
     specified regular expression.
 
+    The page is searched by chunks, as it is downloaded.
+
     '''
 
+    chunks = call_url_if_modified(url, project, insecure=insecure, stream=True)
+    return get_versions_by_regex_for_chunks(chunks, url, regex, project)
+
+
+def call_url_if_modified(url, project, insecure=False, stream=False):
+    ''' For the provided url, return the content of the page the versions
+    of the provided project are to be found in.
+
+    The request is conditional if this page is the one the versions of the
+    project were last found in, and the validators of the page returned are
+    set as the project's ``pending_http_validator`` so they are stored if
+    versions are found in it.
+
+    :kwarg stream: return an iterator over the content of the page, by
+        chunks read from upstream along the way, rather than the content.
+    :raise UpstreamNotModified: if the page did not change since the versions
+        of the project were last found in it.
+    :raise AnityaPluginException: if the page cannot be retrieved.
+
+    '''
+    headers = {}
+    validator = project.http_validator
+    # Globs are expanded by call_url, the page requested may thus differ
+    if validator is not None and '*' not in url:
+        headers = validator.headers(url)
+
+    # The plugins are loaded from this module
+    import anitya.lib.plugins
+    # Responses stay fresh in the HTTP cache as long as the backend wants
+    backend = None
+    if project.backend:
+        backend = anitya.lib.plugins.get_plugin(project.backend)
+    backend = backend or BaseBackend
     try:
-        req = BaseBackend.call_url(url, insecure=insecure)
+        req = backend.call_url(
+            url, insecure=insecure, headers=headers, stream=stream)
     except Exception as err:
         _log.debug('%s ERROR: %s' % (project.name, str(err)))
         raise AnityaPluginException(
             'Could not call : "%s" of "%s", with error: %s' % (
                 url, project.name, str(err)))
 
-    if not isinstance(req, six.string_types):
-        req = req.text
+    if isinstance(req, six.binary_type):
+        req = req.decode('utf-8', 'replace')
+    if isinstance(req, six.string_types):
+        return iter([req]) if stream else req
+
+    if req.status_code == 304:
+        raise UpstreamNotModified(url)
+
+    etag = req.headers.get('ETag')
+    last_modified = req.headers.get('Last-Modified')
+    if (etag or last_modified) and '*' not in url:
+        project.pending_http_validator = anitya.lib.model.HttpValidator(
+            url=url, etag=etag, last_modified=last_modified)
+
+    if stream:
+        return iter_response_text(req, url, backend.encoding)
+    return response_text(req, backend.encoding)
+
+
+def findall_by_chunks(pattern, chunks, overlap=REGEX_OVERLAP):
+    ''' Iterate over the matches of the provided compiled regular expression
+    in the concatenation of the provided chunks of text, like
+    :func:`re.findall` does, without concatenating them.
+
+    Matches which could continue in the next chunk are only returned once it
+    has been read, as long as they are at most ``overlap`` characters long.
+    The ``overlap`` characters preceding the text left to search are kept as
+    context, so anchors, word boundaries and lookbehinds match as they would
+    in the whole text.
 
-    return get_versions_by_regex_for_text(req, url, regex, project)
+    '''
+    if pattern.groups == 0:
+        def result(match):
+            return match.group(0)
+    elif pattern.groups == 1:
+        def result(match):
+            return match.group(1)
+    else:
+        def result(match):
+            return match.groups('')
+
+    # The text searched starts at ``pos``, what precedes it is context. The
+    # text only starts where the whole text does as long as ``pos`` is 0.
+    text = ''
+    pos = 0
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        text += chunk or ''
+        limit = len(text) if final else max(len(text) - overlap, 0)
+        deferred = False
+        for match in pattern.finditer(text, pos):
+            if match.end() > limit:
+                pos = match.start()
+                deferred = True
+                break
+            pos = match.end()
+            yield result(match)
+        if final:
+            break
+        if not deferred:
+            pos = max(pos, limit)
+        drop = max(pos - max(overlap, 1), 0)
+        text = text[drop:]
+        pos -= drop
+
+
+def strip_version_prefix(version, project):
+    ''' Return the provided version without the ``version_prefix`` of the
+    provided project, if it starts with it.
+
+    '''
+    if project.version_prefix is not None and \
+            version.startswith(project.version_prefix):
+        version = version[len(project.version_prefix):]
+    return version
 
 
 def get_versions_by_regex_for_text(text, url, regex, project):
     ''' For the provided text, return all the version retrieved via the
     specified regular expression.
 
+    '''
+    return get_versions_by_regex_for_chunks([text], url, regex, project)
+
+
+def get_versions_by_regex_for_chunks(chunks, url, regex, project):
+    ''' For the provided chunks of text, return all the version retrieved
+    via the specified regular expression.
+
     '''
 
     try:
-        upstream_versions = list(set(re.findall(regex, text)))
+        pattern = re.compile(regex)
     except sre_constants.error:  # pragma: no cover
         raise AnityaPluginException(
             "%s: invalid regular expression" % project.name)
+    upstream_versions = list(set(findall_by_chunks(pattern, chunks)))
 
     for index, version in enumerate(upstream_versions):
 
@@ -288,9 +758,7 @@ def get_versions_by_regex_for_text(text, url, regex, project):
             version = ".".join([v for v in version if not v == ""])
 
         # Strip the version_prefix early
-        if project.version_prefix is not None and \
-                version.startswith(project.version_prefix):
-            version = version[len(project.version_prefix):]
+        version = strip_version_prefix(version, project)
         upstream_versions[index] = version
 
         if " " in version:
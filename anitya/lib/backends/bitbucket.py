@@ -23,6 +23,7 @@ class BitBucketBackend(BaseBackend):
     '''
 
     name = 'BitBucket'
+    host = 'bitbucket.org'
     examples = [
         'https://bitbucket.org/zzzeek/sqlalchemy',
         'https://bitbucket.org/cherrypy/cherrypy',
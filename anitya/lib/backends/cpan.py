@@ -23,6 +23,7 @@ class CpanBackend(BaseBackend):
     '''
 
     name = 'CPAN (perl)'
+    host = 'search.cpan.org'
     examples = [
         'http://search.cpan.org/dist/Net-Whois-Raw/',
         'http://search.cpan.org/dist/SOAP/',
@@ -99,17 +99,35 @@ For example, ``https://crates.io/api/v1/crates/itoa/versions`` results in::
                 "yanked": false
             }
     }
+
+The yanked versions are ignored.
+
+If the ``CRATES_INDEX_PATH`` setting is set, the cron job rather reads the
+versions of the crates it checks from a local clone of the crates.io index,
+see :mod:`anitya.lib.crates_index` and :meth:`CratesBackend.prefetch`. The
+crates missing from the index are looked up with the API.
 """
+import threading
+
 import requests
 
+import anitya.app
+from anitya.lib import crates_index
 from anitya.lib.backends import BaseBackend
 from anitya.lib.exceptions import AnityaPluginException
 
 
+# The versions read from the index for the cron run, by crate name, see
+# CratesBackend.prefetch
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
+
 class CratesBackend(BaseBackend):
     """The crates class for projects hosted on crates.io."""
 
     name = 'crates.io'
+    host = 'crates.io'
     examples = [
         'https://crates.io/crates/clap',
         'https://crates.io/crates/serde',
@@ -176,12 +194,18 @@ class CratesBackend(BaseBackend):
             AnityaPluginException: If the URL was unreachable or the response
                 was in an unexpected format.
         """
-        return cls._get_versions(project)[0]['num']
+        versions = cls.get_versions(project)
+        if not versions:
+            raise AnityaPluginException(
+                'No versions found for {}'.format(project.name))
+        return versions[0]
 
     @classmethod
     def get_versions(cls, project):
         """
-        Get all versions of the project provided.
+        Get all versions of the project provided which were not yanked,
+        from the versions prefetched from the crates.io index if any, ordered
+        from newest to oldest with the version scheme of the project.
 
         Args:
             project (anitya.lib.model.Project): The Rust project to retrieve
@@ -194,7 +218,16 @@ class CratesBackend(BaseBackend):
             AnityaPluginException: If the URL was unreachable or the response
                 was in an unexpected format.
         """
-        return [v['num'] for v in cls._get_versions(project)]
+        with _prefetched_lock:
+            versions = _prefetched.pop(project.name.lower(), None)
+        if versions is None:
+            versions = [
+                v['num'] for v in cls._get_versions(project) if not v['yanked']]
+        # The index lists the versions in the order they were published
+        version_class = project.get_version_class()
+        sorted_versions = sorted(
+            [version_class(version=v) for v in versions], reverse=True)
+        return [v.version for v in sorted_versions]
 
     @classmethod
     def get_ordered_versions(cls, project):
@@ -212,5 +245,33 @@ class CratesBackend(BaseBackend):
             AnityaPluginException: If the URL was unreachable or the response
                 was in an unexpected format.
         """
-        # crates API returns already ordered versions
+        # get_versions returns the versions ordered from newest to oldest
         return cls.get_versions(project)
+
+    @classmethod
+    def prefetch(cls, projects):
+        """
+        Update the clone of the crates.io index and read the versions of the
+        provided projects from it, so checking them does not query crates.io.
+
+        Each project uses the versions prefetched once, the next checks query
+        the API. Nothing is prefetched without ``CRATES_INDEX_PATH``.
+
+        Args:
+            projects (list): The :class:`anitya.lib.model.Project` objects
+                relying on this backend.
+
+        Raises:
+            AnityaPluginException: If the index could not be updated.
+        """
+        path = anitya.app.APP.config.get('CRATES_INDEX_PATH')
+        if not path:
+            return
+        index = crates_index.CratesIndex(path)
+        index.update(max_age=anitya.app.APP.config.get('CRATES_INDEX_TTL', 0))
+        versions = index.resolve(project.name for project in projects)
+        with _prefetched_lock:
+            _prefetched.clear()
+            for name, crate_versions in versions.items():
+                if crate_versions is not None:
+                    _prefetched[name.lower()] = crate_versions
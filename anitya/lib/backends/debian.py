@@ -28,6 +28,7 @@ class DebianBackend(BaseBackend):
     '''
 
     name = 'Debian project'
+    host = 'ftp.debian.org'
     examples = [
         'http://ftp.debian.org/debian/pool/main/q/qpdf/',
         'http://ftp.debian.org/debian/pool/main/g/guake/',
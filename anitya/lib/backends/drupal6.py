@@ -23,6 +23,7 @@ class Drupal6Backend(BaseBackend):
     '''
 
     name = 'Drupal6'
+    host = 'updates.drupal.org'
     examples = [
         'https://www.drupal.org/project/pathauto',
         'https://www.drupal.org/project/wysiwyg',
@@ -23,6 +23,7 @@ class Drupal7Backend(BaseBackend):
     '''
 
     name = 'Drupal7'
+    host = 'updates.drupal.org'
     examples = [
         'https://www.drupal.org/project/pathauto',
         'https://www.drupal.org/project/wysiwyg',
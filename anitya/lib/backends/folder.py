@@ -9,9 +9,8 @@
 """
 
 from anitya.lib.backends import (
-    BaseBackend, get_versions_by_regex_for_text, REGEX)
+    BaseBackend, call_url_if_modified, get_versions_by_regex_for_text, REGEX)
 from anitya.lib.exceptions import AnityaPluginException
-import six
 
 DEFAULT_REGEX = 'href="([0-9][0-9.]*)/"'
 
@@ -62,16 +61,9 @@ class FolderBackend(BaseBackend):
         '''
         url = project.version_url
 
-        try:
-            req = cls.call_url(url, insecure=project.insecure)
-        except Exception as err:
-            raise AnityaPluginException(
-                'Could not call : "%s" of "%s", with error: %s' % (
-                    url, project.name, str(err)))
+        req = call_url_if_modified(url, project, insecure=project.insecure)
 
         versions = None
-        if not isinstance(req, six.string_types):
-            req = req.text
 
         try:
             regex = REGEX % {'name': project.name.replace('+', '\+')}
@@ -22,6 +22,7 @@ class FreshmeatBackend(BaseBackend):
     '''
 
     name = 'Freshmeat'
+    host = 'freshmeat.net'
     examples = [
         'http://freecode.com/projects/atmail',
         'http://freecode.com/projects/awstats',
@@ -8,21 +8,54 @@
 
 """
 
-from anitya.lib.backends import BaseBackend, get_versions_by_regex
+import logging
+import threading
+
+import requests
+
+import anitya.app
+from anitya.lib import (
+    circuit_breaker, http_transport, rate_limit, run_stats, scheduler)
+from anitya.lib.backends import (
+    BaseBackend, get_versions_by_regex, http_session, strip_version_prefix)
 from anitya.lib.exceptions import AnityaPluginException
 
 
 REGEX = 'class="tag-name">([^<]*)</span'
 
+# The GraphQL endpoint of the GitHub API, which requires a token.
+API_URL = 'https://api.github.com/graphql'
+
+# The number of repositories queried by a single GraphQL request.
+BATCH_SIZE = 50
+
+# The number of tags returned per repository and request, the most allowed.
+PAGE_SIZE = 100
+
+# The maximum number of pages of tags read for a repository.
+MAX_PAGES = 10
+
+_log = logging.getLogger(__name__)
+
+# The tags prefetched for the cron run, by repository, see GithubBackend.prefetch
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
 
 class GithubBackend(BaseBackend):
     ''' The custom class for projects hosted on github.com.
 
     This backend allows to specify a version_url and a regex that will
     be used to retrieve the version information.
+
+    If the ``GITHUB_ACCESS_TOKEN`` setting is set, the tags are retrieved from
+    the GraphQL API of GitHub rather than from the ``/tags`` page, and the
+    cron job retrieves the tags of many repositories at once, see
+    :meth:`prefetch`.
     '''
 
     name = 'GitHub'
+    host = 'github.com'
     examples = [
         'https://github.com/fedora-infra/fedocal',
         'https://github.com/fedora-infra/pkgdb2',
@@ -59,18 +92,210 @@ class GithubBackend(BaseBackend):
             when the versions cannot be retrieved correctly
 
         '''
-        if project.version_url:
-            url_template = 'https://github.com/%(version_url)s/tags'
-            version_url = project.version_url.replace(
-                'https://github.com/', '')
-            url = url_template % {'version_url': version_url}
-        elif project.homepage.startswith('https://github.com'):
-            url = project.homepage
-            if url.endswith('/'):
-                url = project.homepage[:-1]
-            url += '/tags'
-        else:
+        repository = get_repository(project)
+        if repository is None:
             raise AnityaPluginException(
                 'Project %s was incorrectly set-up' % project.name)
 
-        return get_versions_by_regex(url, REGEX, project)
+        token = anitya.app.APP.config.get('GITHUB_ACCESS_TOKEN')
+        if not token:
+            url = 'https://github.com/%s/tags' % repository
+            return get_versions_by_regex(url, REGEX, project)
+
+        with _prefetched_lock:
+            tags = _prefetched.pop(repository.lower(), None)
+        if tags is None:
+            tags = fetch_tags([repository], token)[repository]
+        if tags is None:
+            raise AnityaPluginException(
+                'No repository %s found on GitHub for %s' % (
+                    repository, project.name))
+        if not tags:
+            raise AnityaPluginException(
+                '%s: no upstream version found. - %s' % (
+                    project.name, repository))
+        return [strip_version_prefix(tag, project) for tag in tags]
+
+    @classmethod
+    def prefetch(cls, projects):
+        ''' Retrieve the tags of the repositories of the provided projects
+        with batched GraphQL queries, so checking them does not query GitHub
+        again.
+
+        Each project uses the tags prefetched once, the next checks query
+        GitHub again. Nothing is prefetched without ``GITHUB_ACCESS_TOKEN``.
+
+        :arg list projects: the :class:`model.Project` objects relying on
+            this backend.
+        :raise AnityaPluginException: if the tags could not be retrieved.
+        :raise RateLimited: if GitHub rate limited a request.
+
+        '''
+        token = anitya.app.APP.config.get('GITHUB_ACCESS_TOKEN')
+        if not token:
+            return
+        repositories = set(
+            repository for repository in map(get_repository, projects)
+            if repository is not None)
+        tags = fetch_tags(sorted(repositories), token)
+        with _prefetched_lock:
+            _prefetched.clear()
+            for repository, names in tags.items():
+                if names is not None:
+                    _prefetched[repository.lower()] = names
+
+
+def get_repository(project):
+    ''' Return the ``owner/name`` of the GitHub repository of a project.
+
+    This is its ``version_url``, possibly as a URL, or else the path of its
+    homepage if it is on https://github.com.
+
+    :arg Project project: a :class:`model.Project` object.
+    :return: the repository, or ``None`` if the project does not tell it.
+    :return type: str
+
+    '''
+    if project.version_url:
+        repository = project.version_url.replace('https://github.com/', '')
+    elif (project.homepage or '').startswith('https://github.com'):
+        repository = project.homepage.replace('https://github.com', '')
+    else:
+        return None
+    return repository.strip('/') or None
+
+
+def _query(repositories, cursors):
+    ''' Build the GraphQL query of the tags of the provided repositories,
+    starting after the provided cursors, and its variables.
+
+    Each repository gets an alias, ``r0``, ``r1``..., and the owners and
+    names are passed as variables so they need not be escaped. The newest
+    tags come first, so they are not left out of the pages read.
+
+    '''
+    declarations = []
+    fields = []
+    variables = {}
+    for index, repository in enumerate(repositories):
+        owner, _, name = repository.partition('/')
+        declarations.append(
+            '$o%(i)i: String!, $n%(i)i: String!, $c%(i)i: String' % {
+                'i': index})
+        fields.append(
+            'r%(i)i: repository(owner: $o%(i)i, name: $n%(i)i) {'
+            ' refs(refPrefix: "refs/tags/", first: %(size)i, after: $c%(i)i,'
+            ' orderBy: {field: TAG_COMMIT_DATE, direction: DESC})'
+            ' { nodes { name } pageInfo { hasNextPage endCursor } } }' % {
+                'i': index, 'size': PAGE_SIZE})
+        variables.update({
+            'o%i' % index: owner,
+            'n%i' % index: name,
+            'c%i' % index: cursors.get(repository),
+        })
+    query = 'query(%s) { %s }' % (', '.join(declarations), ' '.join(fields))
+    return query, variables
+
+
+def _graphql(query, variables, token):
+    ''' Send a GraphQL query to GitHub and return the ``data`` of the
+    response.
+
+    The request goes through the circuit breaker and the rate limits of the
+    cron run, like the requests of :meth:`BaseBackend.call_url`.
+
+    :raise AnityaPluginException: if GitHub could not be reached, refused
+        the query or did not answer with JSON.
+    :raise RateLimited: if GitHub rate limited the request.
+
+    '''
+    user_agent = 'Anitya %s at upstream-monitoring.org' % \
+        anitya.app.__version__
+    headers = {
+        'User-Agent': user_agent,
+        'From': anitya.app.APP.config.get('ADMIN_EMAIL'),
+        'Authorization': 'bearer %s' % token,
+    }
+    timeout = http_transport.timeout(
+        anitya.app.APP.config, GithubBackend.name)
+    host = 'api.github.com'
+    rate_limit.before(host)
+    try:
+        with circuit_breaker.guard(host) as outcome, scheduler.slot(host):
+            resp = http_session.post(
+                API_URL, json={'query': query, 'variables': variables},
+                headers=headers, timeout=timeout)
+            outcome.failed = \
+                resp.status_code in circuit_breaker.FAILURE_STATUSES
+            rate_limit.after(host, resp)
+    except requests.RequestException as err:
+        raise AnityaPluginException(
+            'Could not call : "%s", with error: %s' % (API_URL, str(err)))
+    run_stats.count_downloaded(resp.content)
+
+    if resp.status_code != 200:
+        raise AnityaPluginException(
+            'Could not call : "%s", with status: %s' % (
+                API_URL, resp.status_code))
+    try:
+        data = resp.json()
+    except ValueError as err:
+        raise AnityaPluginException(
+            'Could not call : "%s", with error: %s' % (API_URL, str(err)))
+    if not isinstance(data, dict) or not isinstance(data.get('data'), dict):
+        raise AnityaPluginException(
+            'Could not call : "%s", with errors: %s' % (
+                API_URL, data.get('errors') if isinstance(data, dict) else data))
+    return data['data']
+
+
+def fetch_tags(repositories, token, batch_size=BATCH_SIZE):
+    ''' Retrieve the tags of the provided repositories with the GraphQL API
+    of GitHub, querying ``batch_size`` repositories per request.
+
+    The repositories having more tags than a request returns are queried
+    again, together, for the next pages, up to :data:`MAX_PAGES` pages.
+
+    :arg list repositories: the ``owner/name`` of the repositories.
+    :arg str token: the access token to the GitHub API.
+    :return: the names of the tags of each repository, ``None`` for the
+        repositories which do not exist.
+    :return type: dict
+    :raise AnityaPluginException: if GitHub could not be reached, refused a
+        query or answered with an unexpected document.
+    :raise RateLimited: if GitHub rate limited a request.
+
+    '''
+    tags = dict((repository, []) for repository in repositories)
+    cursors = {}
+    pages = dict((repository, 0) for repository in repositories)
+    pending = list(repositories)
+    while pending:
+        batch, pending = pending[:batch_size], pending[batch_size:]
+        query, variables = _query(batch, cursors)
+        data = _graphql(query, variables, token)
+        for index, repository in enumerate(batch):
+            try:
+                result = data.get('r%i' % index)
+                if result is None or result.get('refs') is None:
+                    tags[repository] = None
+                    continue
+                refs = result['refs']
+                tags[repository].extend(
+                    node['name'] for node in refs['nodes'])
+                has_next_page = refs['pageInfo']['hasNextPage']
+                end_cursor = refs['pageInfo']['endCursor']
+            except (AttributeError, KeyError, TypeError) as err:
+                raise AnityaPluginException(
+                    'Unexpected answer of "%s" for %s: %r' % (
+                        API_URL, repository, err))
+            pages[repository] += 1
+            if has_next_page:
+                if pages[repository] < MAX_PAGES:
+                    cursors[repository] = end_cursor
+                    pending.append(repository)
+                else:
+                    _log.info(
+                        'Only the first %i tags of %s were retrieved',
+                        len(tags[repository]), repository)
+    return tags
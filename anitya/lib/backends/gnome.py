@@ -53,6 +53,7 @@ class GnomeBackend(BaseBackend):
     '''
 
     name = 'GNOME'
+    host = 'download.gnome.org'
     examples = [
         'https://download.gnome.org/sources/control-center/',
         'https://download.gnome.org/sources/evolution-caldav/',
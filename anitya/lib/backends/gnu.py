@@ -9,7 +9,7 @@
 """
 
 from anitya.lib.backends import (
-    BaseBackend, REGEX, get_versions_by_regex_for_text)
+    BaseBackend, REGEX, call_url_if_modified, get_versions_by_regex_for_text)
 from anitya.lib.exceptions import AnityaPluginException
 
 
@@ -24,6 +24,9 @@ class GnuBackend(BaseBackend):
     '''
 
     name = 'GNU project'
+    host = 'ftp.gnu.org'
+    # The listings of ftp.gnu.org are ASCII
+    encoding = 'utf-8'
     examples = [
         'http://ftp.gnu.org/pub/gnu/gnash/',
     ]
@@ -61,19 +64,15 @@ class GnuBackend(BaseBackend):
         '''
         url = 'http://ftp.gnu.org/gnu/%(name)s/' % {'name': project.name}
 
-        try:
-            req = cls.call_url(url)
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException(
-                'Could not call : "%s" of "%s"' % (url, project.name))
+        text = call_url_if_modified(url, project)
 
         versions = None
         try:
             regex = REGEX % {'name': project.name}
             versions = get_versions_by_regex_for_text(
-                req.text, url, regex, project)
+                text, url, regex, project)
         except AnityaPluginException:
             versions = get_versions_by_regex_for_text(
-                req.text, url, DEFAULT_REGEX, project)
+                text, url, DEFAULT_REGEX, project)
 
         return versions
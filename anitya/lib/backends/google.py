@@ -20,6 +20,7 @@ class GoogleBackend(BaseBackend):
     '''
 
     name = 'Google code'
+    host = 'code.google.com'
     examples = [
         'https://code.google.com/p/abcde/',
         'https://code.google.com/p/arduino/',
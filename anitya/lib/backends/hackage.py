@@ -20,6 +20,7 @@ class HackageBackend(BaseBackend):
     '''
 
     name = 'Hackage'
+    host = 'hackage.haskell.org'
     examples = [
         'http://hackage.haskell.org/package/Hs2lib',
         'http://hackage.haskell.org/package/Biobase',
@@ -20,6 +20,7 @@ class LaunchpadBackend(BaseBackend):
     '''
 
     name = 'Launchpad'
+    host = 'launchpad.net'
     examples = [
         'https://launchpad.net/terminator/',
         'https://launchpad.net/exaile',
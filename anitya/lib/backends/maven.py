@@ -24,6 +24,7 @@ class MavenBackend(BaseBackend):
     ''' Backend for projects hosted on Maven Central '''
 
     name = 'Maven Central'
+    host = 'repo1.maven.org'
     examples = [
         'http://repo1.maven.org/maven2/plexus/plexus-compiler/',
         'http://repo1.maven.org/maven2/com/google/inject/guice/',
@@ -9,9 +9,79 @@
 
 """
 
-from anitya.lib.backends import BaseBackend
+import json
+
+from six.moves.urllib.parse import quote
+
+from anitya.lib import url_cache
+from anitya.lib.backends import BaseBackend, iter_response
 from anitya.lib.exceptions import AnityaPluginException
 
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    # The documents are then decoded at once
+    ijson = None
+
+
+# The CouchDB database replicating the registry, whose changes are followed.
+REPLICATE_URL = 'https://replicate.npmjs.com/'
+
+# The abbreviated metadata of the registry, without the readmes and with
+# only what installing the versions requires from their manifests.
+ABBREVIATED = 'application/vnd.npm.install-v1+json'
+
+
+class _ChunksFile(object):
+    ''' A file-like object reading the provided chunks of bytes. '''
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _parse_metadata(chunks):
+    ''' Return the versions, the dist-tags and the error of the metadata of
+    a package in the provided chunks of a registry document.
+
+    With ijson, the document is parsed as it is read and the manifests of
+    the versions are skipped rather than built.
+
+    '''
+    if ijson is None:
+        data = json.loads(b''.join(chunks).decode('utf-8'))
+        if not isinstance(data, dict):
+            raise ValueError('Not a package document')
+        return (
+            list(data.get('versions') or {}), data.get('dist-tags') or {},
+            data.get('error'))
+
+    versions = []
+    dist_tags = {}
+    error = None
+    tag = None
+    for prefix, event, value in ijson.parse(_ChunksFile(chunks)):
+        if prefix == 'versions' and event == 'map_key':
+            versions.append(value)
+        elif prefix == 'dist-tags' and event == 'map_key':
+            tag = value
+        elif prefix.startswith('dist-tags.') and event == 'string':
+            dist_tags[tag] = value
+        elif prefix == 'error' and event == 'string':
+            error = value
+    return versions, dist_tags, error
+
 
 class NpmjsBackend(BaseBackend):
     ''' The custom class for projects hosted on npmjs.org.
@@ -21,6 +91,7 @@ class NpmjsBackend(BaseBackend):
     '''
 
     name = 'npmjs'
+    host = 'registry.npmjs.org'
     examples = [
         'https://www.npmjs.org/package/request',
         'https://www.npmjs.org/package/colors',
@@ -40,22 +111,9 @@ class NpmjsBackend(BaseBackend):
             when the version cannot be retrieved correctly
 
         '''
-        url_template = 'http://registry.npmjs.org/%(name)s'
-
-        url = url_template % {'name': project.name}
-
-        try:
-            req = cls.call_url(url)
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('Could not contact %s' % url)
-
-        try:
-            data = req.json()
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('No JSON returned by %s' % url)
-
-        if 'dist-tags' in data and 'latest' in data['dist-tags']:
-            return data['dist-tags']['latest']
+        _, dist_tags = cls._get_metadata(project)
+        if 'latest' in dist_tags:
+            return dist_tags['latest']
         else:
             return cls.get_ordered_versions(project)[-1]
 
@@ -74,24 +132,47 @@ class NpmjsBackend(BaseBackend):
             when the versions cannot be retrieved correctly
 
         '''
-        url_template = 'http://registry.npmjs.org/%(name)s'
+        versions, _ = cls._get_metadata(project)
+        return versions
 
-        url = url_template % {'name': project.name}
+    @classmethod
+    def _get_metadata(cls, project):
+        ''' Return the versions and the dist-tags of the package of the
+        provided project, from its abbreviated metadata.
 
-        try:
-            req = cls.call_url(url)
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('Could not contact %s' % url)
+        They are only retrieved once per check, see
+        :func:`anitya.lib.url_cache.check_cache`.
 
-        try:
-            data = req.json()
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('No JSON returned by %s' % url)
+        :raise AnityaPluginException: if the package has no versions.
+
+        '''
+        url_template = 'http://registry.npmjs.org/%(name)s'
 
-        if 'error' in data or 'versions' not in data:
-            raise AnityaPluginException('No versions found at %s' % url)
+        url = url_template % {'name': project.name}
 
-        return list(data['versions'].keys())
+        def fetch():
+            try:
+                req = cls.call_url(
+                    url, headers={'Accept': ABBREVIATED}, stream=True)
+            except Exception:  # pragma: no cover
+                raise AnityaPluginException('Could not contact %s' % url)
+
+            try:
+                versions, dist_tags, error = _parse_metadata(
+                    iter_response(req, url))
+            except AnityaPluginException:
+                raise
+            except Exception:
+                raise AnityaPluginException('No JSON returned by %s' % url)
+
+            if error or not versions:
+                raise AnityaPluginException('No versions found at %s' % url)
+            return versions, dist_tags
+
+        cache = url_cache.get_check_cache()
+        if cache is None:
+            return fetch()
+        return cache.get(('npm', url), fetch)
 
     @classmethod
     def check_feed(cls):
@@ -117,3 +198,53 @@ class NpmjsBackend(BaseBackend):
                 name = item['name']
                 homepage = 'http://npmjs.org/package/%s' % name
                 yield name, homepage, cls.name, version
+
+    @classmethod
+    def get_update_seq(cls):
+        ''' Return the sequence of the last change of the registry, to
+        follow its changes from now on.
+
+        :return: the sequence
+        :return type: str
+        :raise AnityaPluginException: if the registry cannot be queried.
+
+        '''
+        data = cls.call_json(REPLICATE_URL)
+        try:
+            return str(data['update_seq'])
+        except (KeyError, TypeError):
+            raise AnityaPluginException(
+                'No update sequence returned by %s' % REPLICATE_URL)
+
+    @classmethod
+    def get_changes(cls, since, limit):
+        ''' Return the packages changed in the registry after the provided
+        sequence, from its CouchDB ``_changes`` feed.
+
+        :arg str since: the sequence to start after.
+        :arg int limit: the maximum number of changes returned.
+        :return: a tuple of the names of the packages changed, without the
+            deleted ones, and of the sequence to continue from, which is
+            ``since`` when there were no changes.
+        :return type: tuple
+        :raise AnityaPluginException: if the registry cannot be queried.
+
+        '''
+        url = '%s_changes?since=%s&limit=%i' % (
+            REPLICATE_URL, quote(str(since), safe=''), limit)
+        data = cls.call_json(url)
+        try:
+            results = data['results']
+            last_seq = data.get('last_seq')
+        except (KeyError, TypeError):
+            raise AnityaPluginException('No changes returned by %s' % url)
+
+        names = []
+        for change in results:
+            name = change.get('id')
+            if name and not change.get('deleted') \
+                    and not name.startswith('_design/'):
+                names.append(name)
+        if not results or last_seq is None:
+            return names, since
+        return names, str(last_seq)
@@ -21,6 +21,7 @@ class PackagistBackend(BaseBackend):
     '''
 
     name = 'Packagist'
+    host = 'packagist.org'
     examples = [
         'https://packagist.org/packages/phpunit/php-code-coverage',
         'https://packagist.org/packages/phpunit/php-timer',
@@ -18,6 +18,7 @@ class PagureBackend(BaseBackend):
     ''' The pagure class for project hosted on pagure.io. '''
 
     name = 'pagure'
+    host = 'pagure.io'
     examples = [
         'https://pagure.io/pagure',
         'https://pagure.io/flask-multistatic',
@@ -39,6 +39,7 @@ class PearBackend(BaseBackend):
     '''
 
     name = 'PEAR'
+    host = 'pear.php.net'
     examples = [
         'http://pear.php.net/package/Auth/',
         'http://pear.php.net/package/PHP_UML',
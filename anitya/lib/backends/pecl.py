@@ -39,6 +39,7 @@ class PeclBackend(BaseBackend):
     '''
 
     name = 'PECL'
+    host = 'pecl.php.net'
     examples = [
         'http://pecl.php.net/package/inotify',
         'http://pecl.php.net/package/gnupg',
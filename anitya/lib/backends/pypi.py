@@ -19,6 +19,7 @@ class PypiBackend(BaseBackend):
     ''' The PyPI class for project hosted on PyPI. '''
 
     name = 'PyPI'
+    host = 'pypi.python.org'
     examples = [
         'https://pypi.python.org/pypi/arrow',
         'https://pypi.python.org/pypi/fedmsg',
@@ -39,15 +40,7 @@ class PypiBackend(BaseBackend):
 
         '''
         url = 'https://pypi.python.org/pypi/%s/json' % project.name
-        try:
-            req = cls.call_url(url)
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('Could not contact %s' % url)
-
-        try:
-            data = req.json()
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('No JSON returned by %s' % url)
+        data = cls.call_json(url)
 
         return data['info']['version']
 
@@ -67,15 +60,7 @@ class PypiBackend(BaseBackend):
 
         '''
         url = 'https://pypi.python.org/pypi/%s/json' % project.name
-        try:
-            req = cls.call_url(url)
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('Could not contact %s' % url)
-
-        try:
-            data = req.json()
-        except Exception:  # pragma: no cover
-            raise AnityaPluginException('No JSON returned by %s' % url)
+        data = cls.call_json(url)
 
         return list(data['releases'].keys())
 
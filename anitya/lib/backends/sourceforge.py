@@ -19,6 +19,7 @@ class SourceforgeBackend(BaseBackend):
     '''
 
     name = 'Sourceforge'
+    host = 'sourceforge.net'
     examples = [
         'http://sourceforge.net/projects/filezilla/',
         'http://sourceforge.net/projects/file-folder-ren/',
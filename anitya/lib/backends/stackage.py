@@ -17,6 +17,7 @@ class StackageBackend(BaseBackend):
     '''
 
     name = 'Stackage'
+    host = 'www.stackage.org'
     examples = [
         'https://www.stackage.org/package/conduit',
         'https://www.stackage.org/package/cabal-install',
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A circuit breaker for each upstream host, during a single cron run.
+
+When a host is down, every check querying it used to wait for the timeout of
+its requests, holding a worker all along. While a breaker is active (see
+:func:`run_breaker`), :meth:`anitya.lib.backends.BaseBackend.call_url` counts
+the consecutive failures of each host: once there are too many of them the
+circuit of the host opens and its requests fail right away with
+:class:`anitya.lib.exceptions.CircuitOpen`. After a cooldown, a single request
+is let through to probe the host ("half-open" circuit): the circuit closes
+again if it succeeds, and stays open for another cooldown otherwise.
+
+A host fails when it cannot be reached, does not answer in time, or answers
+with a ``502``, ``503`` or ``504`` status.
+
+No breaker is active by default so the web application always queries
+upstream.
+"""
+
+import contextlib
+import ftplib
+import logging
+import threading
+import time
+
+import requests
+
+from anitya.lib import run_stats
+from anitya.lib.exceptions import CircuitOpen
+
+
+_log = logging.getLogger(__name__)
+
+_active = None
+
+# The circuit which short-circuited a request of the check of each thread
+_local = threading.local()
+
+# The statuses telling that a host, rather than a request, is failing.
+FAILURE_STATUSES = (502, 503, 504)
+
+
+class _Circuit(object):
+    """The state of the circuit of a host."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_on = None
+        self.probing = False
+
+
+class Outcome(object):
+    """
+    The outcome of a request made in :meth:`CircuitBreaker.guard`.
+
+    Attributes:
+        failed (bool): Whether the host failed although the request did not
+            raise an exception, because of the status of its response.
+    """
+
+    def __init__(self):
+        self.failed = False
+
+
+class CircuitBreaker(object):
+    """
+    A thread-safe circuit breaker for each host.
+
+    Args:
+        threshold (int): The number of consecutive failures of a host after
+            which its circuit opens.
+        cooldown (int): The number of seconds after which an open circuit
+            lets a request through to probe the host. ``None`` keeps it open
+            for the rest of the run.
+
+    Attributes:
+        short_circuited (int): The number of requests which failed right away.
+    """
+
+    def __init__(self, threshold=5, cooldown=600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def before(self, host, now=None):
+        """
+        Check that a request may be made to a host.
+
+        Args:
+            host (str): The host.
+            now (float): The current time, defaults to :func:`time.time`.
+
+        Raises:
+            CircuitOpen: If the circuit of the host is open, or half-open and
+                probed by another request already.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.opened_on is None:
+                return
+            if circuit.probing or self.cooldown is None \
+                    or now - circuit.opened_on < self.cooldown:
+                self.short_circuited += 1
+                run_stats.count_short_circuited()
+                error = CircuitOpen(host)
+                remember(error)
+                raise error
+            circuit.probing = True
+        _log.info('Probing %s', host)
+
+    def success(self, host):
+        """
+        Record that a host answered, closing its circuit.
+
+        Args:
+            host (str): The host.
+        """
+        with self._lock:
+            circuit = self._circuits.pop(host, None)
+        if circuit is not None and circuit.opened_on is not None:
+            _log.warning('%s is back, closing its circuit', host)
+
+    def failure(self, host, now=None):
+        """
+        Record that a host failed, opening its circuit if it failed too many
+        times in a row or if the request was probing it.
+
+        Args:
+            host (str): The host.
+            now (float): The current time, defaults to :func:`time.time`.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            circuit.failures += 1
+            if circuit.probing:
+                circuit.probing = False
+                circuit.opened_on = now
+                return
+            if circuit.opened_on is not None \
+                    or circuit.failures < self.threshold:
+                return
+            circuit.opened_on = now
+        _log.warning(
+            '%s failed %i times in a row, opening its circuit',
+            host, circuit.failures)
+
+    @contextlib.contextmanager
+    def guard(self, host):
+        """
+        Context manager making a request to a host in the block, unless its
+        circuit is open.
+
+        The host fails if the block raises a :class:`requests.ConnectionError`,
+        a :class:`requests.Timeout` or, for the FTP requests, an
+        :class:`EnvironmentError`, or if it sets the ``failed`` attribute of
+        the :class:`Outcome` it is given. The exceptions are propagated.
+
+        Args:
+            host (str): The host.
+
+        Yields:
+            Outcome: The outcome of the request.
+
+        Raises:
+            CircuitOpen: If the circuit of the host is open.
+        """
+        self.before(host)
+        outcome = Outcome()
+        try:
+            yield outcome
+        except Exception as err:
+            if is_host_failure(err):
+                self.failure(host)
+            else:
+                self.success(host)
+            raise
+        if outcome.failed:
+            self.failure(host)
+        else:
+            self.success(host)
+
+    def open_hosts(self):
+        """
+        Return the hosts whose circuit is open.
+
+        Returns:
+            list: The hosts, sorted.
+        """
+        with self._lock:
+            return sorted(
+                host for host, circuit in self._circuits.items()
+                if circuit.opened_on is not None)
+
+
+def is_host_failure(error):
+    """
+    Return whether an exception raised by a request tells that the host is
+    failing.
+
+    Args:
+        error (Exception): The exception.
+
+    Returns:
+        bool: ``True`` for connection errors and timeouts.
+    """
+    if isinstance(error, requests.RequestException):
+        # Invalid URLs and the like are not the fault of the host
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return isinstance(error, (EnvironmentError, EOFError, ftplib.error_temp))
+
+
+def get_breaker():
+    """
+    Return the breaker currently active.
+
+    Returns:
+        CircuitBreaker: The active breaker, or ``None``.
+    """
+    return _active
+
+
+@contextlib.contextmanager
+def guard(host):
+    """
+    Context manager guarding a request to a host with the active breaker,
+    see :meth:`CircuitBreaker.guard`.
+
+    Args:
+        host (str): The host.
+
+    Yields:
+        Outcome: The outcome of the request.
+    """
+    breaker = _active
+    if breaker is None:
+        yield Outcome()
+        return
+    with breaker.guard(host) as outcome:
+        yield outcome
+
+
+def current():
+    """
+    Return the error remembered for the check of the current thread.
+
+    Returns:
+        CircuitOpen: The error, or ``None`` if no request was short-circuited.
+    """
+    return getattr(_local, 'open', None)
+
+
+def remember(error):
+    """
+    Remember for :func:`check` that a request of the check of the current
+    thread was short-circuited, for example since it shared the request of
+    another thread, see :class:`anitya.lib.url_cache.UrlCache`.
+
+    Args:
+        error (CircuitOpen): The error the request raised.
+    """
+    _local.open = error
+
+
+@contextlib.contextmanager
+def check():
+    """
+    Context manager raising :class:`anitya.lib.exceptions.CircuitOpen` if a
+    request of the check made in the block was short-circuited, whatever the
+    exception the backend raised, so the check is not taken for a failure
+    of the project.
+    """
+    _local.open = None
+    try:
+        yield
+    except CircuitOpen:
+        raise
+    except Exception:
+        error = _local.open
+        if error is not None:
+            raise error
+        raise
+    finally:
+        _local.open = None
+
+
+@contextlib.contextmanager
+def run_breaker(threshold=5, cooldown=600):
+    """
+    Context manager activating a new :class:`CircuitBreaker` for all the
+    threads.
+
+    Args:
+        threshold (int): The number of consecutive failures of a host after
+            which its circuit opens.
+        cooldown (int): The number of seconds after which an open circuit is
+            probed, ``None`` keeps it open for the rest of the run.
+
+    Yields:
+        CircuitBreaker: The breaker activated.
+    """
+    global _active
+    previous = _active
+    _active = CircuitBreaker(threshold=threshold, cooldown=cooldown)
+    try:
+        yield _active
+    finally:
+        _active = previous
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A local mirror of the index of `crates.io <https://crates.io/>`_.
+
+The index is a git repository with a file per crate, listing its versions
+in the order they were published, one JSON document per line::
+
+    {"name":"itoa","vers":"0.2.1","deps":[],"cksum":"...","features":{},"yanked":false}
+
+The crates whose name has one or two characters are in the ``1/`` and
+``2/`` directories, those with three characters are in ``3/<first
+character>/``, and the others in ``<first two characters>/<next two
+characters>/``, all in lower case.
+
+:class:`CratesIndex` keeps a clone of the repository up to date, fetching
+only the commits it misses, so the versions of all the crates Anitya tracks
+can be read from local files, see
+:meth:`anitya.lib.backends.crates.CratesBackend.prefetch`.
+"""
+
+import io
+import json
+import logging
+import os
+import subprocess
+import time
+
+from anitya.lib.exceptions import AnityaPluginException
+
+
+# The git repository of the index.
+INDEX_URL = 'https://github.com/rust-lang/crates.io-index'
+
+_log = logging.getLogger(__name__)
+
+
+def crate_path(name):
+    """
+    Return the path of the file of a crate, relative to the index.
+
+    Args:
+        name (str): The name of the crate.
+
+    Returns:
+        str: The path.
+    """
+    name = name.lower()
+    if len(name) <= 2:
+        return os.path.join(str(len(name)), name)
+    if len(name) == 3:
+        return os.path.join('3', name[0], name)
+    return os.path.join(name[:2], name[2:4], name)
+
+
+class CratesIndex(object):
+    """
+    A clone of the index of crates.io.
+
+    Args:
+        path (str): The directory of the clone, created if it does not exist.
+        url (str): The URL of the git repository of the index.
+    """
+
+    def __init__(self, path, url=INDEX_URL):
+        self.path = path
+        self.url = url
+
+    def _git(self, *args):
+        """Run a git command in the clone."""
+        try:
+            subprocess.check_output(
+                ('git',) + args, cwd=self.path, stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError) as err:
+            output = getattr(err, 'output', b'') or b''
+            raise AnityaPluginException(
+                'Could not update the crates.io index in %s: %s %s' % (
+                    self.path, err, output.decode('utf-8', 'replace')))
+
+    def age(self, now=None):
+        """
+        Return the number of seconds since the clone was last updated.
+
+        Args:
+            now (float): The current time, defaults to :func:`time.time`.
+
+        Returns:
+            float: The age, or ``None`` if there is no clone.
+        """
+        now = time.time() if now is None else now
+        for stamp in ('FETCH_HEAD', 'HEAD'):
+            try:
+                return now - os.path.getmtime(
+                    os.path.join(self.path, '.git', stamp))
+            except OSError:
+                continue
+        return None
+
+    def update(self, max_age=0):
+        """
+        Clone the index, or fetch the commits the clone misses, unless it was
+        updated less than ``max_age`` seconds ago.
+
+        The history of the index is squashed from time to time, the clone is
+        thus reset to what was fetched rather than merged with it.
+
+        Args:
+            max_age (int): The number of seconds the clone stays fresh.
+
+        Raises:
+            AnityaPluginException: If git failed.
+        """
+        age = self.age()
+        if age is None:
+            _log.info('Cloning the crates.io index in %s', self.path)
+            parent = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            try:
+                subprocess.check_output(
+                    ['git', 'clone', '--quiet', self.url, self.path],
+                    stderr=subprocess.STDOUT)
+            except (OSError, subprocess.CalledProcessError) as err:
+                raise AnityaPluginException(
+                    'Could not clone the crates.io index in %s: %s' % (
+                        self.path, err))
+            return
+        if age < max_age:
+            return
+        _log.info('Updating the crates.io index in %s', self.path)
+        self._git('fetch', '--quiet', self.url, 'HEAD')
+        self._git('reset', '--quiet', '--hard', 'FETCH_HEAD')
+
+    def versions(self, name):
+        """
+        Return the versions of a crate which were not yanked, in the order
+        they were published. A backport may thus come after newer versions.
+
+        Args:
+            name (str): The name of the crate.
+
+        Returns:
+            list: The versions, or ``None`` if the crate is not in the index.
+        """
+        try:
+            stream = io.open(
+                os.path.join(self.path, crate_path(name)), encoding='utf-8')
+        except IOError:
+            return None
+        versions = []
+        with stream:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    _log.warning('Invalid entry in the index of %s', name)
+                    continue
+                if not entry.get('yanked') and entry.get('vers'):
+                    versions.append(entry['vers'])
+        return versions
+
+    def resolve(self, names):
+        """
+        Return the versions of the provided crates, see :meth:`versions`.
+
+        Args:
+            names (iterable): The names of the crates.
+
+        Returns:
+            dict: The versions of each crate, ``None`` for the crates which
+                are not in the index.
+        """
+        return dict((name, self.versions(name)) for name in set(names))
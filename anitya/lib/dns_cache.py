@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A cache of the host names resolved during a single cron run.
+
+A run resolves the same few hundred host names over and over, once per
+connection :meth:`anitya.lib.backends.BaseBackend.call_url` opens. While a
+cache is active (see :func:`run_resolver`), :func:`socket.getaddrinfo` is
+replaced by :meth:`DnsCache.getaddrinfo` for all the threads, so both the
+HTTP(S) connections of :mod:`requests` and the FTP connections of
+:mod:`anitya.lib.ftp_pool` use the addresses resolved already. Threads
+resolving a name which is being resolved wait for that lookup rather than
+making their own.
+
+The system resolver does not tell the time to live of its answers, the
+addresses are thus kept for a fixed number of seconds which should not
+exceed the TTL of the records of the upstream hosts. Lookups which failed
+are kept for a shorter time, so a resolver hiccup does not fail the checks
+of a host for the rest of the run. Each failure is counted by
+:func:`anitya.lib.run_stats.count_resolver_error`, apart from the other
+errors of the check.
+
+No cache is active by default so the web application always resolves the
+names.
+"""
+
+import contextlib
+import socket
+import threading
+import time
+
+from anitya.lib import run_stats
+
+
+_active = None
+
+# The resolver of the socket module, called on cache misses.
+_getaddrinfo = socket.getaddrinfo
+
+
+class _Entry(object):
+    """The addresses, or error, of a lookup, once it completed."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.expires_on = None
+
+
+class DnsCache(object):
+    """
+    A thread-safe cache of the answers of :func:`socket.getaddrinfo`.
+
+    Args:
+        ttl (int): The number of seconds the addresses of a name are kept.
+        negative_ttl (int): The number of seconds a failed lookup is kept.
+
+    Attributes:
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups made.
+        errors (int): The number of lookups which failed, including the
+            failures answered from the cache.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """
+        Resolve a host name like :func:`socket.getaddrinfo` does, unless its
+        addresses are cached or being resolved already.
+
+        Returns:
+            list: The 5-tuples of :func:`socket.getaddrinfo`.
+
+        Raises:
+            socket.gaierror: If the name could not be resolved.
+        """
+        if host is None:
+            return _getaddrinfo(host, port, family, type, proto, flags)
+
+        key = (host, port, family, type, proto, flags)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None or (
+                entry.done.is_set() and entry.expires_on <= now)
+            if owner:
+                self.misses += 1
+                entry = self._entries[key] = _Entry()
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                entry.value = _getaddrinfo(host, port, family, type, proto, flags)
+                entry.expires_on = time.time() + self.ttl
+            except socket.gaierror as err:
+                entry.error = err
+                entry.expires_on = time.time() + self.negative_ttl
+            except Exception:
+                # Not an answer of the resolver, the next lookup tries again
+                with self._lock:
+                    del self._entries[key]
+                raise
+            finally:
+                entry.done.set()
+        else:
+            entry.done.wait()
+
+        if entry.error is not None:
+            with self._lock:
+                self.errors += 1
+            run_stats.count_resolver_error()
+            raise entry.error
+        return list(entry.value)
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """Replacement of :func:`socket.getaddrinfo` using the active cache."""
+    cache = _active
+    if cache is None:
+        return _getaddrinfo(host, port, family, type, proto, flags)
+    return cache.getaddrinfo(host, port, family, type, proto, flags)
+
+
+def get_cache():
+    """
+    Return the cache currently active.
+
+    Returns:
+        DnsCache: The active cache, or ``None``.
+    """
+    return _active
+
+
+@contextlib.contextmanager
+def run_resolver(ttl=300, negative_ttl=30):
+    """
+    Context manager activating a new :class:`DnsCache` for all the threads.
+
+    Args:
+        ttl (int): The number of seconds the addresses of a name are kept.
+        negative_ttl (int): The number of seconds a failed lookup is kept.
+
+    Yields:
+        DnsCache: The cache activated.
+    """
+    global _active
+    previous = _active
+    previous_getaddrinfo = socket.getaddrinfo
+    _active = DnsCache(ttl=ttl, negative_ttl=negative_ttl)
+    socket.getaddrinfo = _cached_getaddrinfo
+    try:
+        yield _active
+    finally:
+        _active = previous
+        socket.getaddrinfo = previous_getaddrinfo
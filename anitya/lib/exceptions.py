@@ -23,6 +23,8 @@ Authors:
     Pierre-Yves Chibon <pingou@pingoured.fr>
 """
 
+import time
+
 
 class AnityaException(Exception):
     ''' Generic class covering all the exceptions generated by anitya. '''
@@ -36,6 +38,80 @@ class AnityaPluginException(AnityaException):
     pass
 
 
+class UpstreamNotModified(AnityaException):
+    """
+    Raised by the backends when upstream answered a conditional request with
+    ``304 Not Modified``: the versions of the project did not change since
+    they were last retrieved.
+
+    Args:
+        url (str): The URL which was not modified.
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def __str__(self):
+        return '{url} was not modified'.format(url=self.url)
+
+
+class ResponseTooLarge(AnityaPluginException):
+    """
+    Raised when a response from upstream is larger than the
+    ``MAX_RESPONSE_SIZE`` setting. It is aborted as soon as this is noticed.
+
+    Args:
+        url (str): The URL requested.
+        max_size (int): The maximum size of a response, in bytes.
+    """
+
+    def __init__(self, url, max_size):
+        self.url = url
+        self.max_size = max_size
+
+    def __str__(self):
+        return '{url} is larger than {size} bytes'.format(
+            url=self.url, size=self.max_size)
+
+
+class CircuitOpen(AnityaPluginException):
+    """
+    Raised instead of querying an upstream host which failed too many times
+    in a row during the run, see :mod:`anitya.lib.circuit_breaker`.
+
+    Args:
+        host (str): The host which is failing.
+    """
+
+    def __init__(self, host):
+        self.host = host
+
+    def __str__(self):
+        return '{host} is failing, it is not queried for now'.format(
+            host=self.host)
+
+
+class RateLimited(AnityaException):
+    """
+    Raised when an upstream host rate limits the requests of a check, see
+    :mod:`anitya.lib.rate_limit`. The check did not fail, it should be made
+    again once the host accepts requests.
+
+    Args:
+        host (str): The host.
+        retry_at (float): When requests may be made to the host again, as a
+            timestamp.
+    """
+
+    def __init__(self, host, retry_at):
+        self.host = host
+        self.retry_at = retry_at
+
+    def __str__(self):
+        return '{host} is rate limited for {delay:.0f}s'.format(
+            host=self.host, delay=max(self.retry_at - time.time(), 0))
+
+
 class ProjectExists(AnityaException):
     """
     Raised when a project already exists in the database.
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A pool of FTP connections for the ``ftp://`` and ``ftps://`` URLs.
+
+:meth:`anitya.lib.backends.BaseBackend.call_url` used to open a new control
+connection, and log in, for every FTP URL it was given, including every
+directory :meth:`anitya.lib.backends.BaseBackend.expand_subdirs` walks. The
+:class:`FtpPool` keeps the logged in control connections of each server
+instead, so the following requests to that server only open a data
+connection. Each connection has its own timeout.
+
+Directories are listed with ``MLSD`` where the server supports it, which
+tells files and directories apart without parsing the output of ``LIST``,
+and with ``NLST`` otherwise, or ``LIST`` when the directories are needed.
+"""
+
+import collections
+import ftplib
+import logging
+import threading
+import time
+
+from six.moves.urllib.parse import unquote, urlparse
+
+from anitya.lib.exceptions import ResponseTooLarge
+
+
+_log = logging.getLogger(__name__)
+
+# The replies of servers which do not implement a command.
+_NOT_IMPLEMENTED = ('500', '501', '502', '504')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+#: A file or directory listed by :meth:`FtpPool.list`.
+Entry = collections.namedtuple('Entry', ('name', 'is_dir'))
+
+
+class _Connection(object):
+    """A logged in control connection and what the server supports."""
+
+    def __init__(self, ftp):
+        self.ftp = ftp
+        self.mlsd = hasattr(ftp, 'mlsd')
+        self.released_on = None
+
+
+class FtpPool(object):
+    """
+    A thread-safe pool of FTP control connections, by server.
+
+    Args:
+        timeout (int): The timeout of the connections, in seconds.
+        max_idle (int): The maximum number of idle connections kept for each
+            server.
+        idle_timeout (int): The number of seconds after which an idle
+            connection is closed rather than used, servers drop them anyway.
+        password (str): The password used to log in anonymously, the email
+            address of the administrator is customary.
+    """
+
+    def __init__(self, timeout=30, max_idle=2, idle_timeout=60, password=''):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.password = password
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(list)
+
+    @staticmethod
+    def _server(parsed):
+        """Return the key of the server of a parsed URL."""
+        return (
+            parsed.scheme, (parsed.hostname or '').lower(), parsed.port or 21,
+            parsed.username or 'anonymous')
+
+    def _connect(self, parsed):
+        """Open a control connection to the server of a parsed URL."""
+        if parsed.scheme == 'ftps':
+            ftp = ftplib.FTP_TLS(timeout=self.timeout)
+        else:
+            ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(parsed.hostname, parsed.port or 21)
+        if parsed.username:
+            ftp.login(unquote(parsed.username), unquote(parsed.password or ''))
+        else:
+            ftp.login('anonymous', self.password)
+        if parsed.scheme == 'ftps':
+            ftp.prot_p()
+        return _Connection(ftp)
+
+    def _acquire(self, parsed):
+        """Return an idle connection to a server, or a new one."""
+        server = self._server(parsed)
+        now = time.time()
+        stale = []
+        connection = None
+        with self._lock:
+            idle = self._idle[server]
+            while idle:
+                candidate = idle.pop()
+                if now - candidate.released_on < self.idle_timeout:
+                    connection = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            _close(candidate)
+        if connection is None:
+            connection = self._connect(parsed)
+        return connection, server
+
+    def _release(self, connection, server):
+        """Put a connection back in the pool, unless it is full."""
+        connection.released_on = time.time()
+        with self._lock:
+            idle = self._idle[server]
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        _close(connection)
+
+    def _run(self, url, command):
+        """
+        Call ``command`` with a connection to the server of ``url`` and the
+        path of ``url``, once more with a new connection if an idle one was
+        dropped by the server.
+        """
+        parsed = urlparse(url)
+        path = unquote(parsed.path) or '/'
+        for attempt in (1, 2):
+            connection, server = self._acquire(parsed)
+            reused = connection.released_on is not None
+            try:
+                result = command(connection, path)
+            except ftplib.error_perm:
+                # The connection is fine, the request was refused
+                self._release(connection, server)
+                raise
+            except (EnvironmentError, EOFError, ftplib.Error):
+                _close(connection)
+                if reused and attempt == 1:
+                    continue
+                raise
+            except Exception:
+                _close(connection)
+                raise
+            self._release(connection, server)
+            return result
+
+    def list(self, url, dirs=False):
+        """
+        List the directory at the provided URL.
+
+        Args:
+            url (str): The ``ftp://`` or ``ftps://`` URL of the directory.
+            dirs (bool): Whether the entries which are directories are needed,
+                otherwise ``NLST`` is enough and ``is_dir`` is ``None``.
+
+        Returns:
+            list: The :class:`Entry` objects of the directory, except ``.``
+                and ``..``.
+
+        Raises:
+            ftplib.Error: If the server refused the request.
+            EnvironmentError: If the server could not be reached.
+        """
+        def command(connection, path):
+            return _list(connection, path, dirs)
+        return self._run(url, command)
+
+    def retrieve(self, url, max_size):
+        """
+        Return the content of the file at the provided URL, or the listing of
+        the directory at that URL, like the ``urllib`` FTP handler does.
+
+        The listing is the output of the ``LIST`` command, as the ``urllib``
+        FTP handler returned it, so the regular expressions of the projects
+        see the same text.
+
+        Args:
+            url (str): The ``ftp://`` or ``ftps://`` URL.
+            max_size (int): The maximum size of the content, in bytes.
+
+        Returns:
+            bytes: The content.
+
+        Raises:
+            ResponseTooLarge: If the content is larger than ``max_size``.
+            ftplib.Error: If the server refused the request.
+            EnvironmentError: If the server could not be reached.
+        """
+        def command(connection, path):
+            if not path.endswith('/'):
+                chunks = []
+                size = [0]
+
+                def write(chunk):
+                    size[0] += len(chunk)
+                    if size[0] > max_size:
+                        raise ResponseTooLarge(url, max_size)
+                    chunks.append(chunk)
+                try:
+                    connection.ftp.retrbinary('RETR ' + path, write)
+                    return b''.join(chunks)
+                except ftplib.error_perm as err:
+                    # Not a file, maybe a directory
+                    if not str(err).startswith('550'):
+                        raise
+
+            lines = []
+            size = [0]
+
+            def append(line):
+                size[0] += len(line) + 1
+                if size[0] > max_size:
+                    raise ResponseTooLarge(url, max_size)
+                lines.append(line)
+            connection.ftp.retrlines('LIST ' + path, append)
+            content = '\n'.join(lines)
+            if not isinstance(content, bytes):
+                content = content.encode(
+                    getattr(connection.ftp, 'encoding', 'latin-1'))
+            return content
+        return self._run(url, command)
+
+    def close(self):
+        """Close the idle connections."""
+        with self._lock:
+            idle = [
+                connection for connections in self._idle.values()
+                for connection in connections]
+            self._idle.clear()
+        for connection in idle:
+            _close(connection)
+
+
+def _list(connection, path, dirs):
+    """List a directory with a connection, see :meth:`FtpPool.list`."""
+    ftp = connection.ftp
+    if connection.mlsd:
+        try:
+            return [
+                Entry(name, facts.get('type') == 'dir')
+                for name, facts in ftp.mlsd(path, facts=['type'])
+                if facts.get('type') not in ('cdir', 'pdir')
+                and name not in ('.', '..')
+            ]
+        except ftplib.error_perm as err:
+            if not str(err).startswith(_NOT_IMPLEMENTED):
+                raise
+            _log.debug('%s does not support MLSD', ftp.host)
+            connection.mlsd = False
+
+    if not dirs:
+        names = [name.rstrip('/').rsplit('/', 1)[-1] for name in ftp.nlst(path)]
+        return [
+            Entry(name, None) for name in names if name not in ('.', '..')]
+
+    lines = []
+    ftp.retrlines('LIST ' + path, lines.append)
+    entries = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 2 or parts[0] == 'total':
+            continue
+        # Symbolic links are listed as "name -> target"
+        if '->' in parts:
+            parts = parts[:parts.index('->')]
+        name = parts[-1]
+        if name not in ('.', '..'):
+            entries.append(Entry(name, line.startswith('d')))
+    return entries
+
+
+def _close(connection):
+    """Close a connection, ignoring errors since it is discarded anyway."""
+    try:
+        connection.ftp.quit()
+    except Exception:
+        connection.ftp.close()
+
+
+def get_pool(password=''):
+    """
+    Return the FTP pool of the process.
+
+    Args:
+        password (str): The password used to log in anonymously when the pool
+            is created.
+
+    Returns:
+        FtpPool: The pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = FtpPool(password=password)
+        return _pool
+
+
+def close():
+    """Close the idle connections of the FTP pool of the process, if any."""
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A persistent cache of the HTTP responses from upstream.
+
+When the ``HTTP_CACHE_PATH`` setting is set, the successful responses
+:meth:`anitya.lib.backends.BaseBackend.call_url` gets are stored in an SQLite
+database at this path, shared by all the processes using the same
+configuration: the cron job, its workers and the web application. A response
+is reused while it is fresh, for ``HTTP_CACHE_TTL`` seconds which can be set
+per backend, and the least recently used responses are dropped once the
+responses stored are larger than ``HTTP_CACHE_MAX_SIZE`` bytes.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import requests
+import requests.structures
+import requests.utils
+
+
+_log = logging.getLogger(__name__)
+
+# Request headers which do not change the response once it is cached.
+_CONDITIONAL_HEADERS = ('if-modified-since', 'if-none-match')
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class HttpCache(object):
+    """
+    A size-bounded cache of HTTP responses in an SQLite database.
+
+    Every thread uses its own connection to the database, and concurrent
+    processes are serialized by SQLite.
+
+    Args:
+        path (str): The path of the SQLite database, created if needed.
+        max_size (int): The maximum size of the responses stored, in bytes.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY,'
+                ' url TEXT NOT NULL,'
+                ' status_code INTEGER NOT NULL,'
+                ' headers TEXT NOT NULL,'
+                ' content BLOB NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' stored_on REAL NOT NULL,'
+                ' accessed_on REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS responses_accessed_on'
+                ' ON responses (accessed_on)')
+
+    def _connection(self):
+        """Return the connection of the current thread to the database."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(url, insecure=False, headers=None):
+        """
+        Return the key of the response to a request.
+
+        The validators of conditional requests are left out: a fresh response
+        is as good as a ``304 Not Modified`` one.
+
+        Args:
+            url (str): The URL requested.
+            insecure (bool): Whether the certificate of the server is ignored.
+            headers (dict): The additional headers of the request.
+
+        Returns:
+            str: The key.
+        """
+        headers = sorted(
+            (name.lower(), value) for name, value in (headers or {}).items()
+            if name.lower() not in _CONDITIONAL_HEADERS)
+        return json.dumps([url, bool(insecure), headers])
+
+    def get(self, key, ttl, now=None):
+        """
+        Return the response stored for ``key`` if it is fresh.
+
+        Args:
+            key (str): The key of the response, see :meth:`key`.
+            ttl (int): The number of seconds responses stay fresh.
+            now (float): The current time, defaults to :func:`time.time`.
+
+        Returns:
+            requests.Response: The response, whose content is already read,
+                or ``None``.
+        """
+        now = time.time() if now is None else now
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT url, status_code, headers, content FROM responses'
+                ' WHERE key = ? AND stored_on > ?',
+                (key, now - ttl)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                'UPDATE responses SET accessed_on = ? WHERE key = ?',
+                (now, key))
+
+        url, status_code, headers, content = row
+        response = requests.Response()
+        response.url = url
+        response.status_code = status_code
+        response.headers = requests.structures.CaseInsensitiveDict(
+            json.loads(headers))
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = bytes(content)
+        response._content_consumed = True
+        return response
+
+    def put(self, key, response, now=None):
+        """
+        Store a response, whose content was read, dropping the least recently
+        used responses if the cache is full.
+
+        Args:
+            key (str): The key of the response, see :meth:`key`.
+            response (requests.Response): The response.
+            now (float): The current time, defaults to :func:`time.time`.
+        """
+        now = time.time() if now is None else now
+        content = response.content
+        if len(content) > self.max_size:
+            return
+
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url or '', response.status_code,
+                 json.dumps(dict(response.headers)), sqlite3.Binary(content),
+                 len(content), now, now))
+
+            total = connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_size:
+                return
+            evicted = []
+            for old_key, size in connection.execute(
+                    'SELECT key, size FROM responses ORDER BY accessed_on'):
+                if total <= self.max_size:
+                    break
+                evicted.append((old_key,))
+                total -= size
+            connection.executemany(
+                'DELETE FROM responses WHERE key = ?', evicted)
+            _log.debug('Dropped %i responses from the HTTP cache', len(evicted))
+
+    def __len__(self):
+        with self._connection() as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+def get_cache(config):
+    """
+    Return the HTTP cache configured.
+
+    Args:
+        config (dict): The configuration of Anitya.
+
+    Returns:
+        HttpCache: The cache, shared by the threads of the process, or
+            ``None`` if the ``HTTP_CACHE_PATH`` setting is not set.
+    """
+    path = config.get('HTTP_CACHE_PATH')
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = HttpCache(
+                path, config.get('HTTP_CACHE_MAX_SIZE', 256 * 1024 * 1024))
+        return _caches[path]
+
+
+def ttl(config, backend):
+    """
+    Return the number of seconds responses stay fresh for a backend.
+
+    Args:
+        config (dict): The configuration of Anitya.
+        backend (str): The name of the backend, may be ``None``.
+
+    Returns:
+        int: The ``HTTP_CACHE_TTL`` setting of the backend, or the
+            ``default`` one.
+    """
+    ttls = config.get('HTTP_CACHE_TTL') or {}
+    if backend in ttls:
+        return ttls[backend]
+    return ttls.get('default', 600)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+The transport of the HTTP requests to upstream.
+
+Each :class:`requests.Session` of :mod:`anitya.lib.backends` is mounted with
+an adapter whose connection pools are sized for the number of checks the
+cron job runs at the same time, see :func:`mount`, and which retries the
+requests failing because of a transient error: a connection which could not
+be established or was dropped, or a ``500``, ``502``, ``503`` or ``504``
+response. The retries are spaced by a random, exponentially growing, delay
+so the checks of a host which failed together are not retried together.
+
+The ``HTTP_TIMEOUT`` setting gives the connect and read timeouts of each
+backend, see :func:`timeout`.
+"""
+
+import random
+
+import requests.adapters
+from requests.packages.urllib3.util.retry import Retry
+
+
+# The responses to retry, other responses are returned as they are.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """
+    A :class:`Retry` which waits a random delay, between nothing and the
+    exponential backoff of urllib3, before retrying ("full jitter").
+    """
+
+    #: The maximum delay before a retry, in seconds.
+    MAX_BACKOFF = 30
+
+    def get_backoff_time(self):
+        """
+        Return the number of seconds to wait before the next retry.
+
+        Returns:
+            float: The delay, uniformly drawn between 0 and
+                ``backoff_factor * 2 ** (retries - 1)``, capped to
+                :attr:`MAX_BACKOFF`.
+        """
+        retries = len(self.history)
+        if not retries:
+            return 0
+        backoff = min(self.backoff_factor * 2 ** (retries - 1), self.MAX_BACKOFF)
+        return random.uniform(0, backoff)
+
+
+def make_retry(config):
+    """
+    Return the retry policy configured.
+
+    Args:
+        config (dict): The configuration of Anitya.
+
+    Returns:
+        JitteredRetry: The policy, retrying at most ``HTTP_RETRIES`` times
+            with a backoff factor of ``HTTP_RETRY_BACKOFF`` seconds.
+    """
+    retries = config.get('HTTP_RETRIES', 2)
+    return JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        redirect=None,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=config.get('HTTP_RETRY_BACKOFF', 0.5),
+        # The last response is returned, the backends report its status
+        raise_on_status=False,
+        # Upstreams asking for long pauses are not waited for in a worker
+        respect_retry_after_header=False,
+    )
+
+
+def mount(session, config, pool_connections=10, pool_maxsize=10):
+    """
+    Mount adapters with the retry policy configured and the provided pool
+    sizes on a session, closing the connections of the previous ones.
+
+    Args:
+        session (requests.Session): The session.
+        config (dict): The configuration of Anitya.
+        pool_connections (int): The number of hosts whose connection pool is
+            kept.
+        pool_maxsize (int): The maximum number of connections kept for each
+            host, the number of requests made to a host at the same time.
+    """
+    for prefix in ('https://', 'http://'):
+        previous = session.adapters.get(prefix)
+        session.mount(prefix, requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=make_retry(config),
+        ))
+        if previous is not None:
+            previous.close()
+
+
+def timeout(config, backend):
+    """
+    Return the timeouts of the requests made by a backend.
+
+    Args:
+        config (dict): The configuration of Anitya.
+        backend (str): The name of the backend, may be ``None``.
+
+    Returns:
+        tuple: The connect and read timeouts, in seconds, of the
+            ``HTTP_TIMEOUT`` setting of the backend, or the ``default`` one.
+    """
+    timeouts = config.get('HTTP_TIMEOUT') or {}
+    if backend in timeouts:
+        return tuple(timeouts[backend])
+    return tuple(timeouts.get('default', (10, 60)))
@@ -24,6 +24,7 @@ import collections
 import datetime
 import logging
 import time
+import uuid
 
 import sqlalchemy as sa
 from sqlalchemy.orm import validates
@@ -43,7 +44,7 @@ from .versions import GLOBAL_DEFAULT as DEFAULT_VERSION_SCHEME
 Session = scoped_session(sessionmaker())
 
 
-def initialize(config):
+def initialize(config, pool_size=None):
     """
     Initialize the database.
 
@@ -53,13 +54,23 @@ def initialize(config):
     Args:
         config (dict): A dictionary that contains the configuration necessary
             to initialize the database.
+        pool_size (int): The number of connections kept open by the engine,
+            which should be at least the number of threads using the scoped
+            session at the same time. This is ignored with SQLite. Defaults to
+            the SQLAlchemy default.
 
     Returns:
         sqlalchemy.engine: The database engine created from the configuration.
     """
+    engine_args = {}
+    if pool_size and not config['DB_URL'].startswith('sqlite:'):
+        engine_args['pool_size'] = pool_size
+        # Connections may sit idle in the pool for the whole cron run
+        engine_args['pool_recycle'] = 3600
     #: The SQLAlchemy database engine. This is constructed using the value of
     #: ``DB_URL`` in :mod:`anitya.config``.
-    engine = sa.create_engine(config['DB_URL'], echo=config.get('SQL_DEBUG', False))
+    engine = sa.create_engine(
+        config['DB_URL'], echo=config.get('SQL_DEBUG', False), **engine_args)
     # Source: http://docs.sqlalchemy.org/en/latest/dialects/sqlite.html#foreign-key-support
     if config['DB_URL'].startswith('sqlite:'):
         sa.event.listen(
@@ -437,6 +448,10 @@ class Project(BASE):
         version_scheme (sa.String): The version scheme to use for this project.
             If this is null, a default will be used. See the :mod:`anitya.lib.versions`
             documentation for more information.
+        next_check_at (sa.DateTime): When the project is due to be checked for a
+            new release by the cron job. Null means as soon as possible.
+        error_counter (sa.Integer): The number of consecutive checks of the project
+            which failed.
     """
     __tablename__ = 'projects'
 
@@ -454,6 +469,8 @@ class Project(BASE):
 
     latest_version = sa.Column(sa.String(50))
     logs = sa.Column(sa.Text)
+    next_check_at = sa.Column(sa.DateTime, nullable=True, index=True)
+    error_counter = sa.Column(sa.Integer, nullable=False, default=0, server_default='0')
 
     updated_on = sa.Column(sa.DateTime, server_default=sa.func.now(),
                            onupdate=sa.func.current_timestamp())
@@ -461,6 +478,10 @@ class Project(BASE):
 
     packages = sa.orm.relation('Packages')
 
+    #: A new :class:`HttpValidator` set by the backends once they found
+    #: versions in a page, stored by :func:`anitya.record_release`.
+    pending_http_validator = None
+
     __table_args__ = (
         sa.UniqueConstraint('name', 'homepage'),
         sa.UniqueConstraint('name', 'ecosystem_name',
@@ -558,6 +579,43 @@ class Project(BASE):
             session.flush()
         return project
 
+    @classmethod
+    def get_or_create_many(cls, session, entries):
+        ''' Bulk version of :meth:`get_or_create`.
+
+        The existing projects are retrieved with a single query and the
+        missing ones are created with a single flush.
+
+        :arg entries: An iterable of ``(name, homepage, backend)`` tuples.
+        :return: A dictionary of the projects, by ``(name, homepage)``.
+        '''
+        backends = collections.OrderedDict()
+        for name, homepage, backend in entries:
+            backends.setdefault((name, homepage), backend)
+        if not backends:
+            return {}
+
+        names = set(name for name, _ in backends)
+        query = session.query(cls).filter(cls.name.in_(names))
+        projects = dict(
+            ((project.name, project.homepage), project)
+            for project in query
+            if (project.name, project.homepage) in backends
+        )
+
+        new_projects = [
+            cls(name=name, homepage=homepage, backend=backend)
+            for (name, homepage), backend in backends.items()
+            if (name, homepage) not in projects
+        ]
+        if new_projects:
+            session.add_all(new_projects)
+            session.flush()
+            projects.update(
+                ((project.name, project.homepage), project)
+                for project in new_projects)
+        return projects
+
     @classmethod
     def by_name(cls, session, name):
         return session.query(cls).filter_by(name=name).all()
@@ -607,6 +665,29 @@ class Project(BASE):
         else:
             return query.all()
 
+    @classmethod
+    def due(cls, session, now=None):
+        ''' Return the projects due to be checked for a new release, that is
+        the projects whose ``next_check_at`` is in the past or not set.
+
+        :arg session: the database session used to query the information.
+        :kwarg now: the :class:`datetime.datetime` to compare the
+            ``next_check_at`` to, defaults to the current UTC time.
+
+        '''
+        now = now or datetime.datetime.utcnow()
+        query = session.query(
+            cls
+        ).filter(
+            sa.or_(
+                cls.next_check_at.is_(None),
+                cls.next_check_at <= now,
+            )
+        ).order_by(
+            sa.func.lower(cls.name)
+        )
+        return query.all()
+
     @classmethod
     def by_distro(cls, session, distro, page=None, count=False):
         query = session.query(
@@ -781,10 +862,63 @@ class ProjectVersion(BASE):
         primary_key=True,
     )
     version = sa.Column(sa.String(50), primary_key=True)
+    created_on = sa.Column(
+        sa.DateTime, nullable=True, default=datetime.datetime.utcnow)
 
     project = sa.orm.relation('Project', backref='versions_obj')
 
 
+class HttpValidator(BASE):
+    """
+    The HTTP cache validators of the page the versions of a project were last
+    found in, sent back upstream to only download that page if it changed.
+
+    Attributes:
+        project_id (sa.Integer): The project the page belongs to.
+        url (sa.Text): The URL of the page.
+        etag (sa.String): The ``ETag`` header of the page, if any.
+        last_modified (sa.String): The ``Last-Modified`` header of the page,
+            if any.
+    """
+    __tablename__ = 'http_validators'
+
+    project_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "projects.id",
+            ondelete="cascade",
+            onupdate="cascade"),
+        primary_key=True,
+    )
+    url = sa.Column(sa.Text, nullable=False)
+    etag = sa.Column(sa.String(255), nullable=True)
+    last_modified = sa.Column(sa.String(64), nullable=True)
+
+    project = sa.orm.relation(
+        'Project',
+        backref=sa.orm.backref(
+            'http_validator', uselist=False, cascade='all, delete-orphan'),
+    )
+
+    def headers(self, url):
+        ''' Return the headers making a request of the provided url
+        conditional, if these validators apply to it.
+
+        :arg url: the url about to be requested.
+        :return: the conditional request headers, possibly empty.
+        :return type: dict
+
+        '''
+        headers = {}
+        if url != self.url:
+            return headers
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
 class ProjectFlag(BASE):
     __tablename__ = 'projects_flags'
 
@@ -892,11 +1026,139 @@ class ProjectFlag(BASE):
 
 
 class Run(BASE):
+    """
+    A run of the cron job.
+
+    Attributes:
+        id (sa.Integer): The identifier of the run.
+        status (sa.String): ``started`` while the run is in progress, or if it
+            was interrupted, and ``ended`` once it completed.
+        mode (sa.String): What the run checks: ``due``, ``all``, ``feed``,
+            ``enqueue`` or ``worker``. Only the runs of the same mode are
+            resumed.
+        created_on (sa.DateTime): When the run started.
+        heartbeat_on (sa.DateTime): When the run last told it was in
+            progress, see :meth:`beat`.
+        ended_on (sa.DateTime): When the run completed.
+    """
     __tablename__ = 'runs'
 
-    status = sa.Column(sa.String(20), primary_key=True)
+    id = sa.Column(sa.Integer, primary_key=True)
+    status = sa.Column(sa.String(20), nullable=False)
+    mode = sa.Column(sa.String(20), nullable=False, default='due')
     created_on = sa.Column(
-        sa.DateTime, default=datetime.datetime.utcnow, primary_key=True)
+        sa.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    heartbeat_on = sa.Column(
+        sa.DateTime, default=datetime.datetime.utcnow, nullable=True)
+    ended_on = sa.Column(sa.DateTime, nullable=True)
+
+    @classmethod
+    def last_unfinished(cls, session, mode='due', stale_after=300):
+        ''' Return the last cron run of the provided mode which did not
+        complete and is not in progress anymore, ``None`` if there is none.
+
+        A run is in progress if its heartbeat is less than ``stale_after``
+        seconds old.
+        '''
+        stale_on = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=stale_after)
+        query = session.query(
+            cls
+        ).filter(
+            cls.mode == mode,
+            cls.ended_on.is_(None),
+            sa.or_(cls.heartbeat_on.is_(None), cls.heartbeat_on < stale_on),
+        ).order_by(
+            cls.created_on.desc(), cls.id.desc()
+        )
+        return query.first()
+
+    def claim(self, session):
+        ''' Take over this run, unless another cron job did it since it was
+        looked up.
+
+        :return: ``True`` if the run was claimed.
+        '''
+        heartbeat_on = self.heartbeat_on
+        query = session.query(
+            Run
+        ).filter(
+            Run.id == self.id,
+            Run.ended_on.is_(None),
+        )
+        if heartbeat_on is None:
+            query = query.filter(Run.heartbeat_on.is_(None))
+        else:
+            query = query.filter(Run.heartbeat_on == heartbeat_on)
+        claimed = query.update(
+            {Run.heartbeat_on: datetime.datetime.utcnow()},
+            synchronize_session=False) == 1
+        session.commit()
+        if claimed:
+            session.refresh(self)
+        return claimed
+
+    @classmethod
+    def beat(cls, session, run_id):
+        ''' Record that the provided run is still in progress. '''
+        session.query(
+            cls
+        ).filter(
+            cls.id == run_id
+        ).update(
+            {cls.heartbeat_on: datetime.datetime.utcnow()},
+            synchronize_session=False)
+        session.commit()
+
+    def checked(self, session):
+        ''' Return the identifiers of the projects checked during this run,
+        as a set.
+        '''
+        query = session.query(
+            RunCheckpoint.project_id
+        ).filter(
+            RunCheckpoint.run_id == self.id
+        )
+        return set(row.project_id for row in query)
+
+    def __json__(self):
+        ended_on = self.ended_on
+        output = dict(
+            id=self.id,
+            status=self.status,
+            created_on=time.mktime(self.created_on.timetuple()),
+            ended_on=time.mktime(ended_on.timetuple()) if ended_on else None,
+            wall_time=(
+                (ended_on - self.created_on).total_seconds() if ended_on else None),
+        )
+        totals = dict.fromkeys(RunBackendStats.COUNTERS, 0)
+        for stats in self.backends_stats:
+            for counter in RunBackendStats.COUNTERS:
+                totals[counter] += getattr(stats, counter)
+        output.update(totals)
+        output['backends'] = [stats.__json__() for stats in self.backends_stats]
+
+        return output
+
+    def end(self, session, stats=None):
+        ''' Mark this run as completed, dropping its checkpoints.
+
+        :arg stats: The :class:`anitya.lib.run_stats.RunStats` collected
+            during the run, recorded with it when provided.
+        '''
+        session.query(
+            RunCheckpoint
+        ).filter(
+            RunCheckpoint.run_id == self.id
+        ).delete(synchronize_session=False)
+        if stats is not None:
+            for backend, backend_stats in sorted(stats.backends.items()):
+                session.add(RunBackendStats.from_stats(
+                    self.id, backend, backend_stats))
+        self.status = 'ended'
+        self.ended_on = datetime.datetime.utcnow()
+        session.add(self)
+        session.commit()
 
     @classmethod
     def last_entry(cls, session):
@@ -905,6 +1167,313 @@ class Run(BASE):
         query = session.query(
             cls
         ).order_by(
-            cls.created_on.desc()
+            cls.created_on.desc(), cls.id.desc()
         )
         return query.first()
+
+
+class RunBackendStats(BASE):
+    """
+    The statistics of the checks made with a backend during a cron run.
+
+    Attributes:
+        run_id (sa.Integer): The run.
+        backend (sa.String): The name of the backend.
+        checked (sa.Integer): The number of projects checked.
+        successes (sa.Integer): The number of checks which succeeded.
+        failures (sa.Integer): The number of checks which failed.
+        not_modified (sa.Integer): The number of successful checks for which
+            upstream was not modified.
+        new_versions (sa.Integer): The number of new versions found.
+        bytes_downloaded (sa.BigInteger): The number of bytes downloaded.
+        short_circuited (sa.Integer): The number of checks which failed right
+            away since their upstream host was failing.
+        resolver_errors (sa.Integer): The number of checks which failed since
+            the name of their upstream host could not be resolved.
+        latency_p50 (sa.Float): The median duration of the checks, in seconds.
+        latency_p95 (sa.Float): The 95th percentile of the duration of the
+            checks, in seconds.
+        latency_p99 (sa.Float): The 99th percentile of the duration of the
+            checks, in seconds.
+    """
+    __tablename__ = 'runs_backends_stats'
+
+    COUNTERS = (
+        'checked', 'successes', 'failures', 'not_modified', 'new_versions',
+        'bytes_downloaded', 'short_circuited', 'resolver_errors')
+
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "runs.id",
+            ondelete="cascade",
+            onupdate="cascade"),
+        primary_key=True,
+    )
+    backend = sa.Column(sa.String(200), primary_key=True)
+    checked = sa.Column(sa.Integer, nullable=False, default=0)
+    successes = sa.Column(sa.Integer, nullable=False, default=0)
+    failures = sa.Column(sa.Integer, nullable=False, default=0)
+    not_modified = sa.Column(sa.Integer, nullable=False, default=0)
+    new_versions = sa.Column(sa.Integer, nullable=False, default=0)
+    bytes_downloaded = sa.Column(sa.BigInteger, nullable=False, default=0)
+    short_circuited = sa.Column(sa.Integer, nullable=False, default=0)
+    resolver_errors = sa.Column(sa.Integer, nullable=False, default=0)
+    latency_p50 = sa.Column(sa.Float, nullable=True)
+    latency_p95 = sa.Column(sa.Float, nullable=True)
+    latency_p99 = sa.Column(sa.Float, nullable=True)
+
+    run = sa.orm.relationship(
+        'Run',
+        backref=sa.orm.backref(
+            'backends_stats',
+            order_by='RunBackendStats.backend',
+            cascade='all, delete-orphan'),
+    )
+
+    @classmethod
+    def from_stats(cls, run_id, backend, stats):
+        ''' Build the statistics of a run from the provided
+        :class:`anitya.lib.run_stats.BackendStats`.
+        '''
+        return cls(
+            run_id=run_id,
+            backend=backend,
+            checked=stats.checked,
+            successes=stats.successes,
+            failures=stats.failures,
+            not_modified=stats.not_modified,
+            new_versions=stats.new_versions,
+            bytes_downloaded=stats.bytes_downloaded,
+            short_circuited=stats.short_circuited,
+            resolver_errors=stats.resolver_errors,
+            latency_p50=stats.percentile(50),
+            latency_p95=stats.percentile(95),
+            latency_p99=stats.percentile(99),
+        )
+
+    def __json__(self):
+        output = dict(
+            (counter, getattr(self, counter)) for counter in self.COUNTERS)
+        output.update(
+            backend=self.backend,
+            latency_p50=self.latency_p50,
+            latency_p95=self.latency_p95,
+            latency_p99=self.latency_p99,
+        )
+        return output
+
+
+class RunCheckpoint(BASE):
+    """
+    A project checked during a cron run, so an interrupted run can be resumed
+    without checking it again.
+
+    Attributes:
+        run_id (sa.Integer): The run.
+        project_id (sa.Integer): The project checked.
+    """
+    __tablename__ = 'runs_checkpoints'
+
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "runs.id",
+            ondelete="cascade",
+            onupdate="cascade"),
+        primary_key=True,
+    )
+    project_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "projects.id",
+            ondelete="cascade",
+            onupdate="cascade"),
+        primary_key=True,
+    )
+
+    @classmethod
+    def add(cls, session, run_id, project_id):
+        ''' Record that the provided project was checked during the provided
+        run.
+        '''
+        session.add(cls(run_id=run_id, project_id=project_id))
+        session.commit()
+
+
+class CheckLease(BASE):
+    """
+    A project queued to be checked by the cron workers.
+
+    The cron job can enqueue the projects due to be checked rather than
+    checking them itself, and workers running on any host then claim them by
+    batches. A claim is a lease: if the worker does not finish the checks in
+    time, for example because it died, the projects can be claimed again.
+
+    Attributes:
+        project_id (sa.Integer): The project to check.
+        enqueued_on (sa.DateTime): When the project was queued.
+        worker (sa.String): The name of the worker which claimed the project.
+        token (sa.String): Identifies the claim the project was leased with.
+        leased_until (sa.DateTime): When the claim expires. Null if the
+            project was never claimed.
+    """
+    __tablename__ = 'check_leases'
+
+    project_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "projects.id",
+            ondelete="cascade",
+            onupdate="cascade"),
+        primary_key=True,
+    )
+    enqueued_on = sa.Column(
+        sa.DateTime, default=datetime.datetime.utcnow, nullable=False,
+        index=True)
+    worker = sa.Column(sa.String(255), nullable=True)
+    token = sa.Column(sa.String(32), nullable=True, index=True)
+    leased_until = sa.Column(sa.DateTime, nullable=True, index=True)
+
+    @classmethod
+    def enqueue(cls, session, project_ids):
+        ''' Queue the provided projects, unless they are queued already.
+
+        :arg session: the database session used to query the information.
+        :arg project_ids: the identifiers of the projects to queue.
+        :return: the number of projects queued.
+
+        '''
+        queued = set(row.project_id for row in session.query(cls.project_id))
+        count = 0
+        for project_id in project_ids:
+            if project_id not in queued:
+                queued.add(project_id)
+                session.add(cls(project_id=project_id))
+                count += 1
+        session.commit()
+        return count
+
+    @classmethod
+    def claim(cls, session, worker, count, duration, now=None):
+        ''' Lease up to ``count`` queued projects which are not leased
+        already, or whose lease expired, oldest first.
+
+        On PostgreSQL, the rows are locked with ``FOR UPDATE SKIP LOCKED``,
+        which requires PostgreSQL 9.5 or newer, so concurrent workers claim
+        different projects without waiting on each other. Other databases use
+        a conditional update instead, which is safe as long as they serialize
+        writes, as SQLite does.
+
+        :arg session: the database session used to query the information.
+        :arg worker: the name of the worker claiming the projects.
+        :arg count: the maximum number of projects to claim.
+        :arg duration: the number of seconds the lease lasts.
+        :kwarg now: the current :class:`datetime.datetime`, defaults to the
+            current UTC time.
+        :return: a tuple of the token identifying the claim, to release it,
+            and of the identifiers of the projects claimed.
+
+        '''
+        now = now or datetime.datetime.utcnow()
+        token = uuid.uuid4().hex
+        available = sa.or_(cls.leased_until.is_(None), cls.leased_until < now)
+        if session.get_bind().dialect.name == 'postgresql':
+            # Query.with_for_update only supports skip_locked as of
+            # SQLAlchemy 1.1
+            candidates = session.execute(sa.text(
+                'SELECT project_id FROM check_leases'
+                ' WHERE leased_until IS NULL OR leased_until < :now'
+                ' ORDER BY enqueued_on, project_id LIMIT :count'
+                ' FOR UPDATE SKIP LOCKED'
+            ), {'now': now, 'count': count})
+        else:
+            candidates = session.query(
+                cls.project_id
+            ).filter(
+                available
+            ).order_by(
+                cls.enqueued_on, cls.project_id
+            ).limit(count)
+        project_ids = [row.project_id for row in candidates]
+
+        if project_ids:
+            session.query(
+                cls
+            ).filter(
+                cls.project_id.in_(project_ids),
+                available,
+            ).update({
+                cls.worker: worker,
+                cls.token: token,
+                cls.leased_until: now + datetime.timedelta(seconds=duration),
+            }, synchronize_session=False)
+            # Another worker may have claimed some of them in the meantime
+            project_ids = [
+                row.project_id for row in session.query(
+                    cls.project_id).filter(cls.token == token)]
+        session.commit()
+        return token, sorted(project_ids)
+
+    @classmethod
+    def release(cls, session, token, keep=None):
+        ''' Remove the projects leased with the provided claim from the queue,
+        once they were checked.
+
+        Projects whose lease expired and which were claimed again by another
+        worker are left to that worker.
+
+        :arg session: the database session used to query the information.
+        :arg token: the token identifying the claim, as returned by
+            :meth:`claim`.
+        :kwarg keep: the identifiers of the projects leased with the claim
+            which could not be checked. They stay queued, and leased until
+            the claim expires, after which any worker can claim them again.
+
+        '''
+        query = session.query(cls).filter(cls.token == token)
+        if keep:
+            query = query.filter(~cls.project_id.in_(keep))
+        query.delete(synchronize_session=False)
+        session.commit()
+
+    @classmethod
+    def pending(cls, session):
+        ''' Return the number of projects queued. '''
+        return session.query(cls).count()
+
+
+class FeedCursor(BASE):
+    """
+    The position the cron job reached in a feed of upstream changes, so the
+    next run resumes from there.
+
+    Attributes:
+        name (sa.String): The name of the feed.
+        value (sa.String): The position in the feed, as upstream gives it.
+        updated_on (sa.DateTime): When the position was last stored.
+    """
+    __tablename__ = 'feed_cursors'
+
+    name = sa.Column(sa.String(200), primary_key=True)
+    value = sa.Column(sa.String(200), nullable=False)
+    updated_on = sa.Column(
+        sa.DateTime, default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow, nullable=False)
+
+    @classmethod
+    def get(cls, session, name):
+        ''' Return the position stored for the provided feed, or ``None``.
+        '''
+        cursor = session.query(cls).get(name)
+        return cursor.value if cursor is not None else None
+
+    @classmethod
+    def set(cls, session, name, value):
+        ''' Store the position reached in the provided feed. '''
+        cursor = session.query(cls).get(name)
+        if cursor is None:
+            session.add(cls(name=name, value=value))
+        else:
+            cursor.value = value
+        session.commit()
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+The rate limits of the upstream hosts, during a single cron run.
+
+Hosts like GitHub, crates.io or the npm registry rate limit their clients:
+they answer ``429 Too Many Requests``, or ``403 Forbidden`` once the quota is
+exhausted, and tell when to come back with the ``Retry-After`` or
+``X-RateLimit-Reset`` headers. While limits are tracked (see
+:func:`run_limits`), :meth:`anitya.lib.backends.BaseBackend.call_url` raises
+:class:`anitya.lib.exceptions.RateLimited` for these responses rather than
+returning them, and stops querying the host until the time it gave, even
+before its quota is exhausted if ``X-RateLimit-Remaining`` reaches zero.
+
+The backends turn the exceptions of :meth:`call_url` into
+:class:`anitya.lib.exceptions.AnityaPluginException`, so :func:`check` raises
+the :class:`anitya.lib.exceptions.RateLimited` again: the cron job puts the
+project back in its queue rather than recording a failure.
+
+No limits are tracked by default so the web application is not affected.
+"""
+
+import contextlib
+import email.utils
+import logging
+import threading
+import time
+
+from anitya.lib.exceptions import RateLimited
+
+
+_log = logging.getLogger(__name__)
+
+_active = None
+_local = threading.local()
+
+#: The number of seconds to wait when a host does not tell.
+DEFAULT_DELAY = 60
+
+# Timestamps are larger than this, deltas smaller.
+_EPOCH_THRESHOLD = 10 ** 9
+
+
+class RateLimits(object):
+    """
+    A thread-safe record of the hosts which rate limited the requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retry_at = {}
+
+    def limit(self, host, retry_at):
+        """
+        Stop querying a host until the provided time.
+
+        Args:
+            host (str): The host.
+            retry_at (float): When the host may be queried again, as a
+                timestamp.
+        """
+        with self._lock:
+            if retry_at > self._retry_at.get(host, 0):
+                self._retry_at[host] = retry_at
+                _log.info(
+                    '%s is rate limited for %.0fs', host,
+                    retry_at - time.time())
+
+    def retry_at(self, host, now=None):
+        """
+        Return when a host may be queried again.
+
+        Args:
+            host (str): The host.
+            now (float): The current time, defaults to :func:`time.time`.
+
+        Returns:
+            float: The timestamp, or ``None`` if the host may be queried now.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            retry_at = self._retry_at.get(host)
+            if retry_at is not None and retry_at <= now:
+                del self._retry_at[host]
+                retry_at = None
+        return retry_at
+
+
+def _parse_time(value, now):
+    """
+    Parse the value of a ``Retry-After`` or ``X-RateLimit-Reset`` header.
+
+    Returns:
+        float: The timestamp, or ``None`` if the value cannot be parsed.
+    """
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return float(email.utils.mktime_tz(parsed))
+    if number > _EPOCH_THRESHOLD:
+        return number
+    return now + number
+
+
+def parse_response(response, now=None):
+    """
+    Return until when a response tells its host should not be queried.
+
+    Args:
+        response (requests.Response): The response.
+        now (float): The current time, defaults to :func:`time.time`.
+
+    Returns:
+        tuple: Whether the request was refused because of the rate limit and
+            the timestamp of the time the host may be queried again, or
+            ``None`` if the host may still be queried.
+    """
+    now = time.time() if now is None else now
+    headers = response.headers
+    exhausted = headers.get('X-RateLimit-Remaining', '').strip() == '0'
+    refused = response.status_code == 429 or (
+        response.status_code == 403 and exhausted)
+    if not (refused or exhausted):
+        return False, None
+
+    retry_at = _parse_time(headers.get('Retry-After'), now) \
+        or _parse_time(headers.get('X-RateLimit-Reset'), now)
+    if retry_at is None:
+        retry_at = now + DEFAULT_DELAY
+    return refused, max(retry_at, now)
+
+
+def get_limits():
+    """
+    Return the rate limits currently tracked.
+
+    Returns:
+        RateLimits: The limits, or ``None``.
+    """
+    return _active
+
+
+def before(host):
+    """
+    Check that a host may be queried, if limits are tracked.
+
+    Args:
+        host (str): The host.
+
+    Raises:
+        RateLimited: If the host is rate limited.
+    """
+    limits = _active
+    if limits is None:
+        return
+    retry_at = limits.retry_at(host)
+    if retry_at is not None:
+        _refuse(host, retry_at)
+
+
+def after(host, response):
+    """
+    Record the rate limit a response tells about, if limits are tracked.
+
+    Args:
+        host (str): The host.
+        response (requests.Response): The response.
+
+    Raises:
+        RateLimited: If the request was refused because of the rate limit.
+    """
+    limits = _active
+    if limits is None:
+        return
+    refused, retry_at = parse_response(response)
+    if retry_at is None:
+        return
+    limits.limit(host, retry_at)
+    if refused:
+        response.close()
+        _refuse(host, retry_at)
+
+
+def _refuse(host, retry_at):
+    """Raise, and remember for :func:`check`, that a host is rate limited."""
+    error = RateLimited(host, retry_at)
+    remember(error)
+    raise error
+
+
+def current():
+    """
+    Return the error remembered for the check of the current thread.
+
+    Returns:
+        RateLimited: The error, or ``None`` if no request was rate limited.
+    """
+    return getattr(_local, 'limited', None)
+
+
+def remember(error):
+    """
+    Remember for :func:`check` that a request of the check of the current
+    thread was rate limited, for example since it shared the request of
+    another thread, see :class:`anitya.lib.url_cache.UrlCache`.
+
+    Args:
+        error (RateLimited): The error the request raised.
+    """
+    _local.limited = error
+
+
+@contextlib.contextmanager
+def check():
+    """
+    Context manager raising :class:`anitya.lib.exceptions.RateLimited` if a
+    request of the check made in the block was rate limited, whatever the
+    exception the backend raised.
+    """
+    _local.limited = None
+    try:
+        yield
+    except RateLimited:
+        raise
+    except Exception:
+        limited = _local.limited
+        if limited is not None:
+            raise limited
+        raise
+    finally:
+        _local.limited = None
+
+
+@contextlib.contextmanager
+def run_limits():
+    """
+    Context manager tracking the rate limits of the hosts for all the threads.
+
+    Yields:
+        RateLimits: The limits tracked.
+    """
+    global _active
+    previous = _active
+    _active = RateLimits()
+    try:
+        yield _active
+    finally:
+        _active = previous
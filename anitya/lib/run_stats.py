@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+Statistics about the checks made during a cron run, per backend.
+
+While statistics are collected (see :func:`collect`), each call of
+:func:`measure` records the outcome and the duration of a check, together
+with the number of bytes :meth:`anitya.lib.backends.BaseBackend.call_url`
+downloaded from the thread running the check, and whether a request was
+short-circuited by :mod:`anitya.lib.circuit_breaker` or failed to resolve
+the name of its host, see :mod:`anitya.lib.dns_cache`.
+:func:`anitya.record_release` counts the new versions found.
+
+Nothing is collected by default so the web application is not affected.
+"""
+
+import collections
+import contextlib
+import math
+import threading
+import time
+
+from anitya.lib.exceptions import RateLimited, UpstreamNotModified
+
+
+_active = None
+_local = threading.local()
+
+
+class BackendStats(object):
+    """
+    The statistics of the checks made with a single backend.
+
+    Attributes:
+        checked (int): The number of projects checked.
+        successes (int): The number of checks which succeeded.
+        failures (int): The number of checks which failed.
+        not_modified (int): The number of successful checks which did not
+            download the upstream page since it did not change.
+        new_versions (int): The number of new versions found.
+        bytes_downloaded (int): The number of bytes downloaded.
+        short_circuited (int): The number of checks which failed right away
+            since their upstream host was failing.
+        resolver_errors (int): The number of checks which failed since the
+            name of their upstream host could not be resolved.
+        latencies (list): The duration, in seconds, of each check.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.successes = 0
+        self.failures = 0
+        self.not_modified = 0
+        self.new_versions = 0
+        self.bytes_downloaded = 0
+        self.short_circuited = 0
+        self.resolver_errors = 0
+        self.latencies = []
+
+    def percentile(self, percent):
+        """
+        Return a percentile of the duration of the checks, in seconds.
+
+        Args:
+            percent (int): The percentile to compute, between 1 and 100.
+
+        Returns:
+            float: The duration, using the nearest-rank method, or ``None`` if
+                no check was made.
+        """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        rank = int(math.ceil(percent / 100.0 * len(latencies)))
+        return latencies[max(rank, 1) - 1]
+
+
+class RunStats(object):
+    """
+    Thread-safe collector of the statistics of a run, per backend.
+
+    Attributes:
+        backends (dict): The :class:`BackendStats` of each backend, by name.
+    """
+
+    def __init__(self):
+        self.backends = collections.defaultdict(BackendStats)
+        self._lock = threading.Lock()
+
+    def record(self, backend, success, duration, downloaded=0,
+               not_modified=False, short_circuited=False,
+               resolver_error=False):
+        """
+        Record the outcome of a check.
+
+        Args:
+            backend (str): The name of the backend of the project checked.
+            success (bool): Whether the check succeeded.
+            duration (float): The duration of the check, in seconds.
+            downloaded (int): The number of bytes downloaded by the check.
+            not_modified (bool): Whether upstream was not modified.
+            short_circuited (bool): Whether a request of the check failed
+                right away since its host was failing.
+            resolver_error (bool): Whether the name of the host of a request
+                of the check could not be resolved, only counted if the check
+                failed.
+        """
+        with self._lock:
+            stats = self.backends[backend]
+            stats.checked += 1
+            if success:
+                stats.successes += 1
+            else:
+                stats.failures += 1
+            if not_modified:
+                stats.not_modified += 1
+            if short_circuited:
+                stats.short_circuited += 1
+            if resolver_error and not success:
+                stats.resolver_errors += 1
+            stats.bytes_downloaded += downloaded
+            stats.latencies.append(duration)
+
+    def new_version(self, backend):
+        """
+        Count a new version found by a check.
+
+        Args:
+            backend (str): The name of the backend of the project checked.
+        """
+        with self._lock:
+            self.backends[backend].new_versions += 1
+
+
+def get_stats():
+    """
+    Return the statistics currently collected.
+
+    Returns:
+        RunStats: The statistics, or ``None`` if none are collected.
+    """
+    return _active
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Context manager collecting the statistics of all the threads.
+
+    Yields:
+        RunStats: The statistics collected.
+    """
+    global _active
+    previous = _active
+    _active = RunStats()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextlib.contextmanager
+def measure(backend):
+    """
+    Context manager measuring a check of a project made in the block.
+
+    The check fails if the block raises an exception, other than
+    :class:`anitya.lib.exceptions.UpstreamNotModified`. The exception is
+    propagated. Checks which were rate limited are not recorded, they are
+    made again later.
+
+    Args:
+        backend (str): The name of the backend of the project checked.
+    """
+    stats = _active
+    if stats is None:
+        yield
+        return
+
+    _local.downloaded = 0
+    _local.short_circuited = False
+    _local.resolver_error = False
+    start = time.time()
+    success, not_modified, limited = False, False, False
+    try:
+        yield
+        success = True
+    except UpstreamNotModified:
+        success, not_modified = True, True
+        raise
+    except RateLimited:
+        limited = True
+        raise
+    finally:
+        if not limited:
+            stats.record(
+                backend, success, time.time() - start,
+                downloaded=_local.downloaded, not_modified=not_modified,
+                short_circuited=_local.short_circuited,
+                resolver_error=_local.resolver_error)
+        _local.downloaded = None
+
+
+def count_downloaded(content):
+    """
+    Count bytes downloaded from upstream by the check of the current thread.
+
+    Args:
+        content (bytes): The content downloaded.
+    """
+    if getattr(_local, 'downloaded', None) is not None:
+        _local.downloaded += len(content)
+
+
+def count_short_circuited():
+    """
+    Count a request of the check of the current thread which failed right away
+    since its host was failing.
+    """
+    if getattr(_local, 'downloaded', None) is not None:
+        _local.short_circuited = True
+
+
+def count_resolver_error():
+    """
+    Count a request of the check of the current thread which failed since the
+    name of its host could not be resolved.
+    """
+    if getattr(_local, 'downloaded', None) is not None:
+        _local.resolver_error = True
+
+
+def new_version(backend):
+    """
+    Count a new version found, if statistics are collected.
+
+    Args:
+        backend (str): The name of the backend of the project checked.
+    """
+    if _active is not None:
+        _active.new_version(backend)
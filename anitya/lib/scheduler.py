@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+Scheduling of the upstream checks run by the cron job.
+
+Projects are grouped by the upstream host their backend queries so the checks
+can be interleaved across hosts, and a :class:`HostScheduler` bounds how many
+requests are made to a single host at once and how often they start.
+
+The scheduler is scoped to a run of the cron job, see :func:`run_scheduler`.
+Outside of such a run, :func:`slot` lets every request through right away.
+
+Each project also gets its own check frequency, see :func:`next_check_at`.
+"""
+
+import collections
+import contextlib
+import datetime
+import threading
+import time
+
+
+#: The scheduler of the current run, if any
+_active = None
+
+#: The number of most recent releases used to compute a release cadence.
+RELEASE_HISTORY = 10
+
+
+def release_interval(project):
+    """
+    Compute the typical interval between two releases of a project.
+
+    This is the median of the intervals between the most recent releases
+    found for the project, using the date each version was first seen.
+
+    Args:
+        project (anitya.lib.model.Project): The project.
+
+    Returns:
+        datetime.timedelta: The interval, or ``None`` if fewer than two
+            releases with a known date were found.
+    """
+    dates = sorted(
+        version.created_on for version in project.versions_obj
+        if version.created_on is not None)[-RELEASE_HISTORY:]
+    if len(dates) < 2:
+        return None
+    gaps = sorted(later - earlier for earlier, later in zip(dates, dates[1:]))
+    return gaps[len(gaps) // 2]
+
+
+def next_check_at(project, config, failed=False, now=None):
+    """
+    Compute when a project should be checked for a new release again.
+
+    Projects are checked four times per typical interval between their
+    releases, so projects releasing often are checked often and dormant
+    projects are left alone. Projects which failed to be checked back off
+    exponentially with the number of consecutive failures. Projects packaged
+    in a distribution are always checked at least every
+    ``CHECK_INTERVAL_PACKAGED`` seconds, and all the intervals are bounded by
+    ``CHECK_INTERVAL_MIN`` and ``CHECK_INTERVAL_MAX``.
+
+    Args:
+        project (anitya.lib.model.Project): The project which was just checked.
+        config (dict): The Anitya configuration.
+        failed (bool): Whether the check which was just made failed.
+        now (datetime.datetime): The time the check was made, defaults to the
+            current UTC time.
+
+    Returns:
+        datetime.datetime: The time the project is due to be checked again.
+    """
+    now = now or datetime.datetime.utcnow()
+    min_interval = config['CHECK_INTERVAL_MIN']
+
+    if failed:
+        backoff = min(max(project.error_counter, 1) - 1, 16)
+        interval = min_interval * 2 ** backoff
+    else:
+        cadence = release_interval(project)
+        if cadence is None:
+            interval = config['CHECK_INTERVAL_DEFAULT']
+        else:
+            interval = cadence.total_seconds() / 4
+
+    if project.packages:
+        interval = min(interval, config['CHECK_INTERVAL_PACKAGED'])
+    interval = max(min_interval, min(interval, config['CHECK_INTERVAL_MAX']))
+
+    return now + datetime.timedelta(seconds=interval)
+
+
+def project_hosts(projects):
+    """
+    Map the given projects to the upstream host checking them queries.
+
+    Args:
+        projects (list): The :class:`anitya.lib.model.Project` objects.
+
+    Returns:
+        list: A list of ``(project_id, host)`` tuples, in the order of the
+            projects given.
+    """
+    # The plugins load the backends, which schedule their requests here
+    from anitya.lib import plugins
+    backends = dict(
+        (backend.name, backend) for backend in plugins.get_plugins())
+    output = []
+    for project in projects:
+        backend = backends.get(project.backend)
+        host = backend.get_host(project) if backend else ''
+        output.append((project.id, host))
+    return output
+
+
+def interleave(items, key):
+    """
+    Reorder items so items sharing the same key are spread out.
+
+    Items are grouped by key and the groups are visited round-robin, in the
+    order the keys are first seen. The relative order of the items within a
+    group is preserved.
+
+    Args:
+        items (iterable): The items to reorder.
+        key (callable): A function returning the key of an item.
+
+    Returns:
+        list: The reordered items.
+    """
+    groups = collections.OrderedDict()
+    for item in items:
+        groups.setdefault(key(item), collections.deque()).append(item)
+
+    output = []
+    queues = list(groups.values())
+    while queues:
+        for queue in queues:
+            output.append(queue.popleft())
+        queues = [queue for queue in queues if queue]
+    return output
+
+
+class HostScheduler(object):
+    """
+    Enforce a per-host concurrency and start rate for the upstream requests.
+
+    This class is thread-safe.
+
+    Args:
+        max_per_host (int): The maximum number of requests made to a single
+            host at the same time.
+        rate (float): The maximum number of requests started per second to
+            a single host. ``0`` or ``None`` disables the rate limit.
+    """
+
+    def __init__(self, max_per_host=4, rate=None):
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def reserve(self, host):
+        """
+        Reserve the next start slot for a request to the given host.
+
+        Args:
+            host (str): The host the request queries.
+
+        Returns:
+            float: The number of seconds to wait before starting the request.
+        """
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + 1.0 / self.rate
+        return start - now
+
+    def _semaphore(self, host):
+        """Return the semaphore bounding the requests to ``host``."""
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host)
+            return self._semaphores[host]
+
+    @contextlib.contextmanager
+    def slot(self, host):
+        """
+        Context manager blocking until a request to ``host`` may be made.
+
+        Args:
+            host (str): The host the request queries.
+        """
+        semaphore = self._semaphore(host)
+        semaphore.acquire()
+        try:
+            delay = self.reserve(host)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            semaphore.release()
+
+
+@contextlib.contextmanager
+def run_scheduler(max_per_host=4, rate=None):
+    """
+    Context manager scheduling the upstream requests made while it is active.
+
+    The requests made by all the threads go through the same scheduler.
+
+    Args:
+        max_per_host (int): The maximum number of requests made to a single
+            host at the same time.
+        rate (float): The maximum number of requests started per second to
+            a single host. ``0`` or ``None`` disables the rate limit.
+
+    Yields:
+        HostScheduler: The scheduler of the run.
+    """
+    global _active
+    previous = _active
+    _active = HostScheduler(max_per_host=max_per_host, rate=rate)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextlib.contextmanager
+def slot(host):
+    """
+    Context manager blocking until a request to ``host`` may be made.
+
+    Outside of :func:`run_scheduler`, the request is made right away.
+
+    Args:
+        host (str): The host the request queries.
+    """
+    scheduler = _active
+    if scheduler is None:
+        yield
+        return
+    with scheduler.slot(host):
+        yield
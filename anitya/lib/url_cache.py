@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# This file is a part of the Anitya project.
+#
+# Copyright © 2017 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+A cache of the upstream requests made during a single cron run.
+
+Many projects are checked against the same upstream page, so while a cache is
+active (see :func:`run_cache`) :meth:`anitya.lib.backends.BaseBackend.call_url`
+only makes a request once per URL: threads asking for a URL which is being
+requested wait for that request rather than making their own, and later
+requests get the same response. A failed request is only shared with the
+threads which waited for it, the next request for the URL is made again so a
+transient error does not fail every project using it for the rest of the run.
+The threads sharing a request which was rate limited, or short-circuited, are
+told so like the thread which made it, see :func:`anitya.lib.rate_limit.check`
+and :func:`anitya.lib.circuit_breaker.check`.
+
+No cache is active by default so the web application always queries upstream.
+
+A check of a project may need the same page more than once, say to find the
+latest version and then to list them all. While a check cache is active for
+the current thread (see :func:`check_cache`), which :func:`anitya.fetch_version`
+does for every check, the responses of the check, and its failed requests, are
+only requested once, from upstream or from the cache of the run.
+"""
+
+import collections
+import contextlib
+import threading
+
+from anitya.lib import circuit_breaker, rate_limit
+
+
+_active = None
+_local = threading.local()
+
+# The modules remembering the errors of the requests of a check
+_SIGNALS = (rate_limit, circuit_breaker)
+
+
+class _Entry(object):
+    """The response, or exception, of a request, once it completed."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # The (module, error) tuples remembered by the request which failed
+        self.signals = []
+
+
+class UrlCache(object):
+    """
+    A thread-safe cache of responses coalescing concurrent requests.
+
+    Args:
+        max_entries (int): The maximum number of responses kept. The least
+            recently used responses are dropped first. ``None`` means no limit.
+        cache_errors (bool): Whether the exceptions raised by requests are
+            kept like responses, or dropped once the requests waiting for
+            them got them.
+    """
+
+    def __init__(self, max_entries=None, cache_errors=True):
+        self.max_entries = max_entries
+        self.cache_errors = cache_errors
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, fetch):
+        """
+        Return the response cached for ``key``, calling ``fetch`` to get it
+        unless it is cached or being fetched already.
+
+        Args:
+            key (tuple): The key identifying the request.
+            fetch (callable): Called without arguments to make the request.
+
+        Returns:
+            object: What ``fetch`` returned.
+
+        Raises:
+            Exception: What ``fetch`` raised.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                self.misses += 1
+                entry = self._entries[key] = _Entry()
+                self._evict()
+            else:
+                self.hits += 1
+                # Mark it as recently used
+                del self._entries[key]
+                self._entries[key] = entry
+
+        if owner:
+            before = [module.current() for module in _SIGNALS]
+            try:
+                entry.value = fetch()
+            except Exception as err:
+                entry.error = err
+                entry.signals = [
+                    (module, module.current())
+                    for module, previous in zip(_SIGNALS, before)
+                    if module.current() not in (None, previous)]
+                if not self.cache_errors:
+                    with self._lock:
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+            finally:
+                entry.done.set()
+        else:
+            entry.done.wait()
+
+        if entry.error is not None:
+            for module, error in entry.signals:
+                module.remember(error)
+            raise entry.error
+        return entry.value
+
+    def _evict(self):
+        """Drop the least recently used completed responses over the limit."""
+        if self.max_entries is None:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key].done.is_set():
+                del self._entries[key]
+
+
+def get_cache():
+    """
+    Return the cache currently active.
+
+    Returns:
+        UrlCache: The active cache, or ``None``.
+    """
+    return _active
+
+
+@contextlib.contextmanager
+def run_cache(max_entries=None):
+    """
+    Context manager activating a new :class:`UrlCache` for all the threads.
+
+    The exceptions raised by requests are not cached, only the threads
+    waiting for a request which failed get its exception.
+
+    Args:
+        max_entries (int): The maximum number of responses kept.
+
+    Yields:
+        UrlCache: The cache activated.
+    """
+    global _active
+    previous = _active
+    _active = UrlCache(max_entries=max_entries, cache_errors=False)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def get_check_cache():
+    """
+    Return the cache of the check of the current thread.
+
+    Returns:
+        UrlCache: The active check cache, or ``None``.
+    """
+    return getattr(_local, 'check', None)
+
+
+@contextlib.contextmanager
+def check_cache():
+    """
+    Context manager activating a new :class:`UrlCache` for the check of a
+    project made by the current thread in the block.
+
+    Nested blocks share the cache of the outermost one, they are part of the
+    same check.
+
+    Yields:
+        UrlCache: The cache activated.
+    """
+    cache = get_check_cache()
+    if cache is not None:
+        yield cache
+        return
+    _local.check = UrlCache()
+    try:
+        yield _local.check
+    finally:
+        _local.check = None
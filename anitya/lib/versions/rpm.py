@@ -145,15 +145,15 @@ class RpmVersion(Version):
         This recognizes versions containing "rc", "pre", "beta", "alpha", and
         "dev" as being pre-release versions.
         """
-        return self.split_rc(self.parse())[1] != ''
+        return _split(self)[1] != ''
 
     def __eq__(self, other):
         """
         Compare two versions for equality using the RPM rules with pre-release
         support.
         """
-        v1, rc1, rcn1 = self.split_rc(self.parse())
-        v2, rc2, rcn2 = self.split_rc(other.parse())
+        v1, rc1, rcn1 = _split(self)
+        v2, rc2, rcn2 = _split(other)
         result = _compare_rpm_labels((None, v1, None), (None, v2, None))
         if result != 0:
             return False
@@ -164,8 +164,8 @@ class RpmVersion(Version):
             return False
 
     def __lt__(self, other):
-        v1, rc1, rcn1 = self.split_rc(self.parse())
-        v2, rc2, rcn2 = self.split_rc(other.parse())
+        v1, rc1, rcn1 = _split(self)
+        v2, rc2, rcn2 = _split(other)
         result = _compare_rpm_labels((None, v1, None), (None, v2, None))
         if result == -1:
             return True
@@ -202,3 +202,15 @@ class RpmVersion(Version):
 
         # neither is a rc
         return False
+
+
+def _split(version):
+    """
+    Return the parsed version split by :meth:`RpmVersion.split_rc`, computed
+    once per version string as versions are compared many times when sorted.
+    """
+    key = (version.version, version.prefix)
+    if getattr(version, '_split_key', None) != key:
+        version._split_value = RpmVersion.split_rc(version.parse())
+        version._split_key = key
+    return version._split_value
@@ -23,6 +23,8 @@ Base class for Anitya tests.
 from __future__ import print_function
 
 from functools import wraps
+import collections
+import contextlib
 import unittest
 import os
 
@@ -31,6 +33,7 @@ import mock
 
 import anitya.lib
 import anitya.lib.model as model
+from anitya.lib.backends import BaseBackend
 
 #DB_PATH = 'sqlite:///:memory:'
 ## A file database is required to check the integrity, don't ask
@@ -63,6 +66,22 @@ def skip_jenkins(function):
     return decorated_function
 
 
+@contextlib.contextmanager
+def count_requests():
+    """ Count the requests the backends make to upstream in the block, by
+    backend name. Requests answered by a cache are not counted.
+    """
+    counts = collections.Counter()
+    call_url = BaseBackend._call_url.__func__
+
+    def counted(cls, url, *args, **kwargs):
+        counts[cls.name] += 1
+        return call_url(cls, url, *args, **kwargs)
+
+    with mock.patch.object(BaseBackend, '_call_url', classmethod(counted)):
+        yield counts
+
+
 class Modeltests(unittest.TestCase):
     """ Model tests. """
     maxDiff = None
@@ -22,13 +22,18 @@ Tests for the :mod:`anitya.lib.backends.crates` module.
 """
 from __future__ import unicode_literals
 
+import shutil
+import tempfile
 import unittest
 
 import mock
 
+import anitya.app
+
 from anitya.lib.exceptions import AnityaPluginException
 from anitya.lib.backends import crates
 from anitya.tests.base import Modeltests, skip_jenkins
+from anitya.tests.lib.test_crates_index import write_crate
 import anitya.lib.model as model
 
 
@@ -92,6 +97,92 @@ class CratesBackendTests(Modeltests):
             crates.CratesBackend._get_versions(project)
             self.assertIn('Failed to decode JSON', str(context_manager.exception))
 
+    @mock.patch('anitya.lib.backends.crates.CratesBackend.call_url')
+    def test_get_versions_yanked(self, mock_call_url):
+        """Assert yanked versions are ignored."""
+        mock_call_url.return_value.json.return_value = {'versions': [
+            {'num': '0.2.1', 'yanked': True},
+            {'num': '0.2.0', 'yanked': False},
+        ]}
+        project = model.Project.by_id(self.session, 1)
+        self.assertEqual(['0.2.0'], crates.CratesBackend.get_versions(project))
+        self.assertEqual('0.2.0', crates.CratesBackend.get_version(project))
+
+
+class CratesIndexBackendTests(Modeltests):
+    """Tests for the crates backend reading the crates.io index."""
+
+    def setUp(self):
+        super(CratesIndexBackendTests, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.addCleanup(crates._prefetched.clear)
+        self.project = model.Project(
+            name='itoa',
+            homepage='https://crates.io/crates/itoa',
+            backend='crates.io',
+        )
+        self.session.add(self.project)
+        self.session.commit()
+        write_crate(self.path, 'itoa', [
+            ('0.1.0', False), ('0.3.0', True), ('0.2.0', False)])
+
+    @mock.patch('anitya.lib.crates_index.CratesIndex.update')
+    @mock.patch('anitya.lib.backends.crates.CratesBackend._get_versions')
+    def test_prefetch(self, mock_get_versions, mock_update):
+        """Assert prefetched versions are used once, then the API is queried."""
+        mock_get_versions.return_value = [{'num': '0.4.0', 'yanked': False}]
+        with mock.patch.dict(anitya.app.APP.config, {
+                'CRATES_INDEX_PATH': self.path, 'CRATES_INDEX_TTL': 60}):
+            crates.CratesBackend.prefetch([self.project])
+
+        mock_update.assert_called_once_with(max_age=60)
+        self.assertEqual(
+            ['0.2.0', '0.1.0'], crates.CratesBackend.get_versions(self.project))
+        self.assertEqual(0, mock_get_versions.call_count)
+        self.assertEqual('0.4.0', crates.CratesBackend.get_version(self.project))
+
+    @mock.patch('anitya.lib.crates_index.CratesIndex.update')
+    def test_prefetch_backport(self, mock_update):
+        """Assert a backport published after a newer version is not the latest."""
+        write_crate(self.path, 'itoa', [
+            ('1.0.0', False), ('2.0.0', False), ('1.0.1', False)])
+        with mock.patch.dict(anitya.app.APP.config, {'CRATES_INDEX_PATH': self.path}):
+            crates.CratesBackend.prefetch([self.project])
+
+        self.assertEqual(
+            ['2.0.0', '1.0.1', '1.0.0'],
+            crates.CratesBackend.get_versions(self.project))
+
+        with mock.patch.dict(anitya.app.APP.config, {'CRATES_INDEX_PATH': self.path}):
+            crates.CratesBackend.prefetch([self.project])
+        self.assertEqual('2.0.0', crates.CratesBackend.get_version(self.project))
+
+    @mock.patch('anitya.lib.crates_index.CratesIndex.update')
+    @mock.patch('anitya.lib.backends.crates.CratesBackend._get_versions')
+    def test_prefetch_missing(self, mock_get_versions, mock_update):
+        """Assert crates missing from the index are looked up with the API."""
+        mock_get_versions.return_value = [{'num': '1.0.0', 'yanked': False}]
+        project = model.Project(
+            name='serde',
+            homepage='https://crates.io/crates/serde',
+            backend='crates.io',
+        )
+        with mock.patch.dict(anitya.app.APP.config, {'CRATES_INDEX_PATH': self.path}):
+            crates.CratesBackend.prefetch([self.project, project])
+
+        self.assertEqual(['1.0.0'], crates.CratesBackend.get_versions(project))
+        mock_get_versions.assert_called_once_with(project)
+
+    @mock.patch('anitya.lib.crates_index.CratesIndex.update')
+    def test_prefetch_no_index(self, mock_update):
+        """Assert nothing is prefetched without CRATES_INDEX_PATH."""
+        with mock.patch.dict(anitya.app.APP.config, {'CRATES_INDEX_PATH': None}):
+            crates.CratesBackend.prefetch([self.project])
+
+        self.assertEqual(0, mock_update.call_count)
+        self.assertEqual({}, crates._prefetched)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
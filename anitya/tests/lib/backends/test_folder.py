@@ -110,7 +110,8 @@ class FolderBackendtests(Modeltests):
                 backend.FolderBackend.get_versions,
                 project
             )
-            m_call.assert_called_with(project.version_url, insecure=True)
+            m_call.assert_called_with(
+                project.version_url, insecure=True, headers={}, stream=False)
 
     def test_folder_get_versions(self):
         """ Test the get_versions function of the folder backend. """
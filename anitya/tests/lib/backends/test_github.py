@@ -25,6 +25,10 @@ anitya tests for the custom backend.
 
 import unittest
 
+import mock
+import requests
+
+import anitya.app
 import anitya.lib.backends.github as backend
 import anitya.lib.model as model
 from anitya.lib.exceptions import AnityaPluginException
@@ -136,6 +140,161 @@ class GithubBackendtests(Modeltests):
         self.assertEqual(u'3.3', version)
 
 
+def _refs(names, cursor=None):
+    """ Return the refs of a repository in a GraphQL response. """
+    return {'refs': {
+        'nodes': [{'name': name} for name in names],
+        'pageInfo': {'hasNextPage': cursor is not None, 'endCursor': cursor},
+    }}
+
+
+def _response(data):
+    """ Return a response of the GraphQL API. """
+    return mock.Mock(
+        status_code=200, content=b'{}', headers={},
+        json=mock.Mock(return_value={'data': data}))
+
+
+@mock.patch.dict(anitya.app.APP.config, {'GITHUB_ACCESS_TOKEN': 'token'})
+@mock.patch('anitya.lib.backends.github.http_session')
+class GithubGraphQLtests(unittest.TestCase):
+    """ Github backend tests for the GraphQL API. """
+
+    def tearDown(self):
+        backend._prefetched.clear()
+
+    def test_get_versions(self, mock_session):
+        """ Assert the tags are retrieved from the GraphQL API. """
+        mock_session.post.return_value = _response(
+            {'r0': _refs(['0.1', '0.2'])})
+        project = model.Project(
+            name='fedocal', version_url='https://github.com/fedora-infra/fedocal')
+
+        self.assertEqual(
+            ['0.1', '0.2'], backend.GithubBackend.get_versions(project))
+        kwargs = mock_session.post.call_args[1]
+        self.assertEqual('bearer token', kwargs['headers']['Authorization'])
+        self.assertEqual('fedora-infra', kwargs['json']['variables']['o0'])
+        self.assertEqual('fedocal', kwargs['json']['variables']['n0'])
+        self.assertIsNone(kwargs['json']['variables']['c0'])
+
+    def test_get_versions_prefix(self, mock_session):
+        """ Assert the version prefix is stripped from the tags. """
+        mock_session.post.return_value = _response(
+            {'r0': _refs(['release-1.2', 'release-1.1', 'v1.0'])})
+        project = model.Project(
+            name='fedocal', version_url='fedora-infra/fedocal',
+            version_prefix='release-')
+
+        self.assertEqual(
+            ['1.2', '1.1', 'v1.0'], backend.GithubBackend.get_versions(project))
+        self.assertIn(
+            'orderBy: {field: TAG_COMMIT_DATE, direction: DESC}',
+            mock_session.post.call_args[1]['json']['query'])
+
+    def test_prefetch_prefix(self, mock_session):
+        """ Assert the version prefix is stripped from the prefetched tags. """
+        mock_session.post.return_value = _response(
+            {'r0': _refs(['release-1.2'])})
+        project = model.Project(
+            name='bar', version_url='foo/bar', version_prefix='release-')
+
+        backend.GithubBackend.prefetch([project])
+
+        self.assertEqual(['1.2'], backend.GithubBackend.get_versions(project))
+        self.assertEqual(1, mock_session.post.call_count)
+
+    def test_get_versions_missing(self, mock_session):
+        """ Assert repositories which do not exist are reported. """
+        mock_session.post.return_value = _response({'r0': None})
+        project = model.Project(name='foobar', version_url='foobar/bar')
+
+        self.assertRaises(
+            AnityaPluginException, backend.GithubBackend.get_versions, project)
+
+    def test_get_versions_error(self, mock_session):
+        """ Assert queries refused by GitHub are reported. """
+        mock_session.post.return_value = mock.Mock(
+            status_code=401, content=b'', headers={})
+        project = model.Project(name='foobar', version_url='foobar/bar')
+
+        self.assertRaises(
+            AnityaPluginException, backend.GithubBackend.get_versions, project)
+
+    def test_get_versions_no_tags(self, mock_session):
+        """ Assert repositories without tags are reported. """
+        mock_session.post.return_value = _response({'r0': _refs([])})
+        project = model.Project(name='foobar', version_url='foobar/bar')
+
+        self.assertRaises(
+            AnityaPluginException, backend.GithubBackend.get_version, project)
+
+    def test_get_versions_connection_error(self, mock_session):
+        """ Assert GitHub being unreachable is reported. """
+        mock_session.post.side_effect = requests.ConnectionError('refused')
+        project = model.Project(name='foobar', version_url='foobar/bar')
+
+        self.assertRaises(
+            AnityaPluginException, backend.GithubBackend.get_versions, project)
+
+    def test_prefetch_errors(self, mock_session):
+        """ Assert unexpected answers of GitHub are reported. """
+        project = model.Project(name='bar', version_url='foo/bar')
+        for answer in [
+                requests.Timeout('timed out'),
+                mock.Mock(
+                    status_code=200, content=b'<html>', headers={},
+                    json=mock.Mock(side_effect=ValueError('no JSON'))),
+                _response({'r0': {'refs': {'nodes': []}}})]:
+            mock_session.post.side_effect = [answer]
+            self.assertRaises(
+                AnityaPluginException, backend.GithubBackend.prefetch,
+                [project])
+
+    def test_fetch_tags(self, mock_session):
+        """ Assert repositories are queried in batches, and paginated. """
+        mock_session.post.side_effect = [
+            _response({'r0': _refs(['a1'], cursor='next'), 'r1': None}),
+            _response({'r0': _refs(['c1']), 'r1': _refs(['a2'])}),
+        ]
+
+        tags = backend.fetch_tags(['foo/a', 'foo/b', 'foo/c'], 'token', 2)
+
+        self.assertEqual(
+            {'foo/a': ['a1', 'a2'], 'foo/b': None, 'foo/c': ['c1']}, tags)
+        self.assertEqual(2, mock_session.post.call_count)
+        variables = mock_session.post.call_args[1]['json']['variables']
+        self.assertEqual({
+            'o0': 'foo', 'n0': 'c', 'c0': None,
+            'o1': 'foo', 'n1': 'a', 'c1': 'next',
+        }, variables)
+
+    def test_prefetch(self, mock_session):
+        """ Assert prefetched tags are used once by the checks. """
+        mock_session.post.side_effect = [
+            _response({'r0': _refs(['1.0']), 'r1': _refs(['2.0'])}),
+            _response({'r0': _refs(['1.1'])}),
+        ]
+        bar = model.Project(name='bar', homepage='https://github.com/foo/bar/')
+        baz = model.Project(name='baz', version_url='foo/baz')
+
+        backend.GithubBackend.prefetch([bar, baz])
+
+        self.assertEqual(['1.0'], backend.GithubBackend.get_versions(bar))
+        self.assertEqual(['2.0'], backend.GithubBackend.get_versions(baz))
+        self.assertEqual(['1.1'], backend.GithubBackend.get_versions(bar))
+        self.assertEqual(2, mock_session.post.call_count)
+
+    def test_no_token(self, mock_session):
+        """ Assert nothing is prefetched without a token. """
+        project = model.Project(name='bar', version_url='foo/bar')
+        with mock.patch.dict(
+                anitya.app.APP.config, {'GITHUB_ACCESS_TOKEN': None}):
+            backend.GithubBackend.prefetch([project])
+
+        self.assertEqual(0, mock_session.post.call_count)
+
+
 if __name__ == '__main__':
     SUITE = unittest.TestLoader().loadTestsFromTestCase(GithubBackendtests)
     unittest.TextTestRunner(verbosity=2).run(SUITE)
@@ -23,13 +23,16 @@ Unit tests for the anitya.lib.backends module.
 """
 from __future__ import absolute_import, unicode_literals
 
+import io
 import re
 import unittest
 
 import mock
+import requests
 
-from anitya.lib import backends
-from anitya.lib.exceptions import AnityaPluginException
+from anitya.lib import backends, model, scheduler, url_cache
+from anitya.lib.exceptions import (
+    AnityaPluginException, ResponseTooLarge, UpstreamNotModified)
 import anitya
 
 
@@ -50,17 +53,211 @@ class BaseBackendTests(unittest.TestCase):
         self.backend.call_url(url)
 
         mock_http_session.get.assert_called_once_with(
-            url, headers=self.headers, timeout=60, verify=True)
+            url, headers=self.headers, timeout=(10, 60), verify=True, stream=True)
 
-    @mock.patch('anitya.lib.backends.requests.Session')
-    def test_call_insecure_http_url(self, mock_session):
-        """Assert HTTP urls are handled by requests"""
+    @mock.patch('anitya.lib.backends.http_session')
+    @mock.patch('anitya.lib.backends.insecure_http_session')
+    def test_call_insecure_http_url(self, mock_insecure_session, mock_http_session):
+        """Assert insecure HTTP urls use their own pooled session"""
         url = 'https://www.example.com/'
         self.backend.call_url(url, insecure=True)
+        self.backend.call_url(url, insecure=True)
+
+        self.assertEqual(
+            [mock.call(url, headers=self.headers, timeout=(10, 60), verify=False, stream=True)] * 2,
+            mock_insecure_session.get.call_args_list)
+        self.assertEqual(0, mock_http_session.get.call_count)
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_call_http_url_scheduled(self, mock_http_session):
+        """Assert requests wait for a slot of their host in the scheduler"""
+        url = 'http://www.example.com/'
+        with scheduler.run_scheduler() as host_scheduler:
+            with mock.patch.object(
+                    host_scheduler, 'slot', wraps=host_scheduler.slot) as slot:
+                self.backend.call_url(url)
+
+        slot.assert_called_once_with('www.example.com')
+        self.assertEqual(1, mock_http_session.get.call_count)
+
+    def test_insecure_session(self):
+        """Assert insecure requests never share the pools of secure ones"""
+        self.assertIsNot(backends.http_session, backends.insecure_http_session)
+        self.assertIsNot(
+            backends.http_session.get_adapter('https://'),
+            backends.insecure_http_session.get_adapter('https://'))
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_call_http_url_headers(self, mock_http_session):
+        """Assert additional headers are sent along the default ones"""
+        url = 'http://www.example.com/'
+        self.backend.call_url(url, headers={'If-None-Match': '"abc"'})
+
+        self.headers['If-None-Match'] = '"abc"'
+        mock_http_session.get.assert_called_once_with(
+            url, headers=self.headers, timeout=(10, 60), verify=True, stream=True)
+
+    def test_get_host_backend(self):
+        """Assert the host of the backend is used when it has one"""
+        project = mock.Mock(version_url='https://example.com/releases/')
+
+        with mock.patch.object(backends.BaseBackend, 'host', 'pypi.python.org'):
+            self.assertEqual('pypi.python.org', self.backend.get_host(project))
+
+    def test_get_host_version_url(self):
+        """Assert the host of the version URL is used by default"""
+        project = mock.Mock(
+            version_url='https://Example.com:8080/releases/',
+            homepage='https://www.example.org/')
+        self.assertEqual('example.com', self.backend.get_host(project))
+
+    def test_get_host_homepage(self):
+        """Assert the host of the homepage is used without a version URL"""
+        project = mock.Mock(version_url=None, homepage='https://www.example.org/')
+        self.assertEqual('www.example.org', self.backend.get_host(project))
+
+
+@mock.patch('anitya.lib.backends.BaseBackend.call_url')
+class ExpandSubdirsTests(unittest.TestCase):
+    """
+    Unit tests for anitya.lib.backends.BaseBackend.expand_subdirs
+    """
+
+    listings = {
+        'https://example.com/sources/': '<a href="foo/">foo/</a>'
+                                        '<a href="bar/">bar/</a>',
+        'https://example.com/sources/foo/': '<a href="1.10/">1.10/</a>'
+                                            '<a href="1.9/">1.9/</a>'
+                                            '<a href="1.10.0/">1.10.0/</a>'
+                                            '<a href="1.10.0rc1/">1.10.0rc1/</a>',
+        'https://example.com/sources/bar/': '<a href="0.1/">0.1/</a>',
+    }
+
+    def _call_url(self, url):
+        return mock.Mock(
+            content=self.listings[url].encode('utf-8'), headers={})
+
+    def test_expand(self, mock_call_url):
+        """Assert globs are replaced by the latest matching directory"""
+        mock_call_url.side_effect = self._call_url
+
+        self.assertEqual(
+            'https://example.com/sources/foo/1.10.0/',
+            backends.BaseBackend.expand_subdirs('https://example.com/sources/foo/*/'))
+        self.assertEqual(
+            'https://example.com/sources/foo/1.9/',
+            backends.BaseBackend.expand_subdirs('https://example.com/sources/foo/*9/'))
+        self.assertEqual(
+            'https://example.com/sources/bar/0.1/',
+            backends.BaseBackend.expand_subdirs('https://example.com/sources/b*/*/'))
+
+    def test_no_match(self, mock_call_url):
+        """Assert URLs are left alone when no directory matches"""
+        mock_call_url.side_effect = self._call_url
 
-        insecure_session = mock_session.return_value.__enter__.return_value
-        insecure_session.get.assert_called_once_with(
-            url, headers=self.headers, timeout=60, verify=False)
+        url = 'https://example.com/sources/foo/3.*/'
+        self.assertEqual(url, backends.BaseBackend.expand_subdirs(url))
+
+    def test_memoized(self, mock_call_url):
+        """Assert the directories are only expanded once per run"""
+        mock_call_url.side_effect = self._call_url
+
+        with url_cache.run_cache():
+            for _ in range(3):
+                backends.BaseBackend.expand_subdirs('https://example.com/sources/f*/*/')
+            backends.BaseBackend.expand_subdirs('https://example.com/sources/foo/*/')
+
+        self.assertEqual(
+            ['https://example.com/sources/', 'https://example.com/sources/foo/'],
+            [call[0][0] for call in mock_call_url.call_args_list])
+
+
+@mock.patch('anitya.lib.backends.BaseBackend.call_url')
+class CallUrlIfModifiedTests(unittest.TestCase):
+    """
+    Unit tests for anitya.lib.backends.call_url_if_modified
+    """
+
+    def setUp(self):
+        self.url = 'https://www.example.com/releases/'
+        self.project = mock.Mock(
+            http_validator=model.HttpValidator(
+                url=self.url, etag='"abc"',
+                last_modified='Wed, 14 Jun 2017 10:00:00 GMT'),
+            pending_http_validator=None,
+        )
+
+    def test_conditional(self, mock_call_url):
+        """Assert the validators of the page are sent back upstream"""
+        mock_call_url.return_value = mock.Mock(
+            status_code=200, content=b'foo-1.0.tar.gz', headers={})
+
+        text = backends.call_url_if_modified(self.url, self.project)
+
+        self.assertEqual('foo-1.0.tar.gz', text)
+        mock_call_url.assert_called_once_with(
+            self.url, insecure=False, headers={
+                'If-None-Match': '"abc"',
+                'If-Modified-Since': 'Wed, 14 Jun 2017 10:00:00 GMT',
+            }, stream=False)
+        self.assertIsNone(self.project.pending_http_validator)
+
+    def test_other_url(self, mock_call_url):
+        """Assert the validators of another page are not used"""
+        mock_call_url.return_value = mock.Mock(
+            status_code=200, content=b'foo-1.0.tar.gz', headers={})
+
+        backends.call_url_if_modified(
+            'https://www.example.com/other/', self.project)
+
+        mock_call_url.assert_called_once_with(
+            'https://www.example.com/other/', insecure=False, headers={},
+            stream=False)
+
+    def test_not_modified(self, mock_call_url):
+        """Assert UpstreamNotModified is raised on 304 Not Modified"""
+        mock_call_url.return_value = mock.Mock(status_code=304, headers={})
+
+        self.assertRaises(
+            UpstreamNotModified,
+            backends.call_url_if_modified,
+            self.url, self.project)
+
+    def test_new_validators(self, mock_call_url):
+        """Assert the validators of the page returned are kept"""
+        mock_call_url.return_value = mock.Mock(
+            status_code=200, content=b'foo-1.1.tar.gz',
+            headers={'ETag': '"def"'})
+
+        backends.call_url_if_modified(self.url, self.project)
+
+        validator = self.project.pending_http_validator
+        self.assertEqual(self.url, validator.url)
+        self.assertEqual('"def"', validator.etag)
+        self.assertIsNone(validator.last_modified)
+
+    def test_glob(self, mock_call_url):
+        """Assert requests of URLs with globs are never conditional"""
+        url = 'https://www.example.com/*/'
+        self.project.http_validator.url = url
+        mock_call_url.return_value = mock.Mock(
+            status_code=200, content=b'foo-1.1.tar.gz',
+            headers={'ETag': '"def"'})
+
+        backends.call_url_if_modified(url, self.project)
+
+        mock_call_url.assert_called_once_with(
+            url, insecure=False, headers={}, stream=False)
+        self.assertIsNone(self.project.pending_http_validator)
+
+    def test_error(self, mock_call_url):
+        """Assert request errors are turned into AnityaPluginException"""
+        mock_call_url.side_effect = ValueError('boom')
+
+        self.assertRaises(
+            AnityaPluginException,
+            backends.call_url_if_modified,
+            self.url, self.project)
 
 
 class GetVersionsByRegexTextTests(unittest.TestCase):
@@ -138,5 +335,199 @@ class GetVersionsByRegexTextTests(unittest.TestCase):
         )
 
 
+def _response(body, headers=None, encoding='utf-8'):
+    """Build a streamed response with the provided body."""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers or {})
+    response.encoding = encoding
+    return response
+
+
+@mock.patch.dict(anitya.app.APP.config, {'MAX_RESPONSE_SIZE': 10})
+@mock.patch('anitya.lib.backends.http_session')
+class ResponseSizeTests(unittest.TestCase):
+    """
+    Unit tests for the size limit of the responses of call_url
+    """
+
+    def test_small(self, mock_http_session):
+        """Assert responses up to the limit are read"""
+        mock_http_session.get.return_value = _response(b'0123456789')
+
+        response = backends.BaseBackend.call_url('https://example.com/')
+
+        self.assertEqual(b'0123456789', response.content)
+        self.assertEqual('0123456789', response.text)
+
+    def test_too_large(self, mock_http_session):
+        """Assert responses larger than the limit are aborted"""
+        mock_http_session.get.return_value = _response(b'0123456789a')
+
+        self.assertRaises(
+            ResponseTooLarge,
+            backends.BaseBackend.call_url, 'https://example.com/')
+
+    def test_content_length(self, mock_http_session):
+        """Assert responses announced larger than the limit are not read"""
+        response = _response(b'', headers={'Content-Length': '11'})
+        mock_http_session.get.return_value = response
+
+        self.assertRaises(
+            ResponseTooLarge,
+            backends.BaseBackend.call_url, 'https://example.com/')
+
+    def test_stream_too_large(self, mock_http_session):
+        """Assert streamed responses are aborted as they are read"""
+        mock_http_session.get.return_value = _response(b'0123456789a')
+        response = backends.BaseBackend.call_url(
+            'https://example.com/', stream=True)
+
+        self.assertRaises(
+            ResponseTooLarge,
+            list, backends.iter_response_text(response, 'https://example.com/'))
+
+
+class IterResponseTextTests(unittest.TestCase):
+    """
+    Unit tests for anitya.lib.backends.iter_response_text
+    """
+
+    @mock.patch('anitya.lib.backends.CHUNK_SIZE', 3)
+    def test_multibyte(self):
+        """Assert characters split between two chunks are decoded"""
+        response = _response('héhé'.encode('utf-8'))
+
+        chunks = list(backends.iter_response_text(response, 'url'))
+
+        self.assertEqual('héhé', ''.join(chunks))
+        self.assertTrue(len(chunks) > 1)
+
+    def test_read(self):
+        """Assert responses already read are iterated over as well"""
+        response = _response('héhé'.encode('latin-1'), encoding='latin-1')
+        response.content
+
+        self.assertEqual(
+            'héhé', ''.join(backends.iter_response_text(response, 'url')))
+
+    @mock.patch('anitya.lib.backends.CHUNK_SIZE', 4)
+    def test_not_utf8(self):
+        """Assert the rest of pages which are not UTF-8 is decoded anyway"""
+        response = _response(
+            'abcdefé'.encode('latin-1'), encoding='ISO-8859-1')
+
+        self.assertEqual(
+            'abcdefé', ''.join(backends.iter_response_text(response, 'url')))
+
+    def test_truncated(self):
+        """Assert pages ending with an incomplete character are decoded"""
+        response = _response(b'abc\xc3', encoding=None)
+
+        self.assertEqual(
+            'abc\xc3', ''.join(backends.iter_response_text(response, 'url')))
+
+    def test_backend_encoding(self):
+        """Assert the encoding of the backend is used if none is declared"""
+        response = _response('héhé'.encode('cp1252'), encoding=None)
+
+        self.assertEqual('héhé', ''.join(
+            backends.iter_response_text(response, 'url', 'cp1252')))
+
+
+class ResponseTextTests(unittest.TestCase):
+    """
+    Unit tests for anitya.lib.backends.response_text
+    """
+
+    def test_declared(self):
+        """Assert the charset declared wins"""
+        response = _response(
+            'héhé'.encode('latin-1'),
+            headers={'Content-Type': 'text/html; charset=ISO-8859-1'},
+            encoding='ISO-8859-1')
+
+        self.assertEqual('héhé', backends.response_text(response, 'utf-8'))
+
+    def test_backend_encoding(self):
+        """Assert the encoding of the backend is used otherwise"""
+        response = _response(
+            'héhé'.encode('cp1252'), headers={'Content-Type': 'text/html'},
+            encoding='ISO-8859-1')
+
+        self.assertEqual('héhé', backends.response_text(response, 'cp1252'))
+
+    @mock.patch(
+        'requests.Response.apparent_encoding', new_callable=mock.PropertyMock)
+    def test_utf8(self, mock_apparent_encoding):
+        """Assert UTF-8 pages which do not say so are not run by detection"""
+        for encoding in ('ISO-8859-1', None):
+            response = _response(
+                'héhé'.encode('utf-8'), headers={'Content-Type': 'text/html'},
+                encoding=encoding)
+
+            self.assertEqual('héhé', backends.response_text(response))
+        self.assertEqual(0, mock_apparent_encoding.call_count)
+
+    def test_default_encoding(self):
+        """Assert the default encoding of requests is used otherwise"""
+        response = _response(
+            'héhé'.encode('latin-1'), headers={'Content-Type': 'text/html'},
+            encoding='ISO-8859-1')
+
+        self.assertEqual('héhé', backends.response_text(response))
+
+    def test_detection(self):
+        """Assert the encoding is detected as a last resort"""
+        response = _response('héhé'.encode('latin-1'), encoding=None)
+
+        with mock.patch.object(
+                requests.Response, 'apparent_encoding', 'latin-1'):
+            self.assertEqual('héhé', backends.response_text(response))
+
+
+class FindallByChunksTests(unittest.TestCase):
+    """
+    Unit tests for anitya.lib.backends.findall_by_chunks
+    """
+
+    def assertFindall(self, regex, text, size):
+        """Assert the text searched by chunks matches like re.findall"""
+        pattern = re.compile(regex)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        self.assertEqual(
+            pattern.findall(text),
+            list(backends.findall_by_chunks(pattern, chunks, overlap=16)))
+
+    def test_boundaries(self):
+        """Assert matches spanning chunks are found once"""
+        text = 'foo-1.0.tar.gz foo-1.10.tar.gz foo-12.0.1.tar.gz bar-2.0.tar.gz '
+        for size in range(1, len(text) + 1):
+            self.assertFindall(r'foo-([\d.]+)\.tar', text, size)
+            self.assertFindall(r'(\w+)-([\d.]+)\.tar', text, size)
+            self.assertFindall(r'\d+\.\d+', text, size)
+
+    def test_context(self):
+        """Assert anchors, word boundaries and lookbehinds are not fooled by
+        the boundaries of the chunks"""
+        text = 'libfoo-1.2 foo-1.3\nfoo-1.4 xfoo-1.5 foo-1.6'
+        for size in range(1, len(text) + 1):
+            self.assertFindall(r'\bfoo-([\d.]+)', text, size)
+            self.assertFindall(r'(?<![a-z])foo-([\d.]+)', text, size)
+            self.assertFindall(r'^\w+-([\d.]+)', text, size)
+            self.assertFindall(r'\A\w+-([\d.]+)', text, size)
+            self.assertFindall(r'(?m)^foo-([\d.]+)', text, size)
+            self.assertFindall(r'foo-([\d.]+)$', text, size)
+
+    def test_get_versions_by_regex_for_chunks(self):
+        """Assert versions are found in chunks of text"""
+        mock_project = mock.Mock(version_prefix='')
+        versions = backends.get_versions_by_regex_for_chunks(
+            ['foo-1.', '0.tar.gz foo-1', '.1.tar.gz'], 'url',
+            r'foo-([\d.]+)\.tar', mock_project)
+        self.assertEqual(['1.0', '1.1'], sorted(versions))
+
+
 if __name__ == '__main__':
     unittest.main()
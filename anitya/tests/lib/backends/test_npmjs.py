@@ -23,12 +23,18 @@
 anitya tests for the custom backend.
 '''
 
+import io
 import unittest
 
+import mock
+import requests
+
+import anitya
 import anitya.lib.backends.npmjs as backend
 import anitya.lib.model as model
 from anitya.lib.exceptions import AnityaPluginException
-from anitya.tests.base import Modeltests, create_distro, skip_jenkins
+from anitya.tests.base import (
+    Modeltests, count_requests, create_distro, skip_jenkins)
 
 
 BACKEND = 'npmjs'
@@ -157,6 +163,133 @@ class NpmjsBackendtests(Modeltests):
         # etc...
 
 
+def _response(body):
+    """ Build a response of the registry with the provided body. """
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    return response
+
+
+@mock.patch('anitya.lib.backends.http_session')
+class NpmjsRequestsTests(unittest.TestCase):
+    """ Tests of the requests made by the npmjs backend. """
+
+    def test_single_request(self, mock_session):
+        """ Assert a check downloads the registry document once. """
+        mock_session.get.side_effect = lambda *args, **kwargs: _response(
+            b'{"versions": {"1.0": {}, "1.1": {}}}')
+        project = model.Project(
+            name='request', backend=BACKEND, version_scheme='RPM')
+
+        with count_requests() as counts:
+            self.assertEqual(
+                '1.1', anitya.fetch_version(backend.NpmjsBackend, project))
+            # Outside of a check, each method downloads it
+            backend.NpmjsBackend.get_version(project)
+
+        self.assertEqual({BACKEND: 3}, counts)
+
+    def test_abbreviated(self, mock_session):
+        """ Assert the abbreviated metadata of the package is requested. """
+        mock_session.get.return_value = _response(
+            b'{"name": "request", "dist-tags": {"latest": "1.0", "next": "2.0"},'
+            b' "versions": {"1.0": {"dist": {}}, "2.0": {"dist": {}}}}')
+        project = model.Project(name='request', backend=BACKEND)
+
+        self.assertEqual('1.0', backend.NpmjsBackend.get_version(project))
+        headers = mock_session.get.call_args[1]['headers']
+        self.assertEqual(
+            'application/vnd.npm.install-v1+json', headers['Accept'])
+
+    def test_not_found(self, mock_session):
+        """ Assert packages which do not exist are reported. """
+        mock_session.get.return_value = _response(b'{"error": "Not found"}')
+        project = model.Project(name='foobarasd', backend=BACKEND)
+
+        self.assertRaises(
+            AnityaPluginException, backend.NpmjsBackend.get_versions, project)
+
+    def test_not_json(self, mock_session):
+        """ Assert documents which are not JSON are reported. """
+        mock_session.get.return_value = _response(b'<html></html>')
+        project = model.Project(name='request', backend=BACKEND)
+
+        self.assertRaises(
+            AnityaPluginException, backend.NpmjsBackend.get_versions, project)
+
+
+@mock.patch('anitya.lib.backends.http_session')
+class NpmjsChangesTests(unittest.TestCase):
+    """ Tests of the following of the changes of the registry. """
+
+    def test_get_update_seq(self, mock_session):
+        """ Assert the sequence of the last change is returned. """
+        mock_session.get.return_value = _response(
+            b'{"db_name": "registry", "update_seq": 1234}')
+
+        self.assertEqual('1234', backend.NpmjsBackend.get_update_seq())
+
+    def test_get_changes(self, mock_session):
+        """ Assert the packages changed are returned, with the sequence. """
+        mock_session.get.return_value = _response(
+            b'{"results": ['
+            b'{"seq": 11, "id": "request", "changes": [{"rev": "1-a"}]},'
+            b'{"seq": 12, "id": "gone", "deleted": true},'
+            b'{"seq": 13, "id": "_design/app"},'
+            b'{"seq": 14, "id": "@scope/pkg"}'
+            b'], "last_seq": 14}')
+
+        names, last_seq = backend.NpmjsBackend.get_changes('10', 4)
+
+        self.assertEqual(['request', '@scope/pkg'], names)
+        self.assertEqual('14', last_seq)
+        self.assertEqual(
+            'https://replicate.npmjs.com/_changes?since=10&limit=4',
+            mock_session.get.call_args[0][0])
+
+    def test_get_changes_none(self, mock_session):
+        """ Assert the sequence is kept when nothing changed. """
+        mock_session.get.return_value = _response(
+            b'{"results": [], "last_seq": "10-abc"}')
+
+        self.assertEqual(
+            ([], '10-abc'), backend.NpmjsBackend.get_changes('10-abc', 4))
+
+    def test_get_changes_error(self, mock_session):
+        """ Assert unexpected documents are reported. """
+        mock_session.get.return_value = _response(b'{"error": "not_found"}')
+
+        self.assertRaises(
+            AnityaPluginException, backend.NpmjsBackend.get_changes, '10', 4)
+
+
+class ParseMetadataTests(unittest.TestCase):
+    """ Tests of the parsing of the documents of the registry. """
+
+    def test_parse(self):
+        """ Assert the versions and dist-tags are found across chunks. """
+        document = (
+            b'{"name": "a", "readme": "{\\"versions\\": 1}",'
+            b' "dist-tags": {"latest": "1.1", "v.next": "2.0"},'
+            b' "versions": {"1.0": {"versions": {"0.1": 1}}, "1.1": {}}}')
+        chunks = [document[i:i + 7] for i in range(0, len(document), 7)]
+
+        versions, dist_tags, error = backend._parse_metadata(chunks)
+
+        self.assertEqual(['1.0', '1.1'], versions)
+        self.assertEqual({'latest': '1.1', 'v.next': '2.0'}, dist_tags)
+        self.assertIsNone(error)
+
+    def test_chunks_file(self):
+        """ Assert chunks are read by the size asked. """
+        stream = backend._ChunksFile([b'ab', b'cde', b'f'])
+
+        self.assertEqual(b'abcd', stream.read(4))
+        self.assertEqual(b'ef', stream.read())
+        self.assertEqual(b'', stream.read(4))
+
+
 if __name__ == '__main__':
     SUITE = unittest.TestLoader().loadTestsFromTestCase(NpmjsBackendtests)
     unittest.TextTestRunner(verbosity=2).run(SUITE)
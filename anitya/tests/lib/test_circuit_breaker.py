@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.circuit_breaker` module."""
+from __future__ import unicode_literals
+
+import ftplib
+import unittest
+
+import mock
+import requests
+
+from anitya.lib import backends, circuit_breaker, run_stats
+from anitya.lib.exceptions import AnityaPluginException, CircuitOpen
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.circuit_breaker.CircuitBreaker` class."""
+
+    def test_opens_after_threshold(self):
+        """Assert the circuit opens after consecutive failures only."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=3, cooldown=60)
+        breaker.failure('example.com', now=0)
+        breaker.failure('example.com', now=0)
+        breaker.success('example.com')
+        breaker.failure('example.com', now=0)
+        breaker.failure('example.com', now=0)
+        breaker.before('example.com', now=0)
+        self.assertEqual([], breaker.open_hosts())
+
+        breaker.failure('example.com', now=0)
+
+        self.assertEqual(['example.com'], breaker.open_hosts())
+        self.assertRaises(CircuitOpen, breaker.before, 'example.com', now=59)
+        self.assertEqual(1, breaker.short_circuited)
+        # Other hosts are not affected
+        breaker.before('example.org', now=59)
+
+    def test_half_open(self):
+        """Assert a single request probes the host after the cooldown."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=1, cooldown=60)
+        breaker.failure('example.com', now=0)
+
+        breaker.before('example.com', now=60)
+        self.assertRaises(CircuitOpen, breaker.before, 'example.com', now=61)
+
+        # The probe failed, wait for another cooldown
+        breaker.failure('example.com', now=61)
+        self.assertRaises(CircuitOpen, breaker.before, 'example.com', now=120)
+
+        breaker.before('example.com', now=121)
+        breaker.success('example.com')
+        self.assertEqual([], breaker.open_hosts())
+        breaker.before('example.com', now=122)
+
+    def test_no_cooldown(self):
+        """Assert the circuit stays open for the run without a cooldown."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=1, cooldown=None)
+        breaker.failure('example.com', now=0)
+        self.assertRaises(
+            CircuitOpen, breaker.before, 'example.com', now=10 ** 9)
+
+    def test_guard(self):
+        """Assert the guard records the outcome of the requests."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=2)
+        with self.assertRaises(requests.ConnectTimeout):
+            with breaker.guard('example.com'):
+                raise requests.ConnectTimeout()
+        with breaker.guard('example.com') as outcome:
+            outcome.failed = True
+
+        self.assertEqual(['example.com'], breaker.open_hosts())
+        with self.assertRaises(CircuitOpen):
+            with breaker.guard('example.com'):
+                self.fail('The host was queried')
+
+    def test_guard_other_errors(self):
+        """Assert errors which are not the fault of the host reset it."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=2)
+        breaker.failure('example.com')
+        with self.assertRaises(ValueError):
+            with breaker.guard('example.com'):
+                raise ValueError()
+        breaker.failure('example.com')
+        self.assertEqual([], breaker.open_hosts())
+
+
+class IsHostFailureTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.circuit_breaker.is_host_failure` function."""
+
+    def test_host_failures(self):
+        for error in (requests.ConnectionError(), requests.ReadTimeout(),
+                      EnvironmentError(), EOFError(),
+                      ftplib.error_temp('421 Too many users')):
+            self.assertTrue(circuit_breaker.is_host_failure(error), error)
+
+    def test_other_errors(self):
+        for error in (requests.exceptions.MissingSchema(), ValueError(),
+                      ftplib.error_perm('550 No such file')):
+            self.assertFalse(circuit_breaker.is_host_failure(error), error)
+
+
+class CheckTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.circuit_breaker.check` function."""
+
+    def test_wrapped(self):
+        """Assert short-circuited requests are told apart from failures."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=1)
+        breaker.failure('example.com')
+        with self.assertRaises(CircuitOpen):
+            with circuit_breaker.check():
+                try:
+                    breaker.before('example.com')
+                except CircuitOpen as err:
+                    raise AnityaPluginException('Could not call: %s' % err)
+
+    def test_failure(self):
+        """Assert other failures are propagated as they are."""
+        with self.assertRaises(AnityaPluginException):
+            with circuit_breaker.check():
+                raise AnityaPluginException('no upstream version found')
+
+    def test_reset(self):
+        """Assert a short-circuited request only affects its own check."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=1)
+        breaker.failure('example.com')
+        with circuit_breaker.check():
+            self.assertRaises(CircuitOpen, breaker.before, 'example.com')
+        with self.assertRaises(ValueError):
+            with circuit_breaker.check():
+                raise ValueError()
+
+
+class RunBreakerTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.circuit_breaker.run_breaker` function."""
+
+    def test_run_breaker(self):
+        """Assert the breaker is only active within the context."""
+        self.assertIsNone(circuit_breaker.get_breaker())
+        with circuit_breaker.run_breaker() as breaker:
+            self.assertIs(breaker, circuit_breaker.get_breaker())
+        self.assertIsNone(circuit_breaker.get_breaker())
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_call_url(self, mock_session):
+        """Assert call_url fails fast once a host keeps failing."""
+        mock_session.get.side_effect = requests.ConnectTimeout()
+        backend = backends.BaseBackend()
+        with run_stats.collect() as stats, \
+                circuit_breaker.run_breaker(threshold=2) as breaker:
+            for _ in range(2):
+                self.assertRaises(
+                    requests.ConnectTimeout, backend.call_url,
+                    'https://Example.com/a')
+            with self.assertRaises(CircuitOpen):
+                with run_stats.measure('PyPI'):
+                    backend.call_url('https://example.com:443/b')
+
+        self.assertEqual(2, mock_session.get.call_count)
+        self.assertEqual(['example.com'], breaker.open_hosts())
+        self.assertEqual(1, stats.backends['PyPI'].short_circuited)
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_call_url_failure_status(self, mock_session):
+        """Assert a host answering 503 fails."""
+        mock_session.get.return_value = mock.Mock(status_code=503)
+        backend = backends.BaseBackend()
+        with circuit_breaker.run_breaker(threshold=1) as breaker:
+            backend.call_url('https://example.com/', stream=True)
+
+        self.assertEqual(['example.com'], breaker.open_hosts())
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_no_breaker(self, mock_session):
+        """Assert hosts are always queried outside of a run."""
+        mock_session.get.side_effect = requests.ConnectTimeout()
+        backend = backends.BaseBackend()
+        for _ in range(10):
+            self.assertRaises(
+                requests.ConnectTimeout, backend.call_url,
+                'https://example.com/')
+        self.assertEqual(10, mock_session.get.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.crates_index` module."""
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import mock
+
+from anitya.lib import crates_index
+from anitya.lib.exceptions import AnityaPluginException
+
+
+def write_crate(path, name, entries):
+    """Write the index file of a crate, given (version, yanked) tuples."""
+    crate_file = os.path.join(path, crates_index.crate_path(name))
+    if not os.path.isdir(os.path.dirname(crate_file)):
+        os.makedirs(os.path.dirname(crate_file))
+    with io.open(crate_file, 'w', encoding='utf-8') as stream:
+        for version, yanked in entries:
+            stream.write(
+                '{"name":"%s","vers":"%s","deps":[],"cksum":"0","features":{},'
+                '"yanked":%s}\n' % (name, version, 'true' if yanked else 'false'))
+
+
+class CratePathTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.crates_index.crate_path` function."""
+
+    def test_crate_path(self):
+        """Assert crates are found where crates.io puts them."""
+        self.assertEqual(os.path.join('1', 'a'), crates_index.crate_path('a'))
+        self.assertEqual(os.path.join('2', 'io'), crates_index.crate_path('io'))
+        self.assertEqual(
+            os.path.join('3', 'l', 'log'), crates_index.crate_path('log'))
+        self.assertEqual(
+            os.path.join('it', 'oa', 'itoa'), crates_index.crate_path('itoa'))
+        self.assertEqual(
+            os.path.join('se', 'rd', 'serde_json'),
+            crates_index.crate_path('Serde_JSON'))
+
+
+class CratesIndexTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.crates_index.CratesIndex` class."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.index = crates_index.CratesIndex(self.path)
+
+    def test_versions(self):
+        """Assert versions are returned in publish order, without the yanked ones."""
+        write_crate(self.path, 'itoa', [
+            ('0.1.0', False), ('0.1.1', True), ('0.2.0', False), ('0.2.1', False)])
+
+        self.assertEqual(['0.1.0', '0.2.0', '0.2.1'], self.index.versions('itoa'))
+        self.assertEqual(['0.1.0', '0.2.0', '0.2.1'], self.index.versions('ItoA'))
+
+    def test_versions_missing(self):
+        """Assert None is returned for the crates which are not in the index."""
+        self.assertIsNone(self.index.versions('itoa'))
+
+    def test_versions_invalid_entry(self):
+        """Assert invalid lines are skipped."""
+        write_crate(self.path, 'itoa', [('0.1.0', False)])
+        with io.open(os.path.join(self.path, 'it', 'oa', 'itoa'), 'a') as stream:
+            stream.write('not json\n\n')
+
+        self.assertEqual(['0.1.0'], self.index.versions('itoa'))
+
+    def test_resolve(self):
+        """Assert all the crates are resolved at once."""
+        write_crate(self.path, 'itoa', [('0.1.0', False)])
+        write_crate(self.path, 'log', [('0.3.0', False), ('0.4.0', True)])
+
+        self.assertEqual(
+            {'itoa': ['0.1.0'], 'log': ['0.3.0'], 'nope': None},
+            self.index.resolve(['itoa', 'log', 'nope', 'itoa']))
+
+    @mock.patch('anitya.lib.crates_index.subprocess.check_output')
+    def test_update_clone(self, mock_check_output):
+        """Assert the index is cloned if there is no clone yet."""
+        index = crates_index.CratesIndex(os.path.join(self.path, 'index'))
+
+        index.update(max_age=600)
+
+        mock_check_output.assert_called_once_with(
+            ['git', 'clone', '--quiet', crates_index.INDEX_URL, index.path],
+            stderr=subprocess.STDOUT)
+
+    @mock.patch('anitya.lib.crates_index.subprocess.check_output')
+    def test_update_fetch(self, mock_check_output):
+        """Assert stale clones are updated with the commits they miss."""
+        os.makedirs(os.path.join(self.path, '.git'))
+        io.open(os.path.join(self.path, '.git', 'FETCH_HEAD'), 'w').close()
+
+        with mock.patch('time.time', return_value=os.path.getmtime(
+                os.path.join(self.path, '.git', 'FETCH_HEAD')) + 60):
+            self.index.update(max_age=600)
+            self.assertEqual(0, mock_check_output.call_count)
+
+            self.index.update(max_age=30)
+        self.assertEqual([
+            mock.call(
+                ('git', 'fetch', '--quiet', crates_index.INDEX_URL, 'HEAD'),
+                cwd=self.path, stderr=subprocess.STDOUT),
+            mock.call(
+                ('git', 'reset', '--quiet', '--hard', 'FETCH_HEAD'),
+                cwd=self.path, stderr=subprocess.STDOUT),
+        ], mock_check_output.call_args_list)
+
+    @mock.patch('anitya.lib.crates_index.subprocess.check_output')
+    def test_update_error(self, mock_check_output):
+        """Assert git failures are raised as plugin exceptions."""
+        os.makedirs(os.path.join(self.path, '.git'))
+        io.open(os.path.join(self.path, '.git', 'HEAD'), 'w').close()
+        mock_check_output.side_effect = subprocess.CalledProcessError(
+            128, 'git', output=b'fatal: unable to access')
+
+        with self.assertRaises(AnityaPluginException) as context_manager:
+            self.index.update()
+        self.assertIn('fatal: unable to access', str(context_manager.exception))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.dns_cache` module."""
+from __future__ import unicode_literals
+
+import socket
+import threading
+import unittest
+
+import mock
+
+from anitya.lib import dns_cache, run_stats
+
+
+ADDRESSES = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 80))]
+
+
+@mock.patch('anitya.lib.dns_cache._getaddrinfo')
+class DnsCacheTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.dns_cache.DnsCache` class."""
+
+    def test_cached(self, mock_getaddrinfo):
+        """Assert names are resolved once per TTL."""
+        mock_getaddrinfo.return_value = ADDRESSES
+        cache = dns_cache.DnsCache(ttl=60)
+
+        with mock.patch('time.time', return_value=0):
+            self.assertEqual(ADDRESSES, cache.getaddrinfo('example.com', 80))
+            self.assertEqual(ADDRESSES, cache.getaddrinfo('example.com', 80))
+            cache.getaddrinfo('example.com', 443)
+        with mock.patch('time.time', return_value=59):
+            cache.getaddrinfo('example.com', 80)
+        self.assertEqual(2, mock_getaddrinfo.call_count)
+
+        with mock.patch('time.time', return_value=60):
+            cache.getaddrinfo('example.com', 80)
+        self.assertEqual(3, mock_getaddrinfo.call_count)
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(3, cache.misses)
+
+    def test_error(self, mock_getaddrinfo):
+        """Assert failed lookups are cached for the negative TTL, and counted."""
+        mock_getaddrinfo.side_effect = socket.gaierror(-2, 'Name or service not known')
+        cache = dns_cache.DnsCache(ttl=60, negative_ttl=5)
+
+        with run_stats.collect() as stats:
+            with mock.patch('time.time', return_value=0):
+                with self.assertRaises(socket.gaierror):
+                    with run_stats.measure('PyPI'):
+                        cache.getaddrinfo('example.com', 80)
+                self.assertRaises(
+                    socket.gaierror, cache.getaddrinfo, 'example.com', 80)
+            self.assertEqual(1, mock_getaddrinfo.call_count)
+            with mock.patch('time.time', return_value=5):
+                self.assertRaises(
+                    socket.gaierror, cache.getaddrinfo, 'example.com', 80)
+            self.assertEqual(2, mock_getaddrinfo.call_count)
+
+        self.assertEqual(3, cache.errors)
+        self.assertEqual(1, stats.backends['PyPI'].resolver_errors)
+
+    def test_other_error(self, mock_getaddrinfo):
+        """Assert errors other than resolver errors are not cached."""
+        mock_getaddrinfo.side_effect = [UnicodeError('label too long'), ADDRESSES]
+        cache = dns_cache.DnsCache()
+
+        self.assertRaises(UnicodeError, cache.getaddrinfo, 'example.com', 80)
+        self.assertEqual(ADDRESSES, cache.getaddrinfo('example.com', 80))
+        self.assertEqual(0, cache.errors)
+
+    def test_in_flight(self, mock_getaddrinfo):
+        """Assert concurrent lookups of a name share a single lookup."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def resolve(*args):
+            started.set()
+            release.wait()
+            return ADDRESSES
+        mock_getaddrinfo.side_effect = resolve
+        cache = dns_cache.DnsCache()
+        results = []
+
+        first = threading.Thread(
+            target=lambda: results.append(cache.getaddrinfo('example.com', 80)))
+        first.start()
+        started.wait()
+        second = threading.Thread(
+            target=lambda: results.append(cache.getaddrinfo('example.com', 80)))
+        second.start()
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual([ADDRESSES, ADDRESSES], results)
+        self.assertEqual(1, mock_getaddrinfo.call_count)
+
+
+class RunResolverTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.dns_cache.run_resolver` function."""
+
+    @mock.patch('anitya.lib.dns_cache._getaddrinfo')
+    def test_run_resolver(self, mock_getaddrinfo):
+        """Assert the socket module resolves names with the cache of the run."""
+        mock_getaddrinfo.return_value = ADDRESSES
+        original = socket.getaddrinfo
+        self.assertIsNone(dns_cache.get_cache())
+
+        with dns_cache.run_resolver(ttl=60) as cache:
+            self.assertIs(cache, dns_cache.get_cache())
+            socket.getaddrinfo('example.com', 80, 0, socket.SOCK_STREAM)
+            socket.getaddrinfo('example.com', 80, 0, socket.SOCK_STREAM)
+
+        self.assertIsNone(dns_cache.get_cache())
+        self.assertIs(original, socket.getaddrinfo)
+        self.assertEqual(1, mock_getaddrinfo.call_count)
+        self.assertEqual(1, cache.hits)
+
+    @mock.patch('anitya.lib.dns_cache._getaddrinfo')
+    def test_run_resolver_nested(self, mock_getaddrinfo):
+        """Assert the resolver active before a run is restored after it."""
+        original = socket.getaddrinfo
+
+        with dns_cache.run_resolver() as outer:
+            with dns_cache.run_resolver() as inner:
+                self.assertIs(inner, dns_cache.get_cache())
+            self.assertIs(outer, dns_cache.get_cache())
+            self.assertIs(dns_cache._cached_getaddrinfo, socket.getaddrinfo)
+
+        self.assertIs(original, socket.getaddrinfo)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.ftp_pool` module."""
+from __future__ import unicode_literals
+
+import ftplib
+import unittest
+
+import mock
+
+from anitya.lib import backends, ftp_pool
+from anitya.lib.exceptions import ResponseTooLarge
+
+
+class FakeFtp(object):
+    """A server with a ``pub/`` directory holding releases."""
+
+    files = {'/pub/foo-1.0.tar.gz': b'tarball'}
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.host = None
+        self.commands = []
+        self.closed = False
+
+    def connect(self, host, port):
+        self.host = host
+
+    def login(self, user, passwd):
+        self.commands.append(('login', user, passwd))
+
+    def mlsd(self, path, facts=None):
+        self.commands.append(('mlsd', path))
+        return iter([
+            ('.', {'type': 'cdir'}),
+            ('..', {'type': 'pdir'}),
+            ('1.0', {'type': 'dir'}),
+            ('foo-1.0.tar.gz', {'type': 'file'}),
+        ])
+
+    def nlst(self, path):
+        self.commands.append(('nlst', path))
+        return ['pub/1.0', 'pub/foo-1.0.tar.gz']
+
+    def retrlines(self, command, callback):
+        self.commands.append(('retrlines', command))
+        callback('total 2')
+        callback('drwxr-xr-x 2 ftp ftp 4096 Jun 20 10:00 1.0')
+        callback('-rw-r--r-- 1 ftp ftp  512 Jun 20 10:00 foo-1.0.tar.gz')
+
+    def retrbinary(self, command, callback):
+        self.commands.append(('retrbinary', command))
+        path = command.split(' ', 1)[1]
+        if path not in self.files:
+            raise ftplib.error_perm('550 No such file')
+        callback(self.files[path])
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+class LegacyFtp(FakeFtp):
+    """A server which does not support MLSD."""
+
+    def mlsd(self, path, facts=None):
+        raise ftplib.error_perm('500 Unknown command MLSD')
+
+
+class FtpPoolTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.ftp_pool.FtpPool` class."""
+
+    def setUp(self):
+        self.connections = []
+        self.server = FakeFtp
+        patcher = mock.patch('ftplib.FTP', side_effect=self._connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ftp_pool.FtpPool(password='admin@example.com')
+
+    def _connect(self, timeout=None):
+        connection = self.server(timeout=timeout)
+        self.connections.append(connection)
+        return connection
+
+    def test_reuse(self):
+        """Assert control connections are reused, with their own timeout."""
+        self.pool.list('ftp://ftp.example.com/pub/')
+        self.pool.list('ftp://ftp.example.com/pub/')
+        self.pool.list('ftp://ftp.example.org/pub/')
+
+        self.assertEqual(2, len(self.connections))
+        self.assertEqual(30, self.connections[0].timeout)
+        self.assertEqual(
+            ('login', 'anonymous', 'admin@example.com'),
+            self.connections[0].commands[0])
+        self.assertEqual(
+            [('mlsd', '/pub/'), ('mlsd', '/pub/')],
+            self.connections[0].commands[1:])
+
+    def test_list_mlsd(self):
+        """Assert MLSD tells directories apart."""
+        self.assertEqual(
+            [('1.0', True), ('foo-1.0.tar.gz', False)],
+            self.pool.list('ftp://ftp.example.com/pub/', dirs=True))
+
+    def test_list_legacy(self):
+        """Assert NLST, or LIST for directories, is used without MLSD."""
+        self.server = LegacyFtp
+
+        self.assertEqual(
+            [('1.0', None), ('foo-1.0.tar.gz', None)],
+            self.pool.list('ftp://ftp.example.com/pub/'))
+        self.assertEqual(
+            [('1.0', True), ('foo-1.0.tar.gz', False)],
+            self.pool.list('ftp://ftp.example.com/pub/', dirs=True))
+        self.assertEqual(1, len(self.connections))
+
+    def test_retrieve(self):
+        """Assert files are retrieved and directories listed."""
+        self.assertEqual(
+            b'tarball',
+            self.pool.retrieve('ftp://ftp.example.com/pub/foo-1.0.tar.gz', 100))
+        listing = (
+            b'total 2\n'
+            b'drwxr-xr-x 2 ftp ftp 4096 Jun 20 10:00 1.0\n'
+            b'-rw-r--r-- 1 ftp ftp  512 Jun 20 10:00 foo-1.0.tar.gz')
+        self.assertEqual(
+            listing, self.pool.retrieve('ftp://ftp.example.com/pub/', 200))
+        self.assertEqual(
+            listing, self.pool.retrieve('ftp://ftp.example.com/pub', 200))
+        self.assertIn(('retrlines', 'LIST /pub/'), self.connections[0].commands)
+        self.assertIn(('retrlines', 'LIST /pub'), self.connections[0].commands)
+
+    def test_retrieve_too_large(self):
+        """Assert large files are aborted and their connection dropped."""
+        self.assertRaises(
+            ResponseTooLarge,
+            self.pool.retrieve, 'ftp://ftp.example.com/pub/foo-1.0.tar.gz', 3)
+        self.assertTrue(self.connections[0].closed)
+
+        self.pool.list('ftp://ftp.example.com/pub/')
+        self.assertEqual(2, len(self.connections))
+
+    def test_retrieve_listing_too_large(self):
+        """Assert large listings are aborted."""
+        self.assertRaises(
+            ResponseTooLarge,
+            self.pool.retrieve, 'ftp://ftp.example.com/pub/', 20)
+
+    def test_dropped(self):
+        """Assert idle connections dropped by the server are replaced."""
+        self.pool.list('ftp://ftp.example.com/pub/')
+        self.connections[0].mlsd = mock.Mock(side_effect=EOFError)
+
+        self.pool.list('ftp://ftp.example.com/pub/')
+
+        self.assertEqual(2, len(self.connections))
+        self.assertTrue(self.connections[0].closed)
+
+    def test_expand_subdirs(self):
+        """Assert FTP globs are expanded from the directories listed."""
+        with mock.patch('anitya.lib.ftp_pool.get_pool', return_value=self.pool):
+            self.assertEqual(
+                'ftp://ftp.example.com/pub/1.0/',
+                backends.BaseBackend.expand_subdirs('ftp://ftp.example.com/pub/*/'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.http_cache` module."""
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import requests
+
+import anitya.app
+import anitya.lib.plugins
+from anitya.lib import backends, http_cache
+
+
+def _response(body, status_code=200):
+    """Build a response with the provided body, as requests would."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = 'https://example.com/'
+    response.raw = io.BytesIO(body)
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response.headers['ETag'] = '"abc"'
+    return response
+
+
+class HttpCacheTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.http_cache.HttpCache` class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'http.sqlite')
+        self.cache = http_cache.HttpCache(self.path, max_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        """Assert responses are stored with their headers until stale."""
+        self.cache.put('a', _response(b'caf\xc3\xa9'), now=1000)
+
+        response = self.cache.get('a', 60, now=1059)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b'caf\xc3\xa9', response.content)
+        self.assertEqual('café', response.text)
+        self.assertEqual('"abc"', response.headers['etag'])
+        self.assertEqual('https://example.com/', response.url)
+
+        self.assertIsNone(self.cache.get('a', 60, now=1060))
+        self.assertIsNone(self.cache.get('b', 60, now=1000))
+
+    def test_shared(self):
+        """Assert responses are shared with other instances."""
+        self.cache.put('a', _response(b'abc'), now=1000)
+
+        other = http_cache.HttpCache(self.path, max_size=10)
+        self.assertEqual(b'abc', other.get('a', 60, now=1000).content)
+
+    def test_eviction(self):
+        """Assert the least recently used responses are dropped first."""
+        self.cache.put('a', _response(b'aaaa'), now=1000)
+        self.cache.put('b', _response(b'bbbb'), now=1001)
+        self.cache.get('a', 60, now=1002)
+        self.cache.put('c', _response(b'cccc'), now=1003)
+
+        self.assertEqual(2, len(self.cache))
+        self.assertIsNone(self.cache.get('b', 60, now=1004))
+        self.assertIsNotNone(self.cache.get('a', 60, now=1004))
+
+        # Responses larger than the whole cache are not stored
+        self.cache.put('d', _response(b'd' * 11), now=1005)
+        self.assertIsNone(self.cache.get('d', 60, now=1005))
+
+    def test_key(self):
+        """Assert conditional requests share the key of the others."""
+        self.assertEqual(
+            http_cache.HttpCache.key('https://example.com/'),
+            http_cache.HttpCache.key(
+                'https://example.com/', headers={'If-None-Match': '"abc"'}))
+        self.assertNotEqual(
+            http_cache.HttpCache.key('https://example.com/'),
+            http_cache.HttpCache.key('https://example.com/', insecure=True))
+        self.assertNotEqual(
+            http_cache.HttpCache.key('https://example.com/'),
+            http_cache.HttpCache.key(
+                'https://example.com/', headers={'Accept': 'text/html'}))
+
+
+class ConfigTests(unittest.TestCase):
+    """Tests for the configuration of the HTTP cache."""
+
+    def test_get_cache(self):
+        """Assert no cache is used without a path."""
+        self.assertIsNone(http_cache.get_cache({'HTTP_CACHE_PATH': None}))
+
+    def test_ttl(self):
+        """Assert the freshness of the responses is set per backend."""
+        config = {'HTTP_CACHE_TTL': {'default': 300, 'GNU project': 3600}}
+        self.assertEqual(3600, http_cache.ttl(config, 'GNU project'))
+        self.assertEqual(300, http_cache.ttl(config, 'PyPI'))
+        self.assertEqual(300, http_cache.ttl(config, None))
+        self.assertEqual(600, http_cache.ttl({}, 'PyPI'))
+
+
+@mock.patch('anitya.lib.backends.http_session')
+class CallUrlTests(unittest.TestCase):
+    """Tests for the HTTP cache of :meth:`BaseBackend.call_url`."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        config = {
+            'HTTP_CACHE_PATH': os.path.join(self.tmp_dir, 'http.sqlite'),
+            'HTTP_CACHE_TTL': {'default': 600, 'GNU project': 0},
+        }
+        patcher = mock.patch.dict(anitya.app.APP.config, config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_call_url(self, mock_http_session):
+        """Assert fresh responses are not requested again."""
+        mock_http_session.get.side_effect = [
+            _response(b'foo-1.0.tar.gz'), _response(b'error', status_code=500),
+            _response(b'error', status_code=500)]
+        url = 'https://example.com/'
+
+        self.assertEqual(
+            b'foo-1.0.tar.gz', backends.BaseBackend.call_url(url).content)
+        response = backends.BaseBackend.call_url(url, stream=True)
+        self.assertEqual(b'foo-1.0.tar.gz', response.content)
+        self.assertEqual(
+            'foo-1.0.tar.gz', ''.join(backends.iter_response_text(response, url)))
+        self.assertEqual(1, mock_http_session.get.call_count)
+
+        # Errors are not cached
+        other = 'https://example.com/other/'
+        self.assertEqual(500, backends.BaseBackend.call_url(other).status_code)
+        self.assertEqual(500, backends.BaseBackend.call_url(other).status_code)
+        self.assertEqual(3, mock_http_session.get.call_count)
+
+    def test_backend_ttl(self, mock_http_session):
+        """Assert backends can opt out of the cache."""
+        mock_http_session.get.side_effect = [
+            _response(b'foo-1.0.tar.gz'), _response(b'foo-1.1.tar.gz')]
+        url = 'https://example.com/'
+        gnu = anitya.lib.plugins.get_plugin('GNU project')
+
+        self.assertEqual(b'foo-1.0.tar.gz', gnu.call_url(url).content)
+        self.assertEqual(b'foo-1.1.tar.gz', gnu.call_url(url).content)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
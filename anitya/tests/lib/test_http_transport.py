@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.http_transport` module."""
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+import requests
+from requests.packages.urllib3.exceptions import ConnectTimeoutError
+
+from anitya.lib import backends, http_transport
+
+
+class JitteredRetryTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.http_transport.JitteredRetry` class."""
+
+    def test_no_backoff_before_first_retry(self):
+        retry = http_transport.JitteredRetry(total=3, backoff_factor=1)
+        self.assertEqual(0, retry.get_backoff_time())
+
+    @mock.patch('anitya.lib.http_transport.random.uniform')
+    def test_backoff_is_jittered(self, mock_uniform):
+        """Assert the delay is drawn below an exponential backoff"""
+        mock_uniform.side_effect = lambda low, high: high
+        retry = http_transport.JitteredRetry(total=5, backoff_factor=0.5)
+        delays = []
+        for _ in range(3):
+            retry = retry.increment(
+                method='GET', url='/', error=ConnectTimeoutError())
+            delays.append(retry.get_backoff_time())
+
+        self.assertIsInstance(retry, http_transport.JitteredRetry)
+        self.assertEqual([0.5, 1.0, 2.0], delays)
+        self.assertEqual(mock.call(0, 2.0), mock_uniform.call_args)
+
+    def test_backoff_is_capped(self):
+        retry = http_transport.JitteredRetry(total=20, backoff_factor=10)
+        for _ in range(10):
+            retry = retry.increment(
+                method='GET', url='/', error=ConnectTimeoutError())
+            self.assertTrue(
+                0 <= retry.get_backoff_time()
+                <= http_transport.JitteredRetry.MAX_BACKOFF)
+
+
+class MakeRetryTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.http_transport.make_retry` function."""
+
+    def test_configured(self):
+        retry = http_transport.make_retry(
+            {'HTTP_RETRIES': 4, 'HTTP_RETRY_BACKOFF': 2})
+        self.assertEqual(4, retry.total)
+        self.assertEqual(4, retry.connect)
+        self.assertEqual(2, retry.backoff_factor)
+        self.assertEqual(http_transport.RETRY_STATUSES, retry.status_forcelist)
+        self.assertFalse(retry.raise_on_status)
+
+    def test_defaults(self):
+        retry = http_transport.make_retry({})
+        self.assertEqual(2, retry.total)
+        self.assertEqual(0.5, retry.backoff_factor)
+
+
+class MountTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.http_transport.mount` function."""
+
+    def test_mount(self):
+        session = requests.Session()
+        previous = session.adapters['https://']
+        with mock.patch.object(previous, 'close') as mock_close:
+            http_transport.mount(
+                session, {'HTTP_RETRIES': 1}, pool_connections=50,
+                pool_maxsize=4)
+        mock_close.assert_called_once_with()
+
+        for prefix in ('https://', 'http://'):
+            adapter = session.get_adapter(prefix + 'example.com/')
+            self.assertEqual(50, adapter._pool_connections)
+            self.assertEqual(4, adapter._pool_maxsize)
+            self.assertIsInstance(
+                adapter.max_retries, http_transport.JitteredRetry)
+            self.assertEqual(1, adapter.max_retries.total)
+
+    def test_configure_sessions(self):
+        """Assert both sessions of the backends are configured"""
+        try:
+            backends.configure_sessions(pool_connections=30, pool_maxsize=3)
+            for session in (backends.http_session, backends.insecure_http_session):
+                adapter = session.get_adapter('https://example.com/')
+                self.assertEqual(3, adapter._pool_maxsize)
+        finally:
+            backends.configure_sessions()
+
+
+class TimeoutTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.http_transport.timeout` function."""
+
+    def test_backend(self):
+        config = {'HTTP_TIMEOUT': {'default': [5, 30], 'PyPI': [2, 10]}}
+        self.assertEqual((2, 10), http_transport.timeout(config, 'PyPI'))
+        self.assertEqual((5, 30), http_transport.timeout(config, 'GitHub'))
+        self.assertEqual((5, 30), http_transport.timeout(config, None))
+
+    def test_unset(self):
+        self.assertEqual((10, 60), http_transport.timeout({}, 'PyPI'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.rate_limit` module."""
+from __future__ import unicode_literals
+
+import io
+import unittest
+
+import mock
+import requests
+
+import anitya
+from anitya.lib import backends, rate_limit, run_stats
+from anitya.lib.exceptions import AnityaPluginException, RateLimited
+
+
+def _response(status_code, **headers):
+    """Build a response with the provided status and headers."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(b'')
+    response.headers.update(
+        (name.replace('_', '-'), value) for name, value in headers.items())
+    return response
+
+
+class ParseResponseTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.rate_limit.parse_response` function."""
+
+    def test_too_many_requests(self):
+        response = _response(429, Retry_After='120')
+        self.assertEqual(
+            (True, 1120), rate_limit.parse_response(response, now=1000))
+
+    def test_too_many_requests_date(self):
+        response = _response(429, Retry_After='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(
+            (True, 1445412480), rate_limit.parse_response(response, now=1000))
+
+    def test_too_many_requests_default(self):
+        self.assertEqual(
+            (True, 1000 + rate_limit.DEFAULT_DELAY),
+            rate_limit.parse_response(_response(429), now=1000))
+
+    def test_quota_exhausted(self):
+        """Assert a 403 is a rate limit once the quota is exhausted."""
+        response = _response(
+            403, X_RateLimit_Remaining='0', X_RateLimit_Reset='1500000000')
+        self.assertEqual(
+            (True, 1500000000),
+            rate_limit.parse_response(response, now=1499999000))
+
+    def test_last_request(self):
+        """Assert the last request of the quota throttles the host."""
+        response = _response(
+            200, X_RateLimit_Remaining='0', X_RateLimit_Reset='1500000000')
+        self.assertEqual(
+            (False, 1500000000),
+            rate_limit.parse_response(response, now=1499999000))
+
+    def test_not_limited(self):
+        for response in (_response(200, X_RateLimit_Remaining='10'),
+                         _response(403), _response(503, Retry_After='10')):
+            self.assertEqual(
+                (False, None), rate_limit.parse_response(response, now=1000))
+
+
+class RateLimitsTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.rate_limit.RateLimits` class."""
+
+    def test_limit(self):
+        limits = rate_limit.RateLimits()
+        limits.limit('api.github.com', 1060)
+        # Earlier limits do not shorten the wait
+        limits.limit('api.github.com', 1030)
+
+        self.assertEqual(1060, limits.retry_at('api.github.com', now=1000))
+        self.assertIsNone(limits.retry_at('crates.io', now=1000))
+        self.assertIsNone(limits.retry_at('api.github.com', now=1060))
+
+
+class CheckTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.rate_limit.check` function."""
+
+    def test_wrapped(self):
+        """Assert the exceptions wrapping a rate limit are replaced."""
+        with rate_limit.run_limits():
+            with self.assertRaises(RateLimited) as context:
+                with rate_limit.check():
+                    try:
+                        rate_limit.after('crates.io', _response(429))
+                    except Exception:
+                        raise AnityaPluginException('Could not contact')
+        self.assertEqual('crates.io', context.exception.host)
+
+    def test_other_errors(self):
+        with rate_limit.run_limits():
+            with self.assertRaises(AnityaPluginException):
+                with rate_limit.check():
+                    raise AnityaPluginException('boom')
+
+
+class CallUrlTests(unittest.TestCase):
+    """Tests for the rate limits in :meth:`BaseBackend.call_url`."""
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_call_url(self, mock_session):
+        """Assert a rate limited host is not queried until it told so."""
+        response = _response(429, Retry_After='600')
+        response.raw = mock.Mock()
+        mock_session.get.return_value = response
+        backend = backends.BaseBackend()
+        with rate_limit.run_limits():
+            self.assertRaises(
+                RateLimited, backend.call_url, 'https://crates.io/api/a')
+            self.assertRaises(
+                RateLimited, backend.call_url, 'https://crates.io/api/b')
+
+        self.assertEqual(1, mock_session.get.call_count)
+        response.raw.close.assert_called_once_with()
+
+    @mock.patch('anitya.lib.backends.http_session')
+    def test_no_limits(self, mock_session):
+        """Assert responses are returned as they are outside of a run."""
+        mock_session.get.return_value = _response(429, Retry_After='600')
+        backend = backends.BaseBackend()
+        response = backend.call_url('https://crates.io/api/a', stream=True)
+        self.assertEqual(429, response.status_code)
+
+    def test_fetch_version(self):
+        """Assert rate limited checks are not recorded in the statistics."""
+        backend = mock.Mock()
+
+        def get_version(project):
+            try:
+                rate_limit.after('crates.io', _response(429))
+            except Exception:
+                raise AnityaPluginException('Could not contact')
+        backend.get_version.side_effect = get_version
+        project = mock.Mock(backend='crates.io')
+
+        with run_stats.collect() as stats, rate_limit.run_limits():
+            self.assertRaises(
+                RateLimited, anitya.fetch_version, backend, project)
+
+        self.assertEqual({}, dict(stats.backends))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
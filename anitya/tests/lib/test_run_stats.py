@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.run_stats` module."""
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+import anitya
+from anitya.lib import run_stats
+from anitya.lib.exceptions import (
+    AnityaPluginException, CircuitOpen, UpstreamNotModified)
+
+
+class BackendStatsTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.run_stats.BackendStats` class."""
+
+    def test_percentile(self):
+        """Assert percentiles use the nearest-rank method."""
+        stats = run_stats.BackendStats()
+        self.assertIsNone(stats.percentile(50))
+
+        stats.latencies = [float(i) for i in range(100, 0, -1)]
+        self.assertEqual(50.0, stats.percentile(50))
+        self.assertEqual(95.0, stats.percentile(95))
+        self.assertEqual(99.0, stats.percentile(99))
+        self.assertEqual(100.0, stats.percentile(100))
+
+    def test_percentile_single(self):
+        """Assert a single check is every percentile."""
+        stats = run_stats.BackendStats()
+        stats.latencies = [2.0]
+        self.assertEqual(2.0, stats.percentile(1))
+        self.assertEqual(2.0, stats.percentile(99))
+
+
+class MeasureTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.run_stats.measure` function."""
+
+    def test_not_collected(self):
+        """Assert nothing is recorded outside of :func:`collect`."""
+        self.assertIsNone(run_stats.get_stats())
+        with run_stats.measure('PyPI'):
+            run_stats.count_downloaded(b'content')
+        run_stats.new_version('PyPI')
+        self.assertIsNone(run_stats.get_stats())
+
+    def test_outcomes(self):
+        """Assert successes, failures and not modified pages are counted."""
+        with run_stats.collect() as stats:
+            with run_stats.measure('PyPI'):
+                run_stats.count_downloaded(b'abc')
+                run_stats.count_downloaded(b'de')
+            with self.assertRaises(AnityaPluginException):
+                with run_stats.measure('PyPI'):
+                    raise AnityaPluginException('boom')
+            with self.assertRaises(UpstreamNotModified):
+                with run_stats.measure('GitHub'):
+                    raise UpstreamNotModified('https://example.com')
+            with self.assertRaises(CircuitOpen):
+                with run_stats.measure('GitHub'):
+                    run_stats.count_short_circuited()
+                    raise CircuitOpen('github.com')
+            run_stats.new_version('PyPI')
+            # Downloads outside of a check are not counted
+            run_stats.count_downloaded(b'ignored')
+
+        self.assertIsNone(run_stats.get_stats())
+        pypi = stats.backends['PyPI']
+        self.assertEqual(2, pypi.checked)
+        self.assertEqual(1, pypi.successes)
+        self.assertEqual(1, pypi.failures)
+        self.assertEqual(0, pypi.not_modified)
+        self.assertEqual(1, pypi.new_versions)
+        self.assertEqual(5, pypi.bytes_downloaded)
+        self.assertEqual(0, pypi.short_circuited)
+        self.assertEqual(2, len(pypi.latencies))
+        github = stats.backends['GitHub']
+        self.assertEqual(2, github.checked)
+        self.assertEqual(1, github.successes)
+        self.assertEqual(1, github.failures)
+        self.assertEqual(1, github.not_modified)
+        self.assertEqual(1, github.short_circuited)
+
+    def test_resolver_errors(self):
+        """Assert the checks failing to resolve a host name are counted."""
+        with run_stats.collect() as stats:
+            with self.assertRaises(AnityaPluginException):
+                with run_stats.measure('PyPI'):
+                    run_stats.count_resolver_error()
+                    raise AnityaPluginException('boom')
+            # The lookup was retried successfully
+            with run_stats.measure('PyPI'):
+                run_stats.count_resolver_error()
+            with self.assertRaises(AnityaPluginException):
+                with run_stats.measure('PyPI'):
+                    raise AnityaPluginException('boom')
+
+        pypi = stats.backends['PyPI']
+        self.assertEqual(2, pypi.failures)
+        self.assertEqual(1, pypi.resolver_errors)
+
+    def test_fetch_version(self):
+        """Assert :func:`anitya.fetch_version` measures the check."""
+        backend = mock.Mock()
+        backend.get_version.return_value = '1.0'
+        project = mock.Mock(backend='PyPI')
+
+        with run_stats.collect() as stats:
+            self.assertEqual('1.0', anitya.fetch_version(backend, project))
+
+        backend.get_version.assert_called_once_with(project)
+        self.assertEqual(1, stats.backends['PyPI'].successes)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
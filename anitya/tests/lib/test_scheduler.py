@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.scheduler` module."""
+from __future__ import unicode_literals
+
+import datetime
+import threading
+import unittest
+
+import mock
+
+import anitya.lib
+from anitya.lib import model, scheduler
+from anitya.tests.base import Modeltests, create_project
+
+
+CONFIG = {
+    'CHECK_INTERVAL_MIN': 3600,
+    'CHECK_INTERVAL_MAX': 7 * 24 * 3600,
+    'CHECK_INTERVAL_DEFAULT': 12 * 3600,
+    'CHECK_INTERVAL_PACKAGED': 24 * 3600,
+}
+NOW = datetime.datetime(2017, 1, 1)
+
+
+class NextCheckAtTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.scheduler.next_check_at` function."""
+
+    def project(self, release_days=(), packages=(), error_counter=0):
+        """Return a project released ``release_days`` days before NOW."""
+        versions = [
+            model.ProjectVersion(
+                version=str(i), created_on=NOW - datetime.timedelta(days=days))
+            for i, days in enumerate(release_days)
+        ]
+        return mock.Mock(
+            versions_obj=versions, packages=list(packages),
+            error_counter=error_counter)
+
+    def assertInterval(self, expected, project, **kwargs):
+        """Assert the next check is ``expected`` seconds after NOW."""
+        next_check = scheduler.next_check_at(project, CONFIG, now=NOW, **kwargs)
+        self.assertEqual(
+            datetime.timedelta(seconds=expected), next_check - NOW)
+
+    def test_no_history(self):
+        """Assert projects without a release history use the default."""
+        self.assertInterval(12 * 3600, self.project())
+        self.assertInterval(12 * 3600, self.project(release_days=[3]))
+
+    def test_release_cadence(self):
+        """Assert projects are checked four times per release interval."""
+        # Intervals of 8, 1 and 8 days: the median is 8 days
+        project = self.project(release_days=[17, 9, 8, 0])
+        self.assertInterval(2 * 24 * 3600, project)
+
+    def test_release_cadence_bounds(self):
+        """Assert the interval is clamped to the configured bounds."""
+        self.assertInterval(3600, self.project(release_days=[0.01, 0]))
+        self.assertInterval(
+            7 * 24 * 3600, self.project(release_days=[365, 0]))
+
+    def test_packaged(self):
+        """Assert packaged projects are checked at least once a day."""
+        project = self.project(release_days=[365, 0], packages=['geany'])
+        self.assertInterval(24 * 3600, project)
+
+    def test_failed_backoff(self):
+        """Assert failing projects back off exponentially."""
+        self.assertInterval(3600, self.project(error_counter=1), failed=True)
+        self.assertInterval(
+            4 * 3600, self.project(error_counter=3), failed=True)
+        self.assertInterval(
+            7 * 24 * 3600, self.project(error_counter=50), failed=True)
+
+
+class ProjectHostsTests(Modeltests):
+    """Tests for the :func:`anitya.lib.scheduler.project_hosts` function."""
+
+    def test_project_hosts(self):
+        """Assert hosts come from the backend or from the version URL."""
+        create_project(self.session)
+        anitya.lib.create_project(
+            self.session,
+            name='fedmsg',
+            homepage='https://pypi.python.org/pypi/fedmsg',
+            backend='PyPI',
+            user_id='noreply@fedoraproject.org',
+        )
+
+        projects = model.Project.all(self.session)
+        hosts = dict(scheduler.project_hosts(projects))
+
+        self.assertEqual(
+            {1: 'www.geany.org', 2: 'subsurface.hohndel.org',
+             3: 'fedorahosted.org', 4: 'pypi.python.org'},
+            hosts)
+
+
+class InterleaveTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.scheduler.interleave` function."""
+
+    def test_interleave(self):
+        """Assert items are visited round-robin, in order within a group."""
+        items = [(1, 'a'), (2, 'a'), (3, 'a'), (4, 'b'), (5, 'c'), (6, 'b')]
+
+        output = scheduler.interleave(items, key=lambda item: item[1])
+
+        self.assertEqual(
+            [(1, 'a'), (4, 'b'), (5, 'c'), (2, 'a'), (6, 'b'), (3, 'a')],
+            output)
+
+    def test_interleave_empty(self):
+        """Assert interleaving nothing works."""
+        self.assertEqual([], scheduler.interleave([], key=lambda item: item))
+
+
+class HostSchedulerTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.scheduler.HostScheduler` class."""
+
+    def test_reserve_no_rate(self):
+        """Assert checks never wait without a rate limit."""
+        host_scheduler = scheduler.HostScheduler(rate=None)
+        self.assertEqual(0, host_scheduler.reserve('example.com'))
+        self.assertEqual(0, host_scheduler.reserve('example.com'))
+
+    @mock.patch('anitya.lib.scheduler.time.time', return_value=100.0)
+    def test_reserve_rate(self, mock_time):
+        """Assert start slots are spaced per host according to the rate."""
+        host_scheduler = scheduler.HostScheduler(rate=2)
+
+        self.assertEqual(0, host_scheduler.reserve('example.com'))
+        self.assertEqual(0.5, host_scheduler.reserve('example.com'))
+        self.assertEqual(1.0, host_scheduler.reserve('example.com'))
+        self.assertEqual(0, host_scheduler.reserve('example.org'))
+
+    def test_slot_max_per_host(self):
+        """Assert no more than max_per_host checks run against a host."""
+        host_scheduler = scheduler.HostScheduler(max_per_host=2)
+        lock = threading.Lock()
+        running = {'current': 0, 'max': 0}
+
+        def check():
+            with host_scheduler.slot('example.com'):
+                with lock:
+                    running['current'] += 1
+                    running['max'] = max(running['max'], running['current'])
+                threading.Event().wait(0.01)
+                with lock:
+                    running['current'] -= 1
+
+        threads = [threading.Thread(target=check) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, running['max'])
+
+
+class RunSchedulerTests(unittest.TestCase):
+    """Tests for :func:`anitya.lib.scheduler.run_scheduler`."""
+
+    def test_slot_inactive(self):
+        """Assert requests are not scheduled outside of a run."""
+        self.assertIsNone(scheduler._active)
+        with scheduler.slot('example.com'):
+            pass
+
+    def test_run_scheduler(self):
+        """Assert requests go through the scheduler of the run."""
+        with scheduler.run_scheduler(max_per_host=2, rate=3) as host_scheduler:
+            self.assertIs(host_scheduler, scheduler._active)
+            self.assertEqual(2, host_scheduler.max_per_host)
+            self.assertEqual(3, host_scheduler.rate)
+            with mock.patch.object(
+                    host_scheduler, 'slot', wraps=host_scheduler.slot) as slot:
+                with scheduler.slot('example.com'):
+                    pass
+            slot.assert_called_once_with('example.com')
+        self.assertIsNone(scheduler._active)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
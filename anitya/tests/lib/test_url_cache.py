@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya.lib.url_cache` module."""
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import mock
+
+from anitya.lib import backends, circuit_breaker, rate_limit, url_cache
+from anitya.lib.exceptions import (
+    AnityaPluginException, CircuitOpen, RateLimited)
+
+
+class UrlCacheTests(unittest.TestCase):
+    """Tests for the :class:`anitya.lib.url_cache.UrlCache` class."""
+
+    def test_get(self):
+        """Assert responses are fetched once per key."""
+        cache = url_cache.UrlCache()
+        fetch = mock.Mock(side_effect=['first', 'second'])
+
+        self.assertEqual('first', cache.get('a', fetch))
+        self.assertEqual('first', cache.get('a', fetch))
+        self.assertEqual('second', cache.get('b', fetch))
+        self.assertEqual(2, fetch.call_count)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_get_error(self):
+        """Assert exceptions are cached like responses."""
+        cache = url_cache.UrlCache()
+        fetch = mock.Mock(side_effect=ValueError('boom'))
+
+        self.assertRaises(ValueError, cache.get, 'a', fetch)
+        self.assertRaises(ValueError, cache.get, 'a', fetch)
+        self.assertEqual(1, fetch.call_count)
+
+    def test_get_error_not_cached(self):
+        """Assert exceptions are not cached when cache_errors is False."""
+        cache = url_cache.UrlCache(cache_errors=False)
+        fetch = mock.Mock(side_effect=[ValueError('boom'), 'response'])
+
+        self.assertRaises(ValueError, cache.get, 'a', fetch)
+        self.assertEqual('response', cache.get('a', fetch))
+        self.assertEqual('response', cache.get('a', fetch))
+        self.assertEqual(2, fetch.call_count)
+
+    def test_get_in_flight(self):
+        """Assert concurrent requests for a key share a single fetch."""
+        cache = url_cache.UrlCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'response'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get('a', fetch)))
+            for _ in range(4)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(['response'] * 4, results)
+
+    def test_max_entries(self):
+        """Assert the least recently used responses are dropped."""
+        cache = url_cache.UrlCache(max_entries=2)
+        fetch = mock.Mock(side_effect=lambda: fetch.call_count)
+
+        cache.get('a', fetch)
+        cache.get('b', fetch)
+        cache.get('a', fetch)
+        cache.get('c', fetch)
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get('a', fetch))
+        self.assertEqual(4, cache.get('b', fetch))
+
+    def _shared_failure_of(self, request, check):
+        """Return what two threads, sharing a request made by calling
+        ``request`` within ``check``, get."""
+        cache = url_cache.UrlCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            # A backend wrapping the error of a request it made
+            try:
+                request()
+            except Exception as err:
+                raise AnityaPluginException('Could not call: %s' % err)
+
+        errors = []
+
+        def run():
+            try:
+                with check():
+                    cache.get('a', fetch)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        return errors
+
+    def test_get_rate_limited(self):
+        """Assert threads sharing a rate limited request know it was."""
+        def refuse():
+            rate_limit._refuse('example.com', 0)
+
+        errors = self._shared_failure_of(refuse, rate_limit.check)
+
+        self.assertEqual(2, len(errors))
+        for error in errors:
+            self.assertIsInstance(error, RateLimited)
+
+    def test_get_circuit_open(self):
+        """Assert threads sharing a short-circuited request know it was."""
+        breaker = circuit_breaker.CircuitBreaker(threshold=1)
+        breaker.failure('example.com')
+
+        errors = self._shared_failure_of(
+            lambda: breaker.before('example.com'), circuit_breaker.check)
+
+        self.assertEqual(2, len(errors))
+        for error in errors:
+            self.assertIsInstance(error, CircuitOpen)
+
+
+class RunCacheTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.url_cache.run_cache` function."""
+
+    def test_run_cache(self):
+        """Assert the cache is only active within the context."""
+        self.assertIsNone(url_cache.get_cache())
+        with url_cache.run_cache() as cache:
+            self.assertIs(cache, url_cache.get_cache())
+        self.assertIsNone(url_cache.get_cache())
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_url(self, mock_call_url):
+        """Assert call_url only makes a request once per URL in a run."""
+        backend = backends.BaseBackend()
+        with url_cache.run_cache():
+            backend.call_url('https://example.com/')
+            backend.call_url('https://example.com/')
+            backend.call_url('https://example.com/', insecure=True)
+            backend.call_url(
+                'https://example.com/', headers={'If-None-Match': '"abc"'})
+        backend.call_url('https://example.com/')
+
+        self.assertEqual(4, mock_call_url.call_count)
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_url_error(self, mock_call_url):
+        """Assert failed requests are made again in the run."""
+        mock_call_url.side_effect = [
+            AnityaPluginException('timed out'), 'response']
+        backend = backends.BaseBackend()
+        with url_cache.run_cache():
+            self.assertRaises(
+                AnityaPluginException, backend.call_url, 'https://example.com/')
+            self.assertEqual('response', backend.call_url('https://example.com/'))
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_url_circuit_open(self, mock_call_url):
+        """Assert short-circuited requests are not cached."""
+        mock_call_url.side_effect = [CircuitOpen('example.com'), 'response']
+        backend = backends.BaseBackend()
+        with url_cache.run_cache():
+            self.assertRaises(
+                CircuitOpen, backend.call_url, 'https://example.com/')
+            self.assertEqual('response', backend.call_url('https://example.com/'))
+
+
+class CheckCacheTests(unittest.TestCase):
+    """Tests for the :func:`anitya.lib.url_cache.check_cache` function."""
+
+    def test_check_cache(self):
+        """Assert nested contexts share the cache of the check."""
+        self.assertIsNone(url_cache.get_check_cache())
+        with url_cache.check_cache() as cache:
+            with url_cache.check_cache() as nested:
+                self.assertIs(cache, nested)
+            self.assertIs(cache, url_cache.get_check_cache())
+        self.assertIsNone(url_cache.get_check_cache())
+
+    def test_other_thread(self):
+        """Assert the cache of a check is not shared with other threads."""
+        caches = []
+        with url_cache.check_cache():
+            thread = threading.Thread(
+                target=lambda: caches.append(url_cache.get_check_cache()))
+            thread.start()
+            thread.join()
+        self.assertEqual([None], caches)
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_url(self, mock_call_url):
+        """Assert call_url only makes a request once per URL in a check."""
+        backend = backends.BaseBackend()
+        with url_cache.check_cache():
+            backend.call_url('https://example.com/')
+            backend.call_url('https://example.com/')
+            # Streamed responses can only be read once
+            backend.call_url('https://example.com/', stream=True)
+        with url_cache.check_cache():
+            backend.call_url('https://example.com/')
+
+        self.assertEqual(3, mock_call_url.call_count)
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_url_error(self, mock_call_url):
+        """Assert failed requests are only cached for the rest of the check."""
+        mock_call_url.side_effect = [
+            AnityaPluginException('timed out'), 'response']
+        backend = backends.BaseBackend()
+        with url_cache.run_cache():
+            with url_cache.check_cache():
+                for _ in range(2):
+                    self.assertRaises(
+                        AnityaPluginException, backend.call_url,
+                        'https://example.com/')
+            with url_cache.check_cache():
+                self.assertEqual(
+                    'response', backend.call_url('https://example.com/'))
+
+        self.assertEqual(2, mock_call_url.call_count)
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_json(self, mock_call_url):
+        """Assert call_json only decodes a document once in a check."""
+        mock_call_url.return_value.json.return_value = {'version': '1.0'}
+        backend = backends.BaseBackend()
+        with url_cache.check_cache():
+            self.assertEqual(
+                {'version': '1.0'}, backend.call_json('https://example.com/'))
+            backend.call_json('https://example.com/')
+
+        self.assertEqual(1, mock_call_url.call_count)
+        self.assertEqual(1, mock_call_url.return_value.json.call_count)
+
+    @mock.patch('anitya.lib.backends.BaseBackend._call_url')
+    def test_call_json_error(self, mock_call_url):
+        """Assert documents which are not JSON are reported."""
+        mock_call_url.return_value.json.side_effect = ValueError('not JSON')
+        backend = backends.BaseBackend()
+
+        self.assertRaises(
+            AnityaPluginException, backend.call_json, 'https://example.com/')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -50,6 +50,26 @@ oidc_scopes = [
     "https://release-monitoring.org/oidc/downstream",
     "https://release-monitoring.org/oidc/upsidedownstream",
 ]
+check_interval_min = 1800
+check_interval_max = 604800
+check_interval_default = 43200
+check_interval_packaged = 86400
+max_response_size = 1048576
+http_cache_path = "/var/cache/anitya/http.sqlite"
+http_cache_max_size = 1048576
+http_retries = 3
+http_retry_backoff = 1.0
+github_access_token = "secret_token"
+crates_index_path = "/var/cache/anitya/crates.io-index"
+crates_index_ttl = 300
+
+[http_cache_ttl]
+    default = 300
+    "GNU project" = 3600
+
+[http_timeout]
+    default = [5, 30]
+    "GNU project" = [10, 120]
 
 [anitya_log_config]
     version = 1
@@ -161,6 +181,20 @@ class LoadTests(unittest.TestCase):
                 'https://release-monitoring.org/oidc/downstream',
                 'https://release-monitoring.org/oidc/upsidedownstream',
             ],
+            'CHECK_INTERVAL_MIN': 1800,
+            'CHECK_INTERVAL_MAX': 604800,
+            'CHECK_INTERVAL_DEFAULT': 43200,
+            'CHECK_INTERVAL_PACKAGED': 86400,
+            'MAX_RESPONSE_SIZE': 1048576,
+            'HTTP_CACHE_PATH': '/var/cache/anitya/http.sqlite',
+            'HTTP_CACHE_MAX_SIZE': 1048576,
+            'HTTP_CACHE_TTL': {'default': 300, 'GNU project': 3600},
+            'HTTP_TIMEOUT': {'default': [5, 30], 'GNU project': [10, 120]},
+            'HTTP_RETRIES': 3,
+            'HTTP_RETRY_BACKOFF': 1.0,
+            'GITHUB_ACCESS_TOKEN': 'secret_token',
+            'CRATES_INDEX_PATH': '/var/cache/anitya/crates.io-index',
+            'CRATES_INDEX_TTL': 300,
         }
         config = anitya_config.load()
         self.assertEqual(sorted(expected_config.keys()), sorted(config.keys()))
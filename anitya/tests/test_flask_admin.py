@@ -32,7 +32,7 @@ import os
 import flask
 
 import anitya
-from anitya.lib import model
+from anitya.lib import model, run_stats
 from anitya.tests.base import (Modeltests, create_distro, create_project,
                                create_package, create_flagged_project)
 
@@ -479,6 +479,39 @@ class FlaskAdminTest(Modeltests):
             self.assertTrue(b'<h1>Flags</h1>' in output.data)
             self.assertTrue(b'geany' in output.data)
 
+    def test_browse_runs(self):
+        """ Test the browse_runs function. """
+
+        run = model.Run(status='started')
+        self.session.add(run)
+        self.session.commit()
+        stats = run_stats.RunStats()
+        stats.record('PyPI', True, 1.5, downloaded=2048)
+        run.end(self.session, stats=stats)
+
+        with anitya.app.APP.test_client() as c:
+            with c.session_transaction() as sess:
+                sess['openid'] = 'openid_url'
+                sess['fullname'] = 'Pierre-Yves C.'
+                sess['nickname'] = 'pingou'
+                sess['email'] = 'pingou@pingoured.fr'
+
+            output = c.get('/runs', follow_redirects=True)
+            self.assertEqual(output.status_code, 401)
+
+        with anitya.app.APP.test_client() as c:
+            with c.session_transaction() as sess:
+                sess['openid'] = 'http://pingou.id.fedoraproject.org/'
+                sess['fullname'] = 'Pierre-Yves C.'
+                sess['nickname'] = 'pingou'
+                sess['email'] = 'pingou@pingoured.fr'
+
+            output = c.get('/runs?page=abc')
+            self.assertEqual(output.status_code, 200)
+            self.assertTrue(b'<h1>Runs</h1>' in output.data)
+            self.assertTrue(b'PyPI' in output.data)
+            self.assertTrue(b'1.50' in output.data)
+
     def test_flag_project(self):
         """ Test setting the flag state of a project. """
 
@@ -243,6 +243,50 @@ class AnonymousAccessTests(_APItestsMixin, Modeltests):
             data, {u'message': {u'page': u"invalid literal for int() with base 10: 'twenty'"}})
 
 
+    def test_list_runs(self):
+        """Assert runs are listed with their statistics, the latest first."""
+        api_endpoint = '/api/v2/runs/'
+        output = self.app.get(api_endpoint)
+        self.assertEqual(output.status_code, 200)
+        data = _read_json(output)
+
+        self.assertEqual(data, {'page': 1, 'items_per_page': 25, 'total_items': 0, 'items': []})
+
+        stats = anitya.lib.run_stats.RunStats()
+        stats.record('PyPI', True, 2.0, downloaded=10)
+        for status in ('ended', 'started'):
+            run = anitya.lib.model.Run(status='started')
+            self.session.add(run)
+            self.session.commit()
+            if status == 'ended':
+                run.end(self.session, stats=stats)
+
+        output = self.app.get(api_endpoint)
+        self.assertEqual(output.status_code, 200)
+        data = _read_json(output)
+
+        self.assertEqual(2, data['total_items'])
+        self.assertEqual(['started', 'ended'], [item['status'] for item in data['items']])
+        self.assertIsNone(data['items'][0]['wall_time'])
+        self.assertEqual([], data['items'][0]['backends'])
+        self.assertEqual(
+            [{
+                'backend': 'PyPI',
+                'checked': 1,
+                'successes': 1,
+                'failures': 0,
+                'not_modified': 0,
+                'new_versions': 0,
+                'bytes_downloaded': 10,
+                'short_circuited': 0,
+                'resolver_errors': 0,
+                'latency_p50': 2.0,
+                'latency_p95': 2.0,
+                'latency_p99': 2.0,
+            }],
+            data['items'][1]['backends'])
+
+
 class AuthenticationRequiredTests(_APItestsMixin, Modeltests):
     """Test anonymous access is blocked to APIs requiring authentication"""
 
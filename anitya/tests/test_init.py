@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2017  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions
+# of the GNU General Public License v.2, or (at your option) any later
+# version.  This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY expressed or implied, including the
+# implied warranties of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+# PURPOSE.  See the GNU General Public License for more details.  You
+# should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# Any Red Hat trademarks that are incorporated in the source
+# code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission
+# of Red Hat, Inc.
+"""Tests for the :mod:`anitya` module."""
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+import anitya
+from anitya.lib import model
+from anitya.lib.exceptions import (
+    AnityaPluginException, CircuitOpen, UpstreamNotModified)
+from anitya.tests.base import Modeltests, create_project
+
+
+class CheckReleaseTests(Modeltests):
+    """Tests for the :func:`anitya.check_release` function."""
+
+    def setUp(self):
+        super(CheckReleaseTests, self).setUp()
+        create_project(self.session)
+        self.project = model.Project.get(self.session, 1)
+
+    @mock.patch('anitya.get_backend')
+    def test_check_release(self, mock_get_backend):
+        """Assert the version found is recorded."""
+        mock_get_backend.return_value.get_version.return_value = '1.28'
+
+        anitya.check_release(self.project, self.session)
+
+        self.assertEqual('1.28', self.project.latest_version)
+        self.assertEqual(['1.28'], self.project.versions)
+        self.assertEqual('Version retrieved correctly', self.project.logs)
+        self.assertEqual(0, self.project.error_counter)
+        self.assertIsNotNone(self.project.next_check_at)
+
+    @mock.patch('anitya.get_backend')
+    def test_check_release_failure(self, mock_get_backend):
+        """Assert backend errors are recorded and counted."""
+        mock_get_backend.return_value.get_version.side_effect = \
+            AnityaPluginException('geany: no upstream version found')
+
+        self.assertRaises(
+            AnityaPluginException, anitya.check_release, self.project,
+            self.session)
+
+        self.assertEqual('geany: no upstream version found', self.project.logs)
+        self.assertIsNone(self.project.latest_version)
+        self.assertEqual(1, self.project.error_counter)
+        self.assertIsNotNone(self.project.next_check_at)
+
+    @mock.patch('anitya.get_backend')
+    def test_check_release_short_circuited(self, mock_get_backend):
+        """Assert checks skipped since their host is failing are not failures."""
+        self.project.logs = 'Version retrieved correctly'
+        self.project.error_counter = 2
+        self.session.commit()
+        mock_get_backend.return_value.get_version.side_effect = \
+            CircuitOpen('www.geany.org')
+
+        self.assertRaises(
+            CircuitOpen, anitya.check_release, self.project, self.session)
+
+        self.assertEqual(2, self.project.error_counter)
+        self.assertEqual('Version retrieved correctly', self.project.logs)
+        self.assertIsNotNone(self.project.next_check_at)
+
+    @mock.patch('anitya.get_backend')
+    def test_check_release_not_modified(self, mock_get_backend):
+        """Assert unmodified upstream pages are recorded as successful checks."""
+        self.project.latest_version = '1.27'
+        self.project.error_counter = 2
+        self.session.commit()
+        mock_get_backend.return_value.get_version.side_effect = \
+            UpstreamNotModified('https://www.geany.org/Download/Releases')
+
+        anitya.check_release(self.project, self.session)
+
+        self.assertEqual('1.27', self.project.latest_version)
+        self.assertEqual(0, self.project.error_counter)
+        self.assertEqual('Version retrieved correctly', self.project.logs)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
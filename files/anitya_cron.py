@@ -1,7 +1,14 @@
 #!/usr/bin/env python
 #-*- coding: utf-8 -*-
 
+import contextlib
+import functools
+import itertools
+import os
+import socket
 import sys
+import threading
+import time
 import logging
 # We need to use multiprocessing.dummy, since we use the Pool to run
 # update_project. This in turn uses anitya.lib.backends.BaseBackend.call_url,
@@ -14,8 +21,16 @@ import multiprocessing.dummy as multiprocessing
 
 import anitya
 import anitya.app
+import anitya.lib.backends
+import anitya.lib.circuit_breaker
+import anitya.lib.dns_cache
 import anitya.lib.exceptions
+import anitya.lib.ftp_pool
 import anitya.lib.model
+import anitya.lib.rate_limit
+import anitya.lib.run_stats
+import anitya.lib.scheduler
+import anitya.lib.url_cache
 
 LOG = logging.getLogger('anitya')
 
@@ -34,42 +49,294 @@ def indexed_listings():
             continue
 
 
+def feed_batches(listings, size):
+    """ Group the entries of the feed listings by backend, in batches of at
+    most ``size`` entries.
+    """
+    for backend, entries in itertools.groupby(listings, key=lambda e: e[2]):
+        while True:
+            batch = list(itertools.islice(entries, size))
+            if not batch:
+                break
+            yield batch
+
+
 def projects_by_feed(session):
     """ Return the list of projects out of sync, found by feed listings.
 
     If a new entry is noticed and we don't have a project for it, add it.
+    The projects are looked up, and created, by batches of entries of the
+    same backend rather than one at a time.
     """
-    for name, homepage, backend, version in indexed_listings():
-        project = anitya.lib.model.Project.get_or_create(
-            session, name, homepage, backend)
-        if project.latest_version == version:
-            LOG.debug("Project %s is already up to date." % project.name)
-        else:
-            yield project
+    size = anitya.app.APP.config.get('CRON_FEED_BATCH', 500)
+    for batch in feed_batches(indexed_listings(), size):
+        projects = anitya.lib.model.Project.get_or_create_many(
+            session,
+            [(name, homepage, backend) for name, homepage, backend, _ in batch])
+        seen = set()
+        for name, homepage, backend, version in batch:
+            project = projects[(name, homepage)]
+            if project.id in seen:
+                continue
+            if project.latest_version == version:
+                LOG.debug("Project %s is already up to date." % project.name)
+            else:
+                seen.add(project.id)
+                yield project
+
+
+def projects_by_changes(session):
+    """ Return the npm projects changed upstream since the last run, found by
+    following the changes feed of the registry, and the position reached in
+    the feed.
+
+    The changes are read by batches of ``CRON_NPM_CHANGES_BATCH`` changes, at
+    most ``CRON_NPM_CHANGES_MAX_BATCHES`` batches per run. The position is to
+    be stored with :func:`changes_checked` once the projects are checked, so
+    the next run resumes from there, or reads the same changes again if this
+    one did not complete. It is ``None`` if there is nothing to store. Only
+    the projects already known are returned, the other packages are ignored.
+    """
+    projects = []
+    backend = anitya.lib.plugins.get_plugin('npmjs')
+    if backend is None:
+        return projects, None
+    size = anitya.app.APP.config.get('CRON_NPM_CHANGES_BATCH', 1000)
+    max_batches = anitya.app.APP.config.get('CRON_NPM_CHANGES_MAX_BATCHES', 50)
+    since = None
+    try:
+        since = anitya.lib.model.FeedCursor.get(session, backend.name)
+        if since is None:
+            # Follow the registry from now on, the projects are all checked
+            # by the regular runs anyway
+            return projects, backend.get_update_seq()
+        for _ in range(max_batches):
+            names, last_seq = backend.get_changes(since, size)
+            if names:
+                batch = session.query(anitya.lib.model.Project).filter(
+                    anitya.lib.model.Project.backend == backend.name,
+                    anitya.lib.model.Project.name.in_(set(names))).all()
+                LOG.info(
+                    "%i changes in the npm registry, %i projects to check",
+                    len(names), len(batch))
+                projects.extend(batch)
+            if last_seq == since:
+                break
+            since = last_seq
+    except anitya.lib.exceptions.AnityaPluginException as err:
+        LOG.info("Could not follow the changes of the npm registry: %s", err)
+    return projects, since
+
+
+def changes_checked(session, seq):
+    """ Store the position reached in the changes feed of the npm registry,
+    once the projects changed until then are checked.
+    """
+    backend = anitya.lib.plugins.get_plugin('npmjs')
+    if backend is not None and seq is not None:
+        anitya.lib.model.FeedCursor.set(session, backend.name, seq)
+
+
+def configure_http():
+    """ Size the HTTP connection pools for the ``CRON_POOL`` checks running at
+    the same time, the scheduler lets at most ``CRON_HOST_CONCURRENCY`` of
+    their requests query the same host.
+    """
+    concurrency = anitya.app.APP.config.get('CRON_POOL', 10)
+    per_host = anitya.app.APP.config.get('CRON_HOST_CONCURRENCY', 4)
+    anitya.lib.backends.configure_sessions(
+        pool_connections=concurrency,
+        pool_maxsize=min(concurrency, per_host))
+
+
+def update_project(project_id, run_id=None):
+    """ Check for updates on the specified project, checkpointing it in the
+    specified run if any.
+
+    Return the RateLimited exception if upstream rate limited the check, the
+    project is then neither updated nor checkpointed.
+    """
+    # Thread-local session sharing the connection pool of the cron job
+    session = anitya.lib.model.Session()
+    try:
+        try:
+            project = anitya.lib.model.Project.by_id(session, project_id)
+            anitya.check_release(project, session),
+        except anitya.lib.exceptions.RateLimited as err:
+            LOG.info("%s: %s", project.name, err)
+            return err
+        except anitya.lib.exceptions.AnityaException as err:
+            LOG.info(err)
+        if run_id is not None:
+            anitya.lib.model.RunCheckpoint.add(session, run_id, project_id)
+    finally:
+        anitya.lib.model.Session.remove()
+
+
+def update_projects(project_hosts, run_id=None):
+    """ Check the given projects for updates using a pool of threads.
+
+    Return the (project_id, error) tuples of the checks which were rate
+    limited.
+    """
+    N = anitya.app.APP.config.get('CRON_POOL', 10)
+    LOG.info(
+        "Launching pool (%i) to update %i projects", N, len(project_hosts))
+    p = multiprocessing.Pool(N)
+    # Hand the projects out one at a time so the interleaving of the hosts
+    # is preserved across the workers.
+    project_ids = [project_id for project_id, _ in project_hosts]
+    worker = functools.partial(update_project, run_id=run_id)
+    rate_limited = []
+    for project_id, error in zip(
+            project_ids, p.imap(worker, project_ids, chunksize=1)):
+        if error is not None:
+            rate_limited.append((project_id, error))
+    p.close()
+    p.join()
+    return rate_limited
+
+
+def prefetch(projects):
+    """ Let each backend query upstream about all its projects at once,
+    where it can, before they are checked one at a time.
+    """
+    by_backend = {}
+    for project in projects:
+        by_backend.setdefault(project.backend, []).append(project)
+    for name, backend_projects in sorted(by_backend.items()):
+        backend = anitya.lib.plugins.get_plugin(name)
+        if backend is None:
+            continue
+        try:
+            backend.prefetch(backend_projects)
+        except anitya.lib.exceptions.AnityaException as err:
+            LOG.info("Could not prefetch the %s projects: %s", name, err)
+
+
+def check_projects(projects, run_id=None):
+    """ Check the given projects for updates, checkpointing them in the
+    given run if any.
+
+    Return the identifiers of the projects left for the next run since their
+    upstream rate limited the checks for too long.
+    """
+    prefetch(projects)
+
+    # Spread the projects of each upstream host over the whole run rather
+    # than checking them in bursts.
+    project_hosts = anitya.lib.scheduler.interleave(
+        anitya.lib.scheduler.project_hosts(projects), key=lambda item: item[1])
+
+    # Rate limited projects are checked again once their host accepts
+    # requests, unless it asks to wait for too long: they are then left for
+    # the next run.
+    max_wait = anitya.app.APP.config.get('CRON_RATE_LIMIT_MAX_WAIT', 900)
+    left = set()
+    while project_hosts:
+        rate_limited = update_projects(project_hosts, run_id=run_id)
+        if not rate_limited:
+            break
+
+        deadline = time.time() + max_wait
+        retried = set(
+            project_id for project_id, error in rate_limited
+            if error.retry_at <= deadline)
+        if len(retried) < len(rate_limited):
+            LOG.info(
+                "Leaving %i rate limited projects for the next run",
+                len(rate_limited) - len(retried))
+            left.update(
+                project_id for project_id, _ in rate_limited
+                if project_id not in retried)
+        if not retried:
+            break
+        delay = min(
+            error.retry_at for project_id, error in rate_limited
+            if project_id in retried) - time.time()
+        LOG.info(
+            "Checking %i rate limited projects again in %.0fs",
+            len(retried), max(delay, 0))
+        if delay > 0:
+            time.sleep(delay)
+        project_hosts = [
+            project_host for project_host in project_hosts
+            if project_host[0] in retried]
+    return left
+
+
+def work(session):
+    """ Check the projects queued by batches, until the queue is empty.
+
+    Several workers can run at the same time, on any host.
+    """
+    worker = '%s:%i' % (socket.gethostname(), os.getpid())
+    batch = anitya.app.APP.config.get('CRON_LEASE_BATCH', 100)
+    duration = anitya.app.APP.config.get('CRON_LEASE_DURATION', 3600)
+    while True:
+        token, project_ids = anitya.lib.model.CheckLease.claim(
+            session, worker, batch, duration)
+        if not project_ids:
+            break
+        LOG.info("Worker %s claimed %i projects", worker, len(project_ids))
+        projects = session.query(anitya.lib.model.Project).filter(
+            anitya.lib.model.Project.id.in_(project_ids)).all()
+        # The projects rate limited for too long stay leased, they are
+        # claimed again once the lease expires
+        left = check_projects(projects)
+        anitya.lib.model.CheckLease.release(session, token, keep=left)
+
 
+@contextlib.contextmanager
+def heartbeat(run_id, interval):
+    """ Record every ``interval`` seconds that the given run is in progress,
+    from a thread of its own, so other cron jobs do not resume it.
+    """
+    stop = threading.Event()
 
+    def beat():
+        while not stop.wait(interval):
+            # Thread-local session sharing the connection pool of the cron job
+            session = anitya.lib.model.Session()
+            try:
+                anitya.lib.model.Run.beat(session, run_id)
+            except Exception:
+                LOG.exception("Could not record the heartbeat of the run")
+            finally:
+                anitya.lib.model.Session.remove()
 
-def update_project(project_id):
-    """ Check for updates on the specified project. """
-    session = anitya.lib.init(anitya.app.APP.config['DB_URL'])
-    project = anitya.lib.model.Project.by_id(session, project_id)
+    thread = threading.Thread(target=beat, name='run-heartbeat')
+    thread.daemon = True
+    thread.start()
     try:
-        anitya.check_release(project, session),
-    except anitya.lib.exceptions.AnityaException as err:
-        LOG.info(err)
+        yield
     finally:
-        session.get_bind().dispose()
-        session.remove()
+        stop.set()
+        thread.join()
+
+
+def main(debug, feed, check_all=False, enqueue=False, worker=False):
+    ''' Retrieve all the packages due to be checked and for each of them
+    update the release version.
+
+    Unless ``check_all`` is set, only the projects whose ``next_check_at`` is
+    in the past are checked.
 
+    With ``enqueue``, the projects are queued for the workers rather than
+    checked. With ``worker``, the projects queued are checked rather than
+    the projects due.
 
-def main(debug, feed):
-    ''' Retrieve all the packages and for each of them update the release
-    version.
+    If the last run of the same mode was interrupted, it is resumed: the
+    projects it checked already are skipped. Runs whose heartbeat is recent
+    are still in progress and left alone.
     '''
+    # Size the connection pool for the thread pool workers, plus one
+    # connection for the main thread and one for the heartbeat.
+    anitya.lib.model.initialize(
+        anitya.app.APP.config,
+        pool_size=anitya.app.APP.config.get('CRON_POOL', 10) + 2)
     session = anitya.app.SESSION
-    run = anitya.lib.model.Run(status='started')
-    session.add(run)
-    session.commit()
+    configure_http()
     LOG.setLevel(logging.DEBUG)
 
     formatter = logging.Formatter(
@@ -88,25 +355,132 @@ def main(debug, feed):
     fhand.setFormatter(formatter)
     LOG.addHandler(fhand)
 
-    if feed:
-        projects = list(projects_by_feed(session))
+    if enqueue:
+        mode = 'enqueue'
+    elif worker:
+        mode = 'worker'
+    elif feed:
+        mode = 'feed'
+    elif check_all:
+        mode = 'all'
+    else:
+        mode = 'due'
+
+    # Resume the last run of this mode if it was interrupted, the work queue
+    # keeps track of its own progress. A run is considered interrupted once
+    # it missed a few heartbeats.
+    interval = anitya.app.APP.config.get('CRON_HEARTBEAT_INTERVAL', 60)
+    run = None
+    if not (enqueue or worker):
+        run = anitya.lib.model.Run.last_unfinished(
+            session, mode=mode, stale_after=5 * interval)
+        if run is not None and not run.claim(session):
+            run = None
+    if run is None:
+        run = anitya.lib.model.Run(status='started', mode=mode)
+        session.add(run)
         session.commit()
+        checked = set()
     else:
-        projects = anitya.lib.model.Project.all(session)
+        checked = run.checked(session)
+        LOG.info(
+            "Resuming the run started at %s, %i projects were checked",
+            run.created_on, len(checked))
 
-    project_ids = [project.id for project in projects]
+    changes_seq = None
+    changed_ids = set()
+    with heartbeat(run.id, interval):
+        if worker:
+            projects = None
+        elif feed:
+            projects = list(projects_by_feed(session))
+            session.commit()
+            seen = set(project.id for project in projects)
+            changed, changes_seq = projects_by_changes(session)
+            changed_ids = set(project.id for project in changed)
+            for project in changed:
+                if project.id not in seen:
+                    seen.add(project.id)
+                    projects.append(project)
+        elif check_all:
+            projects = anitya.lib.model.Project.all(session)
+        else:
+            projects = anitya.lib.model.Project.due(session)
+        if checked:
+            projects = [
+                project for project in projects if project.id not in checked]
+
+        stats, left = run_checks(
+            session, run.id, projects, enqueue=enqueue, worker=worker)
+
+    # The changes are read again by the next run if some of the projects
+    # changed could not be checked
+    if left & changed_ids:
+        LOG.info("Not storing the position in the npm changes feed")
+    else:
+        changes_checked(session, changes_seq)
+    run.end(session, stats=stats)
 
-    N = anitya.app.APP.config.get('CRON_POOL', 10)
-    LOG.info("Launching pool (%i) to update %i projects", N, len(project_ids))
-    p = multiprocessing.Pool(N)
-    p.map(update_project, project_ids)
 
-    run = anitya.lib.model.Run(status='ended')
-    session.add(run)
-    session.commit()
+def run_checks(session, run_id, projects, enqueue=False, worker=False):
+    """ Check the given projects, or queue them, or check the projects
+    queued, during the given run.
+
+    Return the statistics of the checks, ``None`` if nothing was checked,
+    and the identifiers of the projects left for the next run.
+    """
+    stats = None
+    left = set()
+    if enqueue:
+        count = anitya.lib.model.CheckLease.enqueue(
+            session, [project.id for project in projects])
+        LOG.info("Queued %i projects", count)
+    else:
+        # Projects sharing an upstream page only download it once per run
+        cache_size = anitya.app.APP.config.get('CRON_URL_CACHE_SIZE', 1000)
+        # Projects of a host which keeps failing are not waited for, see
+        # anitya.lib.circuit_breaker; a cooldown of 0 means the rest of the run
+        threshold = anitya.app.APP.config.get('CRON_CIRCUIT_THRESHOLD', 5)
+        cooldown = anitya.app.APP.config.get('CRON_CIRCUIT_COOLDOWN', 600)
+        # Upstream host names are resolved once per DNS TTL, not per request
+        dns_ttl = anitya.app.APP.config.get('CRON_DNS_TTL', 300)
+        dns_negative_ttl = anitya.app.APP.config.get(
+            'CRON_DNS_NEGATIVE_TTL', 30)
+        # Requests to the same upstream host are spread out over time
+        per_host = anitya.app.APP.config.get('CRON_HOST_CONCURRENCY', 4)
+        host_rate = anitya.app.APP.config.get('CRON_HOST_RATE', 2)
+        with anitya.lib.run_stats.collect() as stats, \
+                anitya.lib.url_cache.run_cache(max_entries=cache_size) as cache, \
+                anitya.lib.circuit_breaker.run_breaker(
+                    threshold=threshold, cooldown=cooldown or None) as breaker, \
+                anitya.lib.rate_limit.run_limits(), \
+                anitya.lib.dns_cache.run_resolver(
+                    ttl=dns_ttl, negative_ttl=dns_negative_ttl) as resolver, \
+                anitya.lib.scheduler.run_scheduler(
+                    max_per_host=per_host, rate=host_rate):
+            if worker:
+                work(session)
+            else:
+                left = check_projects(projects, run_id=run_id)
+        LOG.info(
+            "Made %i upstream requests, %i were shared",
+            cache.misses, cache.hits)
+        if breaker.short_circuited:
+            LOG.info(
+                "Skipped %i upstream requests, hosts still failing: %s",
+                breaker.short_circuited, ', '.join(breaker.open_hosts()))
+        LOG.info(
+            "Resolved %i host names, %i lookups were cached, %i failed",
+            resolver.misses, resolver.hits, resolver.errors)
+        anitya.lib.ftp_pool.close()
+    return stats, left
 
 
 if __name__ == '__main__':
     debug = '--debug' in sys.argv
     feed = '--check-feed' in sys.argv
-    main(debug=debug, feed=feed)
+    check_all = '--all' in sys.argv
+    enqueue = '--enqueue' in sys.argv
+    worker = '--worker' in sys.argv
+    main(debug=debug, feed=feed, check_all=check_all, enqueue=enqueue,
+         worker=worker)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the database session handling of the cron job workers.
+
+Each worker used to create (and dispose of) a new engine for every project
+it checked. It now uses a thread-local session of the scoped session, which
+shares the connection pool of the cron job. This loads and updates projects
+from a pool of threads the same way ``update_project`` does, with both
+approaches, and prints how long each took.
+
+Usage: benchmark_db_sessions.py [DB_URL] [PROJECTS] [THREADS]
+
+Without a DB_URL, or with an empty one, a temporary SQLite database is used.
+Point it to a scratch PostgreSQL database to see the cost of opening
+connections to a server.
+"""
+
+from __future__ import print_function
+
+import multiprocessing.dummy as multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import anitya.lib
+import anitya.lib.model as model
+
+
+def engine_per_project(db_url, project_id):
+    """ Check a project with a brand new engine, the former behavior. """
+    session = anitya.lib.init(db_url)
+    try:
+        project = model.Project.by_id(session, project_id)
+        project.logs = 'Version retrieved correctly'
+        session.commit()
+    finally:
+        session.get_bind().dispose()
+        session.remove()
+
+
+def pooled_session(project_id):
+    """ Check a project with a thread-local session of the shared engine. """
+    session = model.Session()
+    try:
+        project = model.Project.by_id(session, project_id)
+        project.logs = 'Version retrieved correctly'
+        session.commit()
+    finally:
+        model.Session.remove()
+
+
+def timed(threads, worker, project_ids):
+    """ Run the worker over the projects from a thread pool, in seconds. """
+    pool = multiprocessing.Pool(threads)
+    start = time.time()
+    for _ in pool.imap_unordered(worker, project_ids, chunksize=1):
+        pass
+    elapsed = time.time() - start
+    pool.close()
+    pool.join()
+    return elapsed
+
+
+def main(db_url, count, threads):
+    """ Create ``count`` projects and time both approaches. """
+    session = anitya.lib.init(db_url, create=True)
+    for index in range(count):
+        session.add(model.Project(
+            name='project-%i' % index,
+            homepage='https://example.com/%i' % index,
+            backend='custom',
+        ))
+    session.commit()
+    project_ids = [project.id for project in model.Project.all(session)]
+    session.remove()
+
+    model.initialize({'DB_URL': db_url}, pool_size=threads + 1)
+
+    before = timed(
+        threads, lambda pid: engine_per_project(db_url, pid), project_ids)
+    after = timed(threads, pooled_session, project_ids)
+
+    print('%i projects, %i threads' % (len(project_ids), threads))
+    print('engine per project: %.2fs (%.2fms per project)' % (
+        before, 1000 * before / len(project_ids)))
+    print('pooled sessions:    %.2fs (%.2fms per project)' % (
+        after, 1000 * after / len(project_ids)))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    tmp_dir = None
+    if args and args[0]:
+        db_url = args[0]
+    else:
+        tmp_dir = tempfile.mkdtemp()
+        db_url = 'sqlite:///%s' % os.path.join(tmp_dir, 'benchmark.sqlite')
+    count = int(args[1]) if len(args) > 1 else 2000
+    threads = int(args[2]) if len(args) > 2 else 10
+    try:
+        main(db_url, count, threads)
+    finally:
+        if tmp_dir:
+            os.remove(os.path.join(tmp_dir, 'benchmark.sqlite'))
+            os.rmdir(tmp_dir)
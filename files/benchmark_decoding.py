@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the decoding of the upstream pages versions are searched in.
+
+The pages used to be decoded by ``Response.text`` which, when the server does
+not declare a charset, detects the encoding by going over the whole page.
+They are now decoded by ``anitya.lib.backends.response_text``, which tries
+UTF-8 first. This decodes the HTML pages recorded for the tests, with their
+charset removed, both ways and prints how long each took.
+
+Usage: benchmark_decoding.py [REPEAT] [ROUNDS]
+
+Each page is repeated REPEAT times, to see the cost on large listings.
+
+The recorded requests are YAML documents, this requires PyYAML, which is
+listed in ``requirements/test_requirements.txt``.
+"""
+
+from __future__ import print_function
+
+import glob
+import os
+import sys
+import time
+
+import requests
+import yaml
+
+from anitya.lib.backends import response_text
+
+
+REQUEST_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'anitya', 'tests', 'request-data')
+
+
+def recorded_pages():
+    """ Return the bodies of the HTML pages recorded for the tests. """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(REQUEST_DATA, '*'))):
+        with open(path) as stream:
+            # The cassettes written by Python 2 use the python/unicode tag
+            cassette = yaml.load(stream, Loader=yaml.Loader)
+        for interaction in cassette.get('interactions', []):
+            response = interaction['response']
+            content_type = response['headers'].get('content-type', [''])[0]
+            body = response['body'].get('string')
+            if 'html' in content_type and body:
+                if not isinstance(body, bytes):
+                    body = body.encode('utf-8')
+                pages.append(body)
+    return pages
+
+
+def undeclared(body):
+    """ Build a response which does not declare its charset. """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.encoding = None
+    return response
+
+
+def timed(decode, pages, rounds):
+    """ Decode the pages ``rounds`` times, in seconds. """
+    start = time.time()
+    for _ in range(rounds):
+        for body in pages:
+            decode(undeclared(body))
+    return time.time() - start
+
+
+def main(repeat, rounds):
+    """ Time both ways of decoding the recorded pages. """
+    pages = [body * repeat for body in recorded_pages()]
+    size = sum(len(body) for body in pages)
+
+    before = timed(lambda response: response.text, pages, rounds)
+    after = timed(response_text, pages, rounds)
+
+    print('%i pages, %.1f kB, %i rounds' % (len(pages), size / 1024.0, rounds))
+    print('charset detection: %.3fs (%.2fms per page)' % (
+        before, 1000 * before / (len(pages) * rounds)))
+    print('UTF-8 first:       %.3fs (%.2fms per page)' % (
+        after, 1000 * after / (len(pages) * rounds)))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    repeat = int(args[0]) if args else 10
+    rounds = int(args[1]) if len(args) > 1 else 3
+    main(repeat, rounds)